@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the Tetris engine and its simulators.
+Run them as modules from the repository root, e.g. `python -m benchmarks.bench_batch`.
+"""
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Batch simulator benchmark: per-board throughput of BatchTetris versus scalar TetrisEngine.
+
+First replays the same actions on both implementations and checks they agree
+cell for cell, then times random play at several batch sizes and reports the
+batch size from which the batch beats stepping scalar engines one by one (a
+batch step has a fixed cost of a few dozen NumPy calls, so small batches lose):
+
+    python -m benchmarks.bench_batch [--sizes 1 64 1024 16384] [--steps 200]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from tetris_batch import BatchTetris, PIECE_KEYS, COLOR_TABLE
+from tetris_bot import DEFAULT_WEIGHTS, board_features
+from tetris_engine import TetrisEngine, ACTIONS, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_HARD_DROP
+
+
+def _prefill(batch, engines, rng, rows=8):
+    """
+    Fills the bottom rows of every board except for one column, so that line clears
+    (and Tetrises, when an I piece drops into the well) happen early.
+    """
+    for i, engine in enumerate(engines):
+        gap = rng.randrange(batch.width)
+        for r in range(batch.height - rows, batch.height):
+            for c in range(batch.width):
+                if c != gap:
+                    value = rng.randrange(1, len(COLOR_TABLE))
+                    batch.boards[i, r, c] = value
+                    engine.board.merge([[1]], c, r, COLOR_TABLE[value])
+
+
+def _plan(engine, scratch):
+    """
+    Returns the inputs (rotations, sideways moves, hard drop) of the column drop of
+    the falling piece that clears the most lines, the bot's evaluation breaking ties.
+    The moves are played on `scratch` (restored from `engine` once); each landing is
+    evaluated on a copy of the board.
+    """
+    scratch.restore(engine.snapshot())
+    board = scratch.board
+    start = (scratch.current_piece, scratch.current_x, scratch.current_y)
+    best, best_value = [ACTION_HARD_DROP], None
+    seen = set() # Piece states already evaluated (moves into a wall end where fewer moves do)
+    for rotations in range(4):
+        for dx in range(-engine.width // 2, engine.width // 2 + 1):
+            moves = [ACTION_ROTATE] * rotations + [ACTION_LEFT if dx < 0 else ACTION_RIGHT] * abs(dx)
+            scratch.current_piece, scratch.current_x, scratch.current_y = start
+            for action in moves: # Moves and rotations leave the board alone
+                scratch.act(action)
+            piece, x, y = scratch.current_piece, scratch.current_x, scratch.current_y
+            if (piece, x) in seen:
+                continue
+            seen.add((piece, x))
+            result = board.copy()
+            result.merge(piece, x, board.drop_position(piece, x, y), scratch.current_color)
+            lines = result.clear_full_rows()
+            features = board_features(result)
+            value = (lines, sum(DEFAULT_WEIGHTS[name] * amount for name, amount in features.items()))
+            if best_value is None or value > best_value:
+                best, best_value = moves + [ACTION_HARD_DROP], value
+    return best
+
+
+def verify(n=32, steps=1000, seed=0, min_multi_clears=50):
+    """
+    Plays the same actions on a BatchTetris and on n scalar engines and asserts that
+    boards, pieces, scores and game-over flags match after every step.
+
+    Most actions come from a policy that drops each piece where it clears the most
+    lines, on boards whose bottom rows are full but for one well, so single, multi-line
+    and Tetris clears all happen often; the rest are random inputs. Gravity ticks
+    every fourth step, so the planned moves mostly play out before the piece falls.
+    Board i and engine i are seeded alike and must deal the same pieces, also after
+    finished games are restarted.
+
+    Returns:
+        (lines, multi_clears): lines cleared across all boards, and the number of
+        clears of two or more lines. Fewer than `min_multi_clears` multi-line clears
+        raise AssertionError: the check would not cover the clear path.
+    """
+    rng = random.Random(seed)
+    batch = BatchTetris(n, seed=seed)
+    engines = []
+    spawns = [0] * n # Pieces spawned per engine, to tell when a plan belongs to an old piece
+    for i in range(n):
+        engine = TetrisEngine(seed=batch.seeds[i]) # Deals the same pieces as board i
+        engine.on('piece_spawned', lambda i=i: spawns.__setitem__(i, spawns[i] + 1))
+        engine.reset()
+        engines.append(engine)
+    _prefill(batch, engines, rng)
+    scratch = TetrisEngine(backend='bitboard') # Plays out the policy's candidate drops
+    plans = [[] for _ in range(n)] # Remaining inputs per board
+    planned_for = [None] * n # spawns[i] when the plan was made
+    multi_clears = 0
+
+    for step in range(steps):
+        actions = np.zeros(n, dtype=np.int64)
+        for i, engine in enumerate(engines):
+            if engine.game_over:
+                continue
+            if rng.random() < 0.1: # Random inputs, like a (very bad) player; the plan no longer fits
+                actions[i] = rng.choice((1, 1, 2, 2, 3, 4, 4, 5))
+                plans[i] = []
+                continue
+            if not plans[i] or planned_for[i] != spawns[i]:
+                plans[i], planned_for[i] = _plan(engine, scratch), spawns[i]
+            actions[i] = plans[i].pop(0)
+        gravity = step % 4 == 3
+        multi_clears += int((batch.step(actions, gravity=gravity) >= 2).sum())
+        for i, engine in enumerate(engines):
+            if not engine.game_over:
+                engine.act(int(actions[i]))
+                if gravity:
+                    engine.step()
+            state = (engine.current_piece.key, engine.current_piece.rotation, engine.current_x, engine.current_y)
+            batch_state = (PIECE_KEYS[batch.piece[i]], batch.rotation[i], batch.x[i], batch.y[i])
+            assert engine.game_over == batch.game_over[i], (step, i, 'game over')
+            assert state == batch_state, (step, i, state, batch_state)
+            assert engine.score == batch.score[i], (step, i, engine.score, batch.score[i])
+            assert [list(row) for row in engine.board] == batch.board_colors(i), (step, i, 'board')
+        if batch.game_over.any(): # Restart finished games on both sides: the bags must stay in step
+            for i in np.flatnonzero(batch.game_over):
+                engines[i].reset()
+                plans[i] = []
+            batch.reset(batch.game_over)
+    assert multi_clears >= min_multi_clears, f"only {multi_clears} multi-line clears: the clear path is barely checked"
+    return int(batch.lines.sum()), multi_clears
+
+
+def bench_batch(n, steps, seed=0):
+    """Returns board-steps per second for a BatchTetris of n boards playing random actions."""
+    batch = BatchTetris(n, seed=seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, len(ACTIONS), size=(steps, n))
+    start = time.perf_counter()
+    for t in range(steps):
+        batch.step(actions[t])
+        if batch.game_over.any():
+            batch.reset(batch.game_over) # Keep every board busy
+    return n * steps / (time.perf_counter() - start)
+
+
+def bench_scalar(n, steps, seed=0):
+    """Returns board-steps per second for n TetrisEngine instances stepped one by one."""
+    rng = random.Random(seed)
+    engines = [TetrisEngine(seed=seed + i) for i in range(n)]
+    for engine in engines:
+        engine.reset()
+    actions = [[rng.randrange(len(ACTIONS)) for _ in range(n)] for _ in range(steps)]
+    start = time.perf_counter()
+    for t in range(steps):
+        row = actions[t]
+        for i, engine in enumerate(engines):
+            if engine.game_over:
+                engine.reset()
+            engine.act(row[i])
+            engine.step()
+    return n * steps / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 64, 256, 1024, 4096, 16384], help="batch sizes N")
+    parser.add_argument('--steps', type=int, default=200, help="steps per batch size")
+    parser.add_argument('--scalar-boards', type=int, default=256,
+                        help="scalar throughput does not depend on N, so at most this many engines are timed")
+    parser.add_argument('--skip-verify', action='store_true', help="skip the batch-vs-scalar equivalence check")
+    args = parser.parse_args(argv)
+
+    if not args.skip_verify:
+        lines, multi_clears = verify()
+        print(f"verify: batch and scalar rules agree ({lines} lines cleared, {multi_clears} multi-line clears)")
+
+    print(f"{'N':>7} {'batch steps/s':>15} {'scalar steps/s':>15} {'speedup':>8}")
+    crossover = None # Smallest N from which on the batch beat the scalar engines at every larger size too
+    for n in sorted(args.sizes):
+        batch_rate = bench_batch(n, args.steps)
+        scalar_rate = bench_scalar(min(n, args.scalar_boards), args.steps)
+        print(f"{n:>7} {batch_rate:>15,.0f} {scalar_rate:>15,.0f} {batch_rate / scalar_rate:>7.1f}x")
+        if batch_rate <= scalar_rate:
+            crossover = None
+        elif crossover is None:
+            crossover = n
+    if crossover is None:
+        print("the batch did not beat the scalar engines at the largest size measured: use TetrisEngine")
+    else:
+        print(f"the batch pays off from about N={crossover}; below that, step TetrisEngines one by one")
+
+
+if __name__ == "__main__":
+    main()
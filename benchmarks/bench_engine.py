@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Engine hot-path benchmarks with stored baselines and a regression gate.
+
+Times check_collision, clear_lines, rotate_piece and hard_drop on every board
+fixture (empty, half, jagged, near_top) and backend, BoardRenderer.draw (the
+game's draw_board) on a real Tk canvas, and complete scripted games. Every
+benchmark is warmed up and then repeated; the fastest repeat is reported in
+nanoseconds per operation (the minimum is the least noise-sensitive estimate).
+
+    python -m benchmarks.bench_engine run --out baseline.json
+    python -m benchmarks.bench_engine compare baseline.json --threshold 0.10
+
+`compare` runs the benchmarks again (or reads `--current FILE`) and exits with
+status 1 if any benchmark got slower than the baseline by more than the threshold,
+or if a baseline benchmark is missing from the current run (renamed or deleted).
+Canvas benchmarks need a display (e.g. `xvfb-run`); without one they are skipped.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from benchmarks.fixtures import FIXTURES, make_fixture
+from tetris_board import BOARD_BACKENDS
+from tetris_config import TETROMINOES
+from tetris_engine import TetrisEngine
+from tetris_pieces import ROTATIONS
+
+BENCHMARKS = {} # name -> (setup, number of operations per repeat)
+
+
+def benchmark(name, number):
+    """Registers `setup(number)`, which prepares the state and returns a callable doing `number` operations."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def measure(setup, number, repeat=5, warmup=1):
+    """
+    Times a benchmark: `warmup` untimed runs, then `repeat` timed ones.
+    Only the returned callable is timed, never the setup.
+
+    Returns:
+        list of seconds per operation, one per repeat.
+    """
+    for _ in range(warmup):
+        setup(number)()
+    timings = []
+    for _ in range(repeat):
+        run = setup(number)
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def _engine(fixture, backend, seed=0):
+    """A reset engine whose board is the given fixture."""
+    engine = TetrisEngine(seed=seed, backend=backend)
+    engine.reset(seed)
+    engine.board = make_fixture(fixture, backend)
+    return engine
+
+
+def _free_states(board, count, rng):
+    """Random (piece state, x, y) positions that do not collide on `board`."""
+    states = [state for key in TETROMINOES for state in ROTATIONS[key]]
+    found = []
+    while len(found) < count:
+        state = rng.choice(states)
+        x, y = rng.randint(-2, board.width), rng.randint(0, board.height - 1)
+        if not board.collides(state, x, y):
+            found.append((state, x, y))
+    return found
+
+
+# --- Engine hot paths, per fixture and backend ---
+
+def _register_engine_benchmarks(fixture, backend):
+    suffix = f'{fixture}/{backend}'
+
+    @benchmark(f'check_collision/{suffix}', 20000)
+    def check_collision(number):
+        engine = _engine(fixture, backend)
+        rng = random.Random(1)
+        states = [state for key in TETROMINOES for state in ROTATIONS[key]]
+        probes = [(rng.choice(states), rng.randint(-2, engine.board.width), rng.randint(-1, engine.board.height))
+                  for _ in range(number)]
+        collides = engine.check_collision
+
+        def run():
+            for piece, x, y in probes:
+                collides(piece, x, y)
+        return run
+
+    @benchmark(f'clear_lines/{suffix}', 1000)
+    def clear_lines(number):
+        engine = _engine(fixture, backend)
+        boards = []
+        for _ in range(number): # Each clear gets its own board with the bottom two rows full
+            board = make_fixture(fixture, backend)
+            for r in (board.height - 2, board.height - 1):
+                for c in range(board.width):
+                    if board[r][c] == '':
+                        board.merge([[1]], c, r, TETROMINOES['I']['color'])
+            boards.append(board)
+
+        def run():
+            for board in boards:
+                engine.board = board
+                engine.clear_lines()
+        return run
+
+    @benchmark(f'rotate_piece/{suffix}', 5000)
+    def rotate_piece(number):
+        engine = _engine(fixture, backend)
+        positions = _free_states(engine.board, number, random.Random(2))
+
+        def run(): # Includes placing the piece at each position
+            for piece, x, y in positions:
+                engine.current_piece, engine.current_x, engine.current_y = piece, x, y
+                engine.rotate_piece()
+        return run
+
+    @benchmark(f'hard_drop/{suffix}', 500)
+    def hard_drop(number):
+        engines = [_engine(fixture, backend, seed) for seed in range(number)] # hard_drop changes the board
+
+        def run():
+            for engine in engines:
+                engine.hard_drop()
+        return run
+
+
+for _fixture in FIXTURES:
+    for _backend in sorted(BOARD_BACKENDS):
+        _register_engine_benchmarks(_fixture, _backend)
+
+
+# --- Scripted games ---
+
+def _register_game_benchmark(backend):
+    @benchmark(f'scripted_game/{backend}', 2000)
+    def scripted_game(number):
+        """A seeded random input script with one gravity step per input; restarts on game over."""
+        rng = random.Random(3)
+        script = [rng.choice((1, 1, 2, 2, 3, 4, 4, 5)) for _ in range(number)]
+        engine = TetrisEngine(seed=3, backend=backend)
+        engine.reset(3)
+
+        def run():
+            act, step = engine.act, engine.step
+            for action in script:
+                if engine.game_over:
+                    engine.reset(3)
+                act(action)
+                step()
+        return run
+
+
+for _backend in sorted(BOARD_BACKENDS):
+    _register_game_benchmark(_backend)
+
+
+# --- Rendering (needs a display) ---
+
+_tk_canvas = None
+
+
+def _canvas():
+    """Returns an emptied canvas on a shared, withdrawn Tk root, or None without a display."""
+    global _tk_canvas
+    import tkinter as tk
+    if _tk_canvas is None:
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            return None
+        root.withdraw()
+        _tk_canvas = tk.Canvas(root, width=300, height=600)
+        _tk_canvas.pack()
+    _tk_canvas.delete('all') # Items of the previous setup
+    return _tk_canvas
+
+
+def _register_draw_benchmarks(fixture):
+    @benchmark(f'draw_board/{fixture}/full_repaint', 200)
+    def full_repaint(number):
+        """Alternates between the fixture and an empty board, repainting every changed cell."""
+        from tetris_render import BoardRenderer
+        canvas = _canvas()
+        if canvas is None:
+            return None
+        engine = _engine(fixture, 'list')
+        renderer = BoardRenderer(canvas, engine)
+        boards = (engine.board, make_fixture('empty'))
+
+        def run():
+            for i in range(number):
+                engine.board = boards[i & 1]
+                renderer.mark_rows(None)
+                renderer.draw()
+                canvas.update_idletasks() # Let Tk finish the redraw
+        return run
+
+    @benchmark(f'draw_board/{fixture}/piece_move', 1000)
+    def piece_move(number):
+        """Moves the falling piece sideways and back: the common per-frame case."""
+        from tetris_render import BoardRenderer
+        canvas = _canvas()
+        if canvas is None:
+            return None
+        engine = _engine(fixture, 'list')
+        renderer = BoardRenderer(canvas, engine)
+        renderer.draw()
+        x = engine.current_x
+
+        def run():
+            for i in range(number):
+                engine.current_x = x + (i & 1)
+                renderer.draw()
+                canvas.update_idletasks()
+        return run
+
+
+for _fixture in FIXTURES:
+    _register_draw_benchmarks(_fixture)
+
+
+# --- Running and comparing ---
+
+def run_benchmarks(pattern='', repeat=5, warmup=1, scale=1.0, log=None):
+    """
+    Runs every benchmark whose name contains `pattern`.
+
+    Args:
+        scale: Multiplies each benchmark's operation count (e.g. 0.1 for a quick run).
+        log: Optional file to print progress to.
+
+    Returns:
+        dict in the baseline format: {'meta': {...}, 'results': {name: {...}}}.
+    """
+    results = {}
+    for name, (setup, number) in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+        number = max(1, int(number * scale))
+        if setup(1) is None: # Needs something this machine lacks (a display)
+            results[name] = {'skipped': True}
+            if log:
+                print(f"{name:<40} skipped (no display)", file=log)
+            continue
+        timings = sorted(measure(setup, number, repeat, warmup))
+        results[name] = {
+            'min_ns': timings[0] * 1e9,
+            'median_ns': timings[len(timings) // 2] * 1e9,
+            'number': number,
+            'repeat': repeat,
+        }
+        if log:
+            print(f"{name:<40} {timings[0] * 1e9:>12,.0f} ns/op", file=log)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold, pattern=''):
+    """
+    Compares two result sets benchmark by benchmark.
+
+    Args:
+        pattern: Only baseline benchmarks whose name contains this are expected in `current`
+                 (the --filter the current run was made with).
+
+    Returns:
+        (rows, regressions, missing): rows of (name, baseline_ns, current_ns, ratio) for the
+        benchmarks present in both, the names slower than baseline * (1 + threshold), and
+        the expected baseline names absent from `current` (renamed or deleted benchmarks).
+    """
+    rows = []
+    regressions = []
+    missing = []
+    for name, old in baseline['results'].items():
+        if pattern not in name:
+            continue
+        new = current['results'].get(name)
+        if new is None:
+            missing.append(name)
+            continue
+        if old.get('skipped') or new.get('skipped'):
+            continue
+        ratio = new['min_ns'] / old['min_ns']
+        rows.append((name, old['min_ns'], new['min_ns'], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions, missing
+
+
+def _cmd_run(args):
+    results = run_benchmarks(args.filter, args.repeat, args.warmup, args.scale, log=sys.stdout)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.out}")
+    return 0
+
+
+def _cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_benchmarks(args.filter, args.repeat, args.warmup, args.scale)
+    rows, regressions, missing = compare(baseline, current, args.threshold, args.filter)
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, old, new, ratio in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f"{name:<40} {old:>12,.0f} {new:>12,.0f} {ratio - 1:>+8.1%}{flag}")
+    for name in missing:
+        print(f"{name:<40} {'':>12} {'':>12} {'':>8}  MISSING")
+    if regressions or missing:
+        if regressions:
+            print(f"{len(regressions)} of {len(rows)} benchmarks regressed by more than {args.threshold:.0%}")
+        if missing:
+            print(f"{len(missing)} baseline benchmarks missing from the current run (renamed or deleted? "
+                  f"record a new baseline)")
+        return 1
+    print(f"no regressions beyond {args.threshold:.0%} ({len(rows)} benchmarks)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine hot-path benchmarks with baselines.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('run', 'compare'):
+        sub = commands.add_parser(command)
+        if command == 'run':
+            sub.add_argument('--out', metavar='PATH', help="write the results as a baseline JSON file")
+            sub.set_defaults(func=_cmd_run)
+        else:
+            sub.add_argument('baseline', help="baseline JSON written by `run --out`")
+            sub.add_argument('--current', metavar='PATH', help="compare this results file instead of running now")
+            sub.add_argument('--threshold', type=float, default=0.10,
+                             help="allowed slowdown as a fraction (default 0.10 = 10%%)")
+            sub.set_defaults(func=_cmd_compare)
+        sub.add_argument('--filter', default='', help="only benchmarks whose name contains this")
+        sub.add_argument('--repeat', type=int, default=5, help="timed runs per benchmark (default 5)")
+        sub.add_argument('--warmup', type=int, default=1, help="untimed runs first (default 1)")
+        sub.add_argument('--scale', type=float, default=1.0, help="multiply operation counts (e.g. 0.1 for a smoke run)")
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Framebuffer renderer throughput at several resolutions.
+
+Records `--frames` ticks of a bot game as engine snapshots once, then for each
+resolution replays them (engine.restore, a few microseconds) and times
+  render    FrameRenderer.render() alone (incremental: only changed tiles),
+  full      render() after invalidate() every frame (every tile redrawn),
+  agent     render() plus copying the frame into an agent's observation buffer,
+  raw       render() plus writing rgb24 to a file,
+  y4m       render() (in YUV) plus writing a Y4M stream to a file,
+and reports frames per second and the multiple of real time (60 fps). The files
+go to --out-dir (default: a temporary directory, so real disk writes are
+included; use /dev/shm to exclude the disk).
+
+    python -m benchmarks.bench_framebuffer [--blocks 4 8 16 30 60] [--frames 600]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from tetris_engine import TetrisEngine
+from tetris_framebuffer import FrameRenderer, RawWriter, Y4MWriter, bot_ticks
+from tetris_timing import TICK_RATE
+
+
+def record_snapshots(frames, width, height, seed=0):
+    """Returns one engine snapshot per tick of a bot game."""
+    engine = TetrisEngine(seed=seed, backend='bitboard', width=width, height=height)
+    return [engine.snapshot() for _ in bot_ticks(engine, frames, seed=seed)]
+
+
+def bench_block_size(snapshots, width, height, block_size, out_dir):
+    """
+    Returns:
+        dict: seconds per frame for 'restore' (the replay overhead, not included
+        in the others), 'render', 'full', 'agent', 'raw' and 'y4m', plus the frame 'shape'.
+    """
+    engine = TetrisEngine(width=width, height=height)
+    results = {}
+
+    def run(name, frame, colorspace='rgb', before=None):
+        renderer = FrameRenderer(engine, block_size, colorspace=colorspace)
+        sink = before(renderer) if before else None
+        start = time.perf_counter()
+        for snapshot in snapshots:
+            engine.restore(snapshot)
+            frame(renderer, sink)
+        results[name] = (time.perf_counter() - start) / len(snapshots)
+        results['shape'] = renderer.frame.shape
+        if sink is not None and hasattr(sink, 'file'):
+            sink.close()
+            sink.file.close()
+
+    run('restore', lambda renderer, sink: None)
+    run('render', lambda renderer, sink: renderer.render())
+
+    def full(renderer, sink):
+        renderer.invalidate()
+        renderer.render()
+    run('full', full)
+    run('agent', lambda renderer, sink: np.copyto(sink, renderer.render()),
+        before=lambda renderer: np.empty_like(renderer.frame))
+    raw_path = os.path.join(out_dir, 'bench.rgb')
+    run('raw', lambda renderer, sink: sink.write(renderer.render()),
+        before=lambda renderer: RawWriter(open(raw_path, 'wb')))
+    y4m_path = os.path.join(out_dir, 'bench.y4m')
+    run('y4m', lambda renderer, sink: sink.write(renderer.render()), colorspace='yuv',
+        before=lambda renderer: Y4MWriter(open(y4m_path, 'wb'), renderer.width, renderer.height))
+    for path in (raw_path, y4m_path):
+        os.remove(path)
+    for name in ('render', 'full', 'agent', 'raw', 'y4m'):
+        results[name] = max(results[name] - results['restore'], 1e-9)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Framebuffer renderer throughput at several resolutions.")
+    parser.add_argument('--blocks', nargs='+', type=int, default=[4, 8, 16, 30, 60], help="cell sizes in pixels")
+    parser.add_argument('--size', default='10x20', metavar='WxH', help="board size in cells")
+    parser.add_argument('--frames', type=int, default=600, help="frames replayed per measurement")
+    parser.add_argument('--out-dir', help="directory for the raw/y4m files (default: a temporary directory)")
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    snapshots = record_snapshots(args.frames, width, height)
+    print(f"{args.size} board, {args.frames} frames; fps (x real time at {TICK_RATE} fps)")
+    print(f"{'block':>5} {'pixels':>10} {'render':>16} {'full':>16} {'agent':>16} {'raw':>16} {'y4m':>16}")
+    with tempfile.TemporaryDirectory(dir=args.out_dir) as out_dir:
+        for block_size in args.blocks:
+            r = bench_block_size(snapshots, width, height, block_size, out_dir)
+            rows, columns, _ = r['shape']
+            cells = ' '.join(f"{1 / r[name]:>9,.0f} ({1 / r[name] / TICK_RATE:>4.0f}x)"
+                             for name in ('render', 'full', 'agent', 'raw', 'y4m'))
+            print(f"{block_size:>5} {f'{columns}x{rows}':>10} {cells}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Renderer benchmark: frame time versus board area for both board renderers.
+
+For each board size, builds a TetrisEngine on a half-filled board and times
+  setup   creating the renderer and drawing the first full frame,
+  move    a frame in which the falling piece moved one column,
+  clear   a frame after a line clear (every row above it redrawn),
+for BoardRenderer ('items', one canvas rectangle per cell) and PhotoImageRenderer
+('photo', one image re-blitted row by row). Every frame includes Tk finishing
+the redraw (update_idletasks). Needs a display, e.g. under `xvfb-run`:
+
+    python -m benchmarks.bench_render [--sizes 10x20 50x100 200x400] [--frames 50]
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.fixtures import make_fixture
+from tetris_engine import TetrisEngine
+from tetris_render import BOARD_RENDERERS
+
+
+def bench_renderer(root, name, width, height, block_size, frames):
+    """
+    Returns:
+        dict of seconds: 'setup', and per frame 'move' and 'clear' (median).
+    """
+    import tkinter as tk
+    canvas = tk.Canvas(root, width=width * block_size, height=height * block_size)
+    canvas.pack()
+    engine = TetrisEngine(seed=0, width=width, height=height)
+    engine.reset(0)
+    engine.board = make_fixture('half', width=width, height=height)
+    start = time.perf_counter()
+    renderer = BOARD_RENDERERS[name](canvas, engine, block_size, ghost=True)
+    renderer.draw()
+    canvas.update_idletasks()
+    results = {'setup': time.perf_counter() - start}
+
+    def frame(change):
+        change()
+        start = time.perf_counter()
+        renderer.draw()
+        canvas.update_idletasks()
+        return time.perf_counter() - start
+
+    x = engine.current_x
+    moves = sorted(frame(lambda i=i: setattr(engine, 'current_x', x + (i & 1))) for i in range(frames))
+    results['move'] = moves[len(moves) // 2]
+
+    full = engine.board.copy() # The bottom row completed, as if a piece had just filled it
+    for c in range(width):
+        if full[height - 1][c] == '':
+            full.merge([[1]], c, height - 1, '#808080')
+    clears = []
+    for _ in range(frames):
+        board = full.copy()
+        def clear():
+            engine.board = board
+            board.clear_full_rows([height - 1])
+            renderer.mark_rows(range(height)) # As the engine's board_changed does after a clear
+        clears.append(frame(clear))
+    clears.sort()
+    results['clear'] = clears[len(clears) // 2]
+    canvas.destroy()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frame time versus board area for the board renderers.")
+    parser.add_argument('--sizes', nargs='+', default=['10x20', '20x40', '50x100', '100x200', '200x400'],
+                        metavar='WxH', help="board sizes in cells")
+    parser.add_argument('--block', type=int, default=2, help="cell size in pixels (default 2, to fit giant boards)")
+    parser.add_argument('--frames', type=int, default=30, help="timed frames per measurement")
+    parser.add_argument('--renderers', nargs='+', default=list(BOARD_RENDERERS), choices=list(BOARD_RENDERERS))
+    args = parser.parse_args(argv)
+
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"no display available ({exc}); run under a virtual display, e.g. xvfb-run", file=sys.stderr)
+        return 2
+    root.withdraw()
+
+    print(f"{'size':>9} {'cells':>7} {'renderer':>8} {'setup ms':>10} {'move ms':>9} {'clear ms':>9}")
+    for size in args.sizes:
+        width, height = (int(n) for n in size.lower().split('x'))
+        for name in args.renderers:
+            r = bench_renderer(root, name, width, height, args.block, args.frames)
+            print(f"{size:>9} {width * height:>7,} {name:>8} {r['setup'] * 1000:>10.1f} "
+                  f"{r['move'] * 1000:>9.2f} {r['clear'] * 1000:>9.2f}")
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Multiplayer server load test over loopback.
+
+Starts a TetrisServer in its own process (one event loop, i.e. one core), connects
+2 x `--games` clients from this process and has every client press random keys
+at a human-like rate, re-joining a new match whenever its match ends, so the
+server keeps hosting `--games` matches. After a warm-up it measures for
+`--seconds` and reports, from the server side:
+
+    tick time       how long one batched tick of all matches takes (percentiles)
+    tick lateness   how late ticks started compared to their fixed schedule
+    utilization     the fraction of wall time spent ticking, and from it the
+                    number of games one core sustains at the server's tick rate
+
+    python -m benchmarks.bench_server [--games 200] [--seconds 20] [--inputs 4]
+
+The clients share the machine with the server, so on a machine with few cores
+the lateness includes time the server process waited for the CPU.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from tetris_engine import ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP
+from tetris_profile import Histogram
+from tetris_server import TetrisServer, TetrisClient, MSG_RESULT
+
+# Random player: mostly sideways moves and rotations, some soft and hard drops
+INPUTS = (ACTION_LEFT, ACTION_LEFT, ACTION_RIGHT, ACTION_RIGHT, ACTION_ROTATE, ACTION_ROTATE,
+          ACTION_DOWN, ACTION_HARD_DROP)
+
+
+def _serve(connection, options):
+    """Server process: reports its port, then measures between the parent's 'start' and 'stop'."""
+    async def run():
+        server = TetrisServer(**options)
+        listener = await server.start('127.0.0.1', 0)
+        connection.send(listener.sockets[0].getsockname()[1])
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, connection.recv) # 'start'
+        server.tick_time = Histogram('tick_time') # Drop the warm-up
+        server.tick_lateness = Histogram('tick_lateness')
+        ticks, dropped, busy, finished = server.ticks, server.dropped_ticks, server.busy, server.matches_finished
+        start = time.perf_counter()
+        await loop.run_in_executor(None, connection.recv) # 'stop'
+        stats = server.stats()
+        stats.update(seconds=time.perf_counter() - start, ticks=server.ticks - ticks,
+                     dropped_ticks=server.dropped_ticks - dropped, busy_seconds=server.busy - busy,
+                     matches_finished=server.matches_finished - finished, tick_rate=server.tick_rate)
+        connection.send(stats)
+        await server.stop()
+
+    asyncio.run(run())
+
+
+async def _play(client, port, rate, rng, stop, started):
+    """One client: joins, presses random keys `rate` times per second and re-joins after every match."""
+    await client.connect('127.0.0.1', port)
+    client.join()
+
+    async def receive():
+        while not stop.is_set():
+            kind = await client.receive()
+            if kind is None:
+                return
+            if kind == MSG_RESULT:
+                client.join()
+            elif client.slot is not None and not started.done():
+                started.set_result(None)
+
+    async def press_keys():
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            await asyncio.sleep(rng.expovariate(rate))
+            action = rng.choice(INPUTS)
+            client.press(action)
+            if action in (ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN): # Held for a moment, sometimes past DAS
+                loop.call_later(rng.uniform(0.03, 0.3), client.release, action)
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(press_keys())]
+    await stop.wait()
+    for task in tasks:
+        task.cancel()
+    client.close()
+
+
+async def _load(port, games, rate, warmup, seconds, connection, seed):
+    rng = random.Random(seed)
+    stop = asyncio.Event()
+    clients = [TetrisClient(f'load{i}') for i in range(2 * games)]
+    started = [asyncio.get_running_loop().create_future() for _ in clients]
+    players = [asyncio.ensure_future(_play(client, port, rate, random.Random(rng.random()), stop, ready))
+               for client, ready in zip(clients, started)]
+    await asyncio.gather(*started) # Every client is in a match
+    await asyncio.sleep(warmup)
+    loop = asyncio.get_running_loop()
+    received = sum(client.bytes_received for client in clients)
+    connection.send('start')
+    await asyncio.sleep(seconds)
+    connection.send('stop')
+    stats = await loop.run_in_executor(None, connection.recv)
+    stats['bytes_per_client_second'] = (sum(c.bytes_received for c in clients) - received) / len(clients) / seconds
+    stop.set()
+    await asyncio.gather(*players, return_exceptions=True)
+    return stats
+
+
+def run_load_test(games=200, seconds=20, warmup=2, inputs=4, seed=0, server_options=None):
+    """
+    Returns:
+        The server's stats() for the measured period, plus 'seconds', 'tick_rate'
+        and 'bytes_per_client_second' (downstream traffic per client).
+    """
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=(child, dict(server_options or {}, seed=seed)), daemon=True)
+    server.start()
+    try:
+        port = parent.recv()
+        return asyncio.run(_load(port, games, inputs, warmup, seconds, parent, seed))
+    finally:
+        server.join(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the multiplayer server over loopback.")
+    parser.add_argument('--games', type=int, default=200, help="concurrent matches (two clients each)")
+    parser.add_argument('--seconds', type=float, default=20, help="measured duration")
+    parser.add_argument('--warmup', type=float, default=2, help="seconds before measuring")
+    parser.add_argument('--inputs', type=float, default=4, help="key presses per second per player")
+    parser.add_argument('--level', type=int, default=1, help="start level of every game")
+    parser.add_argument('--json', metavar='PATH', help="also write the full statistics")
+    args = parser.parse_args(argv)
+
+    stats = run_load_test(args.games, args.seconds, args.warmup, args.inputs,
+                          server_options={'start_level': args.level})
+    utilization = max(stats['busy_seconds'] / stats['seconds'], 1e-9)
+    tick, late = stats['tick_time'], stats['tick_lateness']
+    print(f"{args.games} matches ({2 * args.games} games), {stats['seconds']:.1f}s, "
+          f"{stats['ticks']} ticks at {stats['tick_rate']}/s, {stats['dropped_ticks']} dropped, "
+          f"{stats['matches_finished']} matches finished")
+    print(f"tick time     p50 {tick['p50_ms']} ms  p99 {tick['p99_ms']} ms  "
+          f"p99.9 {tick['p999_ms']} ms  max {tick['max_ms']} ms")
+    print(f"tick lateness p50 {late['p50_ms']} ms  p99 {late['p99_ms']} ms  "
+          f"p99.9 {late['p999_ms']} ms  max {late['max_ms']} ms")
+    print(f"server core {utilization:.1%} busy: ~{2 * args.games / utilization:,.0f} games per core sustained; "
+          f"{stats['bytes_per_client_second']:,.0f} bytes/s to each client")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(stats, games=2 * args.games, utilization=utilization), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded board fixtures shared by the benchmarks.
+
+Every fixture is built from a fixed seed, so the same name always gives the same
+board on every backend and every machine. No fixture row is completely full
+(clearing would otherwise change the board under the benchmark).
+"""
+import random
+
+from tetris_board import make_board
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, TETROMINOES
+
+FIXTURES = ('empty', 'half', 'jagged', 'near_top')
+
+
+def _fill_rows(cells, rng, width, first_row, height):
+    """Fills rows first_row .. height-1, leaving one random hole in each."""
+    for r in range(first_row, height):
+        hole = rng.randrange(width)
+        cells.extend((r, c) for c in range(width) if c != hole)
+
+
+def fixture_cells(name, width=BOARD_WIDTH, height=BOARD_HEIGHT, seed=0):
+    """
+    Returns the filled (row, column) cells of fixture `name`:
+
+        empty     nothing
+        half      the bottom half filled, one hole per row
+        jagged    random column heights up to 70% of the board, 10% holes
+        near_top  all but the top three rows filled, one hole per row
+    """
+    rng = random.Random(f'{name}/{seed}') # Independent stream per fixture
+    cells = []
+    if name == 'half':
+        _fill_rows(cells, rng, width, height // 2, height)
+    elif name == 'near_top':
+        _fill_rows(cells, rng, width, 3, height)
+    elif name == 'jagged':
+        for c in range(width):
+            top = height - rng.randint(0, height * 7 // 10)
+            cells.extend((r, c) for r in range(top, height) if rng.random() >= 0.1)
+        rows = {}
+        for r, c in cells:
+            rows.setdefault(r, []).append(c)
+        for r, columns in rows.items(): # Knock a hole into any row that came out full
+            if len(columns) == width:
+                cells.remove((r, rng.choice(columns)))
+    elif name != 'empty':
+        raise ValueError(f"unknown fixture {name!r}; choose from {', '.join(FIXTURES)}")
+    return cells
+
+
+def make_fixture(name, backend='list', width=BOARD_WIDTH, height=BOARD_HEIGHT, seed=0):
+    """Returns a new board of the given backend holding fixture `name`, in seeded colors."""
+    board = make_board(backend, width, height)
+    rng = random.Random(f'{name}/{seed}/colors')
+    colors = [piece['color'] for piece in TETROMINOES.values()]
+    for r, c in fixture_cells(name, width, height, seed):
+        board.merge([[1]], c, r, rng.choice(colors))
+    return board
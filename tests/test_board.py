@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+ListBoard and BitBoard must be interchangeable: identical answers to every
+query and identical contents after every change, on any board size.
+"""
+import random
+import unittest
+
+from tetris_board import BOARD_BACKENDS, make_board
+from tetris_config import COLORS, TETROMINOES
+from tetris_engine import TetrisEngine
+from tetris_pieces import ROTATIONS
+
+STATES = [state for key in TETROMINOES for state in ROTATIONS[key]]
+
+
+def random_stack(boards, rng, fill=0.7):
+    """Merges the same jagged stack with overhangs into every board of `boards`."""
+    width, height = boards[0].width, boards[0].height
+    for c in range(width):
+        for r in range(height - rng.randint(0, height * 2 // 3), height):
+            if rng.random() < fill:
+                for board in boards:
+                    board.merge([[1]], c, r, COLORS['G'])
+
+
+def assert_same(test, list_board, bit_board):
+    """Fails unless a ListBoard and a BitBoard hold the same colors, fill counts and height profile."""
+    test.assertTrue(bit_board == list_board)
+    test.assertEqual(list_board.heights, bit_board.heights)
+    test.assertEqual(list_board.row_counts, [bin(bits).count('1') for bits in bit_board.rows])
+
+
+class TestBackendEquivalence(unittest.TestCase):
+
+    def boards(self, width=10, height=20):
+        return make_board('list', width, height), make_board('bitboard', width, height)
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            make_board('no_such_backend')
+
+    def test_collision_and_drop_queries_agree(self):
+        rng = random.Random(0)
+        for width, height in ((10, 20), (4, 4), (17, 9)):
+            boards = self.boards(width, height)
+            random_stack(boards, rng)
+            for _ in range(3000):
+                piece = rng.choice(STATES)
+                x, y = rng.randint(-3, width), rng.randint(-3, height)
+                answers = [board.collides(piece, x, y) for board in boards]
+                self.assertEqual(answers[0], answers[1], (piece, x, y))
+                # Shape matrices are accepted too and give the same answers
+                self.assertEqual(boards[1].collides([list(row) for row in piece.matrix], x, y), answers[1])
+                if not answers[0]:
+                    self.assertEqual(boards[0].drop_position(piece, x, y), boards[1].drop_position(piece, x, y))
+
+    def test_merges_and_line_clears_agree(self):
+        rng = random.Random(1)
+        boards = self.boards()
+        for _ in range(400):
+            piece = rng.choice(STATES)
+            x = rng.randint(-piece.left, boards[0].width - 1 - piece.right)
+            if boards[0].collides(piece, x, 0):
+                boards = self.boards() # Topped out: start over
+                continue
+            y = boards[0].drop_position(piece, x, 0)
+            for board in boards:
+                board.merge(piece, x, y, piece.color)
+            rows = range(y + piece.top, y + piece.bottom + 1)
+            self.assertEqual(boards[0].clear_full_rows(rows), boards[1].clear_full_rows(rows))
+            assert_same(self, *boards)
+            self.assertEqual([board.clear_full_rows() for board in boards], [0, 0]) # Nothing full is left behind
+
+    def test_set_rows_agrees(self):
+        rng = random.Random(2)
+        boards = self.boards()
+        random_stack(boards, rng)
+        colors = ['', COLORS['I'], COLORS['T'], COLORS['G']]
+        for _ in range(50):
+            rows = {r: [rng.choice(colors) for _ in range(10)] for r in rng.sample(range(20), rng.randint(1, 5))}
+            for board in boards:
+                board.set_rows({r: row[:] for r, row in rows.items()})
+            assert_same(self, *boards)
+            self.assertEqual(boards[0].clear_full_rows(), boards[1].clear_full_rows())
+            assert_same(self, *boards)
+
+    def test_copies_are_independent(self):
+        for backend in BOARD_BACKENDS:
+            board = make_board(backend)
+            copy = board.copy()
+            copy.merge(ROTATIONS['O'][0], 0, 18, COLORS['O'])
+            self.assertEqual(board.heights, [0] * 10)
+            self.assertTrue(all(cell == '' for row in board for cell in row))
+            self.assertNotEqual(board.key(), copy.key())
+
+    def test_seeded_games_play_identically_on_both_backends(self):
+        rng = random.Random(3)
+        script = [rng.choice((1, 1, 2, 2, 3, 4, 5)) for _ in range(3000)]
+        engines = [TetrisEngine(seed=7, backend=backend) for backend in ('list', 'bitboard')]
+        for engine in engines:
+            engine.reset(7)
+        for action in script:
+            for engine in engines:
+                if engine.game_over:
+                    engine.reset()
+                engine.act(action)
+                engine.step()
+            self.assertEqual(engines[0].state_key, engines[1].state_key)
+            self.assertEqual(engines[0].score, engines[1].score)
+        assert_same(self, engines[0].board, engines[1].board)
+
+
+if __name__ == '__main__':
+    unittest.main()
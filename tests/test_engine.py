@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Behavior checks for the headless TetrisEngine: spawning, movement, locking,
+line clears and scoring, events and seeded determinism.
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, COLORS, POINTS_PER_LINE, TETRIS_BONUS
+from tetris_engine import TetrisEngine, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_HARD_DROP
+from tetris_pieces import ROTATIONS
+
+
+def fill_row(engine, row, gaps=()):
+    """Fills board row `row` with grey blocks, except the columns in `gaps`."""
+    for c in range(engine.width):
+        if c not in gaps:
+            engine.board.merge([[1]], c, row, COLORS['G'])
+
+
+def place_piece(engine, key, rotation, x, y):
+    """Makes the falling piece `key` in `rotation` at (x, y)."""
+    engine.current_piece = ROTATIONS[key][rotation]
+    engine.current_color = COLORS[key]
+    engine.current_x, engine.current_y = x, y
+
+
+class TestEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = TetrisEngine(seed=1)
+        self.engine.reset(1)
+
+    def test_reset_spawns_a_piece_on_an_empty_board(self):
+        engine = self.engine
+        self.assertIsNotNone(engine.current_piece)
+        self.assertFalse(engine.game_over)
+        self.assertEqual(engine.score, 0)
+        self.assertEqual(engine.column_heights, [0] * BOARD_WIDTH)
+        self.assertTrue(all(cell == '' for row in engine.board for cell in row))
+
+    def test_moves_stop_at_the_walls(self):
+        engine = self.engine
+        while engine.move_left():
+            pass
+        self.assertEqual(engine.current_x + engine.current_piece.left, 0)
+        while engine.move_right():
+            pass
+        self.assertEqual(engine.current_x + engine.current_piece.right, BOARD_WIDTH - 1)
+
+    def test_gravity_moves_down_then_locks_and_spawns(self):
+        engine = self.engine
+        spawned = []
+        engine.on('piece_spawned', lambda: spawned.append(engine.current_piece.key))
+        expected_next = engine.piece_queue[0]
+        y = engine.current_y
+        self.assertTrue(engine.step())
+        self.assertEqual(engine.current_y, y + 1)
+        while engine.step():
+            pass
+        self.assertEqual(spawned, [expected_next])
+        self.assertEqual(sum(cell != '' for row in engine.board for cell in row), 4)
+
+    def test_hard_drop_lands_where_the_ghost_is(self):
+        engine = self.engine
+        key, x, ghost = engine.current_piece.key, engine.current_x, engine.ghost_y()
+        piece = engine.current_piece
+        engine.act(ACTION_HARD_DROP)
+        for r, c in piece.cells:
+            self.assertEqual(engine.board[ghost + r][x + c], COLORS[key])
+        self.assertEqual(ghost + piece.bottom, BOARD_HEIGHT - 1)
+
+    def test_single_line_clear_scores_and_shifts_rows_down(self):
+        engine = self.engine
+        fill_row(engine, BOARD_HEIGHT - 1, gaps=range(3, 7))
+        fill_row(engine, BOARD_HEIGHT - 2, gaps=(0, 3, 4, 5, 6))
+        place_piece(engine, 'I', 0, 3, 0) # Flat I over the four-wide gap
+        cleared = []
+        engine.on('lines_cleared', cleared.append)
+        engine.hard_drop()
+        self.assertEqual(cleared, [1])
+        self.assertEqual(engine.score, POINTS_PER_LINE)
+        self.assertEqual(engine.board[BOARD_HEIGHT - 1][0], '') # The row above fell into place
+        self.assertEqual(engine.board[BOARD_HEIGHT - 1][1], COLORS['G'])
+        self.assertTrue(all(cell == '' for cell in engine.board[BOARD_HEIGHT - 2]))
+
+    def test_tetris_scores_the_bonus(self):
+        engine = self.engine
+        for row in range(BOARD_HEIGHT - 4, BOARD_HEIGHT):
+            fill_row(engine, row, gaps=(9,))
+        place_piece(engine, 'I', 1, 7, 0) # Upright I above column 9
+        self.assertEqual(engine.hard_drop(), 4)
+        self.assertEqual(engine.score, 4 * POINTS_PER_LINE + TETRIS_BONUS)
+        self.assertEqual(engine.column_heights, [0] * BOARD_WIDTH)
+
+    def test_rotation_kicks_off_the_wall(self):
+        engine = self.engine
+        place_piece(engine, 'I', 1, -2, 5) # Upright I against the left wall
+        self.assertTrue(engine.rotate_piece())
+        self.assertEqual(engine.current_piece.rotation, 2)
+        self.assertGreaterEqual(engine.current_x + engine.current_piece.left, 0)
+        self.assertFalse(engine.check_collision(engine.current_piece, engine.current_x, engine.current_y))
+
+    def test_blocked_spawn_ends_the_game(self):
+        engine = self.engine
+        over = []
+        engine.on('game_over', lambda: over.append(True))
+        for row in range(BOARD_HEIGHT):
+            fill_row(engine, row, gaps=(row % BOARD_WIDTH,))
+        self.assertFalse(engine.spawn_piece())
+        self.assertTrue(engine.game_over)
+        self.assertEqual(over, [True])
+        self.assertFalse(engine.step())
+
+    def test_equal_seeds_play_equal_games(self):
+        rng = random.Random(5)
+        script = [rng.choice((ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_HARD_DROP)) for _ in range(400)]
+        results = []
+        for _ in range(2):
+            engine = TetrisEngine(seed=42)
+            engine.reset(42)
+            for action in script:
+                if engine.game_over:
+                    break
+                engine.act(action)
+                engine.step()
+            results.append((engine.score, [list(row) for row in engine.board], engine.state_key))
+        self.assertEqual(results[0], results[1])
+
+    def test_unknown_action_raises(self):
+        with self.assertRaises(ValueError):
+            self.engine.act(9)
+
+    def test_unknown_event_raises(self):
+        with self.assertRaises(ValueError):
+            self.engine.on('no_such_event', lambda: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Two rollback peers over a lossy, delayed link must end in the same state, and that
+state must be the one a plain simulation of the inputs they actually played gives:
+predictions and rollbacks may change when a frame is computed, never its result.
+"""
+import random
+import unittest
+
+from tetris_engine import ACTION_LEFT, ACTION_HARD_DROP
+from tetris_rollback import (
+    INPUT_HARD_DROP, INPUT_LEFT, InputState, RandomPlayer, RollbackSession, VersusState, simulate, simulated_pair,
+)
+from tetris_timing import TICK_RATE
+
+
+def play_pair(frames, seed=0, latency=0.08, jitter=0.04, loss=0.2, input_delay=2, max_prediction=8):
+    """
+    Plays two sessions against each other with random players for `frames` ticks of
+    virtual time, then drains the link (lossless) until both sides reach the same
+    frame with every remote input confirmed.
+
+    Returns:
+        (sessions, played): played[player] is the list of input bytes that player
+        queued, in order (the input of frame input_delay + i is played[player][i]).
+    """
+    now = [0.0]
+    links = simulated_pair(lambda: now[0], latency, jitter, loss, seed)
+    sessions = [RollbackSession(player, seed, links[player], input_delay, max_prediction) for player in (0, 1)]
+    rng = random.Random(seed + 1)
+    players = [RandomPlayer(random.Random(rng.random())) for _ in sessions]
+    played = [[], []]
+    pending = [None, None] # An input that stalled is offered again next frame
+
+    def advance(i, bits):
+        sent = sessions[i].local_sent
+        done = sessions[i].advance(bits)
+        if sessions[i].local_sent != sent: # The input was queued (a stalled frame queues it only once)
+            played[i].append(bits)
+        return done
+
+    for tick in range(frames):
+        now[0] = tick / TICK_RATE
+        for i, session in enumerate(sessions):
+            if session.state.over:
+                continue
+            if pending[i] is None:
+                pending[i] = players[i].frame_input()
+            if advance(i, pending[i]):
+                pending[i] = None
+        if all(session.state.over for session in sessions):
+            break
+
+    for link in links:
+        link.loss = 0
+    target = max(session.frame for session in sessions)
+    for _ in range(10 * TICK_RATE):
+        now[0] += 1 / TICK_RATE
+        for i, session in enumerate(sessions):
+            if session.frame < target:
+                advance(i, 0)
+            else:
+                session.poll()
+        if all(s.frame == target and s.remote_confirmed >= target - 1 for s in sessions):
+            break
+    return sessions, played
+
+
+def replay(seed, played, frames, input_delay=2):
+    """Simulates `frames` frames of the played inputs directly, without prediction; returns the state."""
+    state = VersusState(seed)
+    for frame in range(frames):
+        inputs = [0, 0]
+        for player in (0, 1):
+            index = frame - input_delay
+            if 0 <= index < len(played[player]):
+                inputs[player] = played[player][index]
+        state.step(inputs)
+    return state
+
+
+class TestRollback(unittest.TestCase):
+
+    def test_peers_match_direct_simulation(self):
+        for seed, loss in ((0, 0.0), (1, 0.1), (2, 0.3)):
+            with self.subTest(seed=seed, loss=loss):
+                sessions, played = play_pair(900, seed=seed, loss=loss)
+                frame = sessions[0].frame
+                self.assertEqual(sessions[1].frame, frame)
+                self.assertGreater(frame, 100)
+                self.assertGreater(sum(s.rollbacks for s in sessions), 0) # Predictions did go wrong
+                self.assertEqual(sessions[0].state.checksum(), sessions[1].state.checksum())
+                self.assertEqual(sessions[0].state.checksum(), replay(seed, played, frame).checksum())
+
+    def test_rollback_depth_bounded(self):
+        sessions, _ = play_pair(900, seed=3, latency=0.15, jitter=0.1, loss=0.3, max_prediction=6)
+        for session in sessions:
+            stats = session.stats()
+            self.assertLessEqual(stats['max_depth'], 6 + 1) # Bounded by max_prediction (plus the frame in flight)
+            self.assertGreater(stats['stalls'], 0) # That much latency makes the peers wait
+        self.assertEqual(sessions[0].state.checksum(), sessions[1].state.checksum())
+
+    def test_simulate_reports_sync(self):
+        for seed in range(3):
+            result = simulate(frames=600, latency=0.1, jitter=0.05, loss=0.15, seed=seed)
+            self.assertTrue(result['in_sync'], seed)
+            self.assertGreater(sum(result['packets_lost']), 0)
+
+    def test_history_must_cover_prediction(self):
+        link, _ = simulated_pair(lambda: 0.0)
+        with self.assertRaises(ValueError):
+            RollbackSession(0, 1, link, input_delay=2, max_prediction=8, history=10)
+
+    def test_input_state(self):
+        keys = InputState()
+        keys.press(ACTION_LEFT)
+        keys.press(ACTION_HARD_DROP)
+        self.assertEqual(keys.frame_input(), INPUT_LEFT | INPUT_HARD_DROP)
+        self.assertEqual(keys.frame_input(), INPUT_LEFT) # Held keys stay, presses last one frame
+        keys.release(ACTION_LEFT)
+        self.assertEqual(keys.frame_input(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
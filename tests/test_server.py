@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Wire format checks: framing round-trips, and malformed or truncated messages are
+dropped (by the client and by the server) without disturbing the state they would
+have changed or the connection they arrived on.
+"""
+import asyncio
+import unittest
+
+from tetris_server import (
+    FIXED_SIZES, HEADER, MAX_PAYLOAD, MSG_JOIN, MSG_PIECE, MSG_PRESS, MSG_QUEUE, MSG_RELEASE, MSG_RESULT,
+    MSG_ROWS, MSG_STATS, MSG_TICK, MSG_WELCOME, PIECE, ROW, STATS, TICK, WELCOME,
+    TetrisClient, TetrisServer, pack_message, read_message, rows_payload_size,
+)
+
+
+def stream(*messages):
+    """Returns a StreamReader holding `messages` (bytes) followed by end of stream."""
+    reader = asyncio.StreamReader()
+    for message in messages:
+        reader.feed_data(message)
+    reader.feed_eof()
+    return reader
+
+
+def rows(slot, *entries, width=4):
+    """ROWS payload for `slot` with (row, cell code) entries, each filling a whole row."""
+    payload = bytes((slot,))
+    for r, code in entries:
+        payload += ROW.pack(r) + bytes((code,)) * width
+    return payload
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_pack_message_header(self):
+        message = pack_message(MSG_JOIN, b'abc')
+        self.assertEqual(HEADER.unpack_from(message), (MSG_JOIN, 3))
+        self.assertEqual(message[HEADER.size:], b'abc')
+        self.assertEqual(pack_message(MSG_PRESS), HEADER.pack(MSG_PRESS, 0))
+
+    def test_payload_limit(self):
+        self.assertEqual(len(pack_message(MSG_ROWS, bytes(MAX_PAYLOAD))), HEADER.size + MAX_PAYLOAD)
+        with self.assertRaises(ValueError):
+            pack_message(MSG_ROWS, bytes(MAX_PAYLOAD + 1))
+
+    def test_oversized_board_rejected(self):
+        self.assertEqual(rows_payload_size(10, 20), 1 + 20 * (ROW.size + 10))
+        TetrisServer(width=10, height=20)
+        with self.assertRaises(ValueError):
+            TetrisServer(width=200, height=400) # A full-board update would not fit one message
+
+
+class TestReadMessage(unittest.IsolatedAsyncioTestCase):
+
+    async def test_round_trip(self):
+        reader = stream(pack_message(MSG_TICK, TICK.pack(7)), pack_message(MSG_PRESS, b'\x02'))
+        self.assertEqual(await read_message(reader), (MSG_TICK, TICK.pack(7)))
+        self.assertEqual(await read_message(reader), (MSG_PRESS, b'\x02'))
+        self.assertIsNone(await read_message(reader)) # End of stream
+
+    async def test_truncated_header(self):
+        self.assertIsNone(await read_message(stream(pack_message(MSG_TICK, TICK.pack(7))[:2])))
+
+    async def test_truncated_payload(self):
+        message = pack_message(MSG_ROWS, rows(0, (3, 1)))
+        self.assertIsNone(await read_message(stream(message[:-1])))
+
+
+class TestClientReceive(unittest.IsolatedAsyncioTestCase):
+    """The client applies well-formed messages and ignores malformed ones, returning their type either way."""
+
+    async def receive_all(self, *messages):
+        """Feeds `messages` to a fresh client that has been WELCOMEd to a 4x6 game, and returns it."""
+        client = TetrisClient()
+        client.reader = stream(pack_message(MSG_WELCOME, WELCOME.pack(1, 9, 4, 6, 123)), *messages)
+        self.assertEqual(await client.receive(), MSG_WELCOME)
+        for message in messages:
+            self.assertEqual(await client.receive(), message[0])
+        self.assertIsNone(await client.receive())
+        return client
+
+    async def test_welcome_and_deltas(self):
+        client = await self.receive_all(
+            pack_message(MSG_TICK, TICK.pack(42)),
+            pack_message(MSG_ROWS, rows(0, (5, 3), (2, 1))),
+            pack_message(MSG_PIECE, PIECE.pack(1, 5, 2, 3, -1)),
+            pack_message(MSG_QUEUE, bytes((1, 0, 6, 3))),
+            pack_message(MSG_STATS, STATS.pack(0, 1200, 12, 2, 3)),
+            pack_message(MSG_RESULT, bytes((1,))),
+        )
+        self.assertEqual((client.slot, client.match_id, client.width, client.height), (1, 9, 4, 6))
+        self.assertEqual(client.tick, 42)
+        self.assertEqual(client.boards[0][5], bytearray(b'\x03' * 4))
+        self.assertEqual(client.boards[0][2], bytearray(b'\x01' * 4))
+        self.assertEqual(client.boards[1], [bytearray(4)] * 6)
+        self.assertEqual(client.pieces[1], ('T', 2, 3, -1))
+        self.assertEqual(client.queues[1], ['I', 'Z', 'O'])
+        self.assertEqual(client.stats[0], {'score': 1200, 'lines': 12, 'level': 2, 'pending_garbage': 3})
+        self.assertEqual(client.result, 1)
+
+    async def test_wrong_size_fixed_messages(self):
+        for kind, size in FIXED_SIZES.items():
+            if kind == MSG_WELCOME:
+                continue
+            for payload in (b'', bytes(size - 1), bytes(size + 1)):
+                with self.subTest(kind=kind, size=len(payload)):
+                    client = await self.receive_all(pack_message(kind, payload))
+                    self.assertEqual((client.tick, client.pieces, client.stats), (0, {}, {}))
+        client = await self.receive_all(pack_message(MSG_WELCOME, bytes(WELCOME.size - 1)))
+        self.assertEqual((client.slot, client.width, client.height), (1, 4, 6)) # Still the first WELCOME
+
+    async def test_empty_payloads(self):
+        client = await self.receive_all(pack_message(MSG_ROWS), pack_message(MSG_QUEUE), pack_message(MSG_RESULT))
+        self.assertEqual(client.boards[0], [bytearray(4)] * 6)
+        self.assertEqual(client.queues, {})
+        self.assertIsNone(client.result)
+
+    async def test_unknown_slot(self):
+        client = await self.receive_all(pack_message(MSG_ROWS, rows(7, (0, 1))),
+                                        pack_message(MSG_QUEUE, bytes((7, 0, 1))))
+        self.assertEqual(sorted(client.boards), [0, 1])
+        self.assertEqual(client.queues, {})
+
+    async def test_rows_before_welcome(self):
+        client = TetrisClient()
+        client.reader = stream(pack_message(MSG_ROWS, rows(0, (0, 1))), pack_message(MSG_QUEUE, bytes((0, 1))))
+        self.assertEqual(await client.receive(), MSG_ROWS)
+        self.assertEqual(await client.receive(), MSG_QUEUE)
+        self.assertEqual((client.boards, client.queues), ({}, {}))
+
+    async def test_truncated_and_out_of_range_rows(self):
+        payload = rows(0, (1, 2), (6, 5), (60000, 5), (3, 4))
+        client = await self.receive_all(pack_message(MSG_ROWS, payload[:-1])) # Last row cut short
+        self.assertEqual(client.boards[0], [bytearray(4), bytearray(b'\x02' * 4)] + [bytearray(4)] * 4)
+
+    async def test_bad_piece_indices(self):
+        client = await self.receive_all(pack_message(MSG_PIECE, PIECE.pack(0, -1, 0, 0, 0)),
+                                        pack_message(MSG_QUEUE, bytes((0, 3, 7, 200, 1))))
+        self.assertIsNone(client.pieces[0])
+        self.assertEqual(client.queues[0], ['O', 'J']) # Indices past the seven pieces are skipped
+
+    async def test_unknown_kind(self):
+        client = await self.receive_all(pack_message(99, b'junk'))
+        self.assertEqual(client.boards[0], [bytearray(4)] * 6)
+
+
+class TestServerInputs(unittest.IsolatedAsyncioTestCase):
+
+    async def test_malformed_inputs_ignored(self):
+        server = TetrisServer(seed=1, tick_rate=1000)
+        listener = await server.start('127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        clients = [TetrisClient(name) for name in ('good', 'bad')]
+        try:
+            for client in clients:
+                await client.connect('127.0.0.1', port)
+                client.join()
+            for client in clients:
+                while await asyncio.wait_for(client.receive(), 5) != MSG_WELCOME:
+                    pass
+            match, = server.matches.values()
+            player = next(p for p in match.players if p.name == 'bad')
+            bad = clients[1]
+            server._tick_task.cancel() # Hold the inputs where they can be inspected
+            bad.writer.write(pack_message(MSG_PRESS) + pack_message(MSG_RELEASE, b'\x01\x02')
+                             + pack_message(MSG_PRESS, b'\xff') + pack_message(MSG_PRESS, b'\x01'))
+            await bad.writer.drain()
+            for _ in range(100):
+                if player.inputs:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(player.inputs, [(MSG_PRESS, 1)]) # Only the well-formed press
+            self.assertTrue(player.connected)
+        finally:
+            for client in clients:
+                client.close()
+            await server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
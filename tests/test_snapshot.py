@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshots must capture the whole game: restoring one (into the same engine, a
+clone, or an engine of the other backend) and playing on gives exactly the game
+that was played from the moment it was taken.
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from tetris_config import COLORS
+from tetris_engine import TetrisEngine
+from tetris_snapshot import GameSnapshot, SnapshotStore, snapshot_size
+
+
+def play(engine, script):
+    """Plays `script` (one action plus one gravity tick each) and returns the visible state after it."""
+    for action in script:
+        if engine.game_over:
+            break
+        engine.act(action)
+        engine.step()
+    return (engine.state_key, engine.score, engine.game_over, [list(row) for row in engine.board],
+            list(engine.preview(7)))
+
+
+def random_script(seed, length):
+    rng = random.Random(seed)
+    return [rng.choice((1, 1, 2, 2, 3, 4, 4, 5)) for _ in range(length)]
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = TetrisEngine(seed=11)
+        self.engine.reset(11)
+        for i in range(16): # Some settled blocks spread over the board, and a couple of used-up bags
+            self.engine.act(4 * (i % 3 == 0))
+            for _ in range(i % 5):
+                self.engine.move(-1 if i % 2 else 1)
+            self.engine.hard_drop()
+        self.assertFalse(self.engine.game_over)
+
+    def test_restore_rewinds_the_game(self):
+        engine = self.engine
+        snapshot = engine.snapshot()
+        script = random_script(1, 400)
+        first = play(engine, script)
+        engine.restore(snapshot)
+        self.assertEqual(engine.snapshot(), snapshot)
+        self.assertEqual(play(engine, script), first)
+
+    def test_restore_into_other_backends_and_clones(self):
+        snapshot = self.engine.snapshot()
+        script = random_script(2, 400)
+        expected = play(self.engine.clone(), script)
+        for backend in ('list', 'bitboard'):
+            other = TetrisEngine(seed=0, backend=backend)
+            other.reset(0)
+            other.restore(snapshot)
+            self.assertEqual(play(other, script), expected, backend)
+        self.assertEqual(self.engine.snapshot(), snapshot) # Playing the clone left the original alone
+
+    def test_unchanged_rows_are_shared(self):
+        engine = self.engine
+        before = engine.snapshot()
+        engine.move_left()
+        engine.move_right()
+        after = engine.snapshot()
+        self.assertTrue(all(a is b for a, b in zip(before.rows, after.rows)))
+        engine.hard_drop()
+        dropped = engine.snapshot()
+        self.assertTrue(any(a is b for a, b in zip(after.rows, dropped.rows))) # The top rows did not change
+        self.assertNotEqual(after.rows, dropped.rows)
+
+    def test_snapshots_are_immutable(self):
+        snapshot = self.engine.snapshot()
+        with self.assertRaises(AttributeError):
+            snapshot.score = 1
+
+    def test_bytes_round_trip(self):
+        engine = self.engine
+        engine.add_garbage(2, hole=3) # Grey cells have their own code
+        snapshot = engine.snapshot()
+        blob = snapshot.to_bytes()
+        self.assertEqual(len(blob), snapshot_size(engine.width, engine.height))
+        copy = GameSnapshot.from_bytes(blob)
+        self.assertEqual(copy, snapshot)
+        self.assertEqual(hash(copy), hash(snapshot))
+        self.assertEqual((copy.piece, copy.x, copy.y, copy.score, copy.game_over, copy.bag),
+                         (snapshot.piece, snapshot.x, snapshot.y, snapshot.score, snapshot.game_over,
+                          (snapshot.bag[0] & (2 ** 64 - 1),) + snapshot.bag[1:]))
+        other = TetrisEngine(seed=0)
+        other.restore(copy)
+        self.assertEqual(other.board[engine.height - 1][0], COLORS['G'])
+        self.assertEqual(other.snapshot(), snapshot)
+
+    def test_truncated_blob_raises(self):
+        blob = self.engine.snapshot().to_bytes()
+        with self.assertRaises(ValueError):
+            GameSnapshot.from_bytes(blob[:-1])
+
+    def test_size_mismatch_raises(self):
+        small = TetrisEngine(seed=0, width=6, height=8)
+        small.reset(0)
+        with self.assertRaises(ValueError):
+            self.engine.restore(small.snapshot())
+
+    def test_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'store.bin')
+            snapshots = []
+            with SnapshotStore(path, capacity=8) as store:
+                for i in range(0, 8, 2):
+                    play(self.engine, random_script(i, 20))
+                    snapshots.append(self.engine.snapshot())
+                    store[i] = snapshots[-1]
+                self.assertIsNone(store[1])
+                with self.assertRaises(IndexError):
+                    store[8]
+            with SnapshotStore(path, capacity=8) as store: # Reopened from disk
+                self.assertEqual([store[i] for i in range(0, 8, 2)], snapshots)
+
+
+if __name__ == '__main__':
+    unittest.main()
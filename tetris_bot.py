@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Built-in autoplayer: heuristic board evaluation plus beam search over the piece preview.
+
+For the falling piece and the next `lookahead` pieces from the queue, every reachable
+placement (tetris_placement) is scored with a weighted sum of classic board features:
+aggregate height, holes, bumpiness, well depth and lines cleared. Only the best
+`beam_width` boards survive each level, and boards reached twice (by different
+placement orders) are recognised through a Zobrist-hashed transposition table so
+they are expanded and evaluated only once. The search stops deepening when the
+per-move time budget runs out and plays the first placement of the best line.
+
+The bot can drive a live TetrisGame (`TetrisGame(root, bot=TetrisBot())`) or play
+headless games with `play_game()`.
+"""
+import random
+import time
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT
+from tetris_engine import TetrisEngine
+from tetris_pieces import ROTATIONS
+from tetris_placement import PlacementCache, spawn_position
+from tetris_random import mix64
+
+# Feature weights of the evaluator (tuned by genetic search in the classic
+# "near perfect Tetris bot" write-ups; wells added with a small penalty).
+DEFAULT_WEIGHTS = {
+    'aggregate_height': -0.510066,
+    'lines': 0.760666,
+    'holes': -0.35663,
+    'bumpiness': -0.184483,
+    'wells': -0.05,
+}
+
+# --- Zobrist hashing ---
+# Every cell gets a random 64-bit key and a board hashes to the XOR of the keys of
+# its filled cells. For speed the keys are pre-combined per row: ZOBRIST_ROWS[r][mask]
+# is the XOR of the keys of the cells set in `mask` on row r, so hashing costs one
+# table lookup per row.
+_zobrist_rng = random.Random(0x7E7215) # Fixed seed: hashes are stable between runs
+ZOBRIST_CELLS = [[_zobrist_rng.getrandbits(64) for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+
+
+def _row_table(cell_keys):
+    """Returns the XOR of `cell_keys` for every subset mask of a row."""
+    table = [0] * (1 << len(cell_keys))
+    for mask in range(1, len(table)):
+        low = mask & -mask # Lowest set bit
+        table[mask] = table[mask ^ low] ^ cell_keys[low.bit_length() - 1]
+    return table
+
+
+ZOBRIST_ROWS = [_row_table(keys) for keys in ZOBRIST_CELLS]
+
+
+def occupancy_rows(board):
+    """Returns the board as a list of row bitmasks (bit c set = column c filled)."""
+    rows = getattr(board, 'rows', None) # BitBoard keeps them already
+    if rows is not None:
+        return rows
+    return [sum(1 << c for c, cell in enumerate(row) if cell != '') for row in board]
+
+
+def zobrist_hash(board):
+    """Returns the 64-bit Zobrist hash of the board's occupancy."""
+    rows = occupancy_rows(board)
+    h = 0
+    if len(rows) <= BOARD_HEIGHT and board.width == BOARD_WIDTH:
+        for table, row in zip(ZOBRIST_ROWS, rows):
+            h ^= table[row]
+    else: # Non-standard board size: derive each cell's key on the fly
+        for r, row in enumerate(rows):
+            c = 0
+            while row:
+                if row & 1:
+                    h ^= mix64((r << 16) | c)
+                row >>= 1
+                c += 1
+    return h
+
+
+def board_features(board):
+    """
+    Computes the evaluator's features for a board.
+
+    Returns:
+        dict with 'aggregate_height', 'holes', 'bumpiness' and 'wells'.
+    """
+    rows = occupancy_rows(board)
+    width, height = board.width, len(rows)
+    heights = [0] * width
+    seen = 0 # Columns that already have a block above the current row
+    holes = 0
+    for r, row in enumerate(rows):
+        new = row & ~seen
+        if new: # Columns whose highest block is on this row
+            seen |= row
+            c = 0
+            while new:
+                if new & 1:
+                    heights[c] = height - r
+                new >>= 1
+                c += 1
+        holes += bin(seen & ~row).count('1') # Empty cells under a block
+    bumpiness = sum(abs(heights[c] - heights[c + 1]) for c in range(width - 1))
+    wells = 0
+    for c in range(width):
+        left = heights[c - 1] if c > 0 else height # Walls count as infinitely tall neighbours
+        right = heights[c + 1] if c < width - 1 else height
+        depth = min(left, right) - heights[c]
+        if depth > 0:
+            wells += depth
+    return {
+        'aggregate_height': sum(heights),
+        'holes': holes,
+        'bumpiness': bumpiness,
+        'wells': wells,
+    }
+
+
+class _Node:
+    """One board in the beam."""
+    __slots__ = ('board', 'value', 'reward', 'first')
+
+    def __init__(self, board, value, reward, first):
+        self.board = board
+        self.value = value # reward + evaluation of the board
+        self.reward = reward # Accumulated line-clear reward along the way
+        self.first = first # Placement of the current piece this line starts with
+
+
+class TetrisBot:
+    """
+    Beam-search autoplayer.
+
+    Attributes:
+        decisions: Number of moves chosen so far.
+        think_time: Total seconds spent in `choose()`.
+        nodes: Number of boards evaluated so far.
+    """
+    def __init__(self, weights=None, beam_width=4, lookahead=1, time_budget=0.05, table_size=200000):
+        """
+        Args:
+            weights: Feature weights; defaults to DEFAULT_WEIGHTS.
+            beam_width: Boards kept at each search level.
+            lookahead: How many preview pieces to search beyond the falling one.
+            time_budget: Seconds one decision may take; deeper levels are skipped when it runs out.
+                         None searches every level, which makes games reproducible from the seed.
+            table_size: Maximum number of evaluations kept in the transposition table.
+        """
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.beam_width = beam_width
+        self.lookahead = lookahead
+        self.time_budget = time_budget
+        self.table_size = table_size
+        self.table = {} # Zobrist hash -> board evaluation
+        self.placements = PlacementCache()
+        self.decisions = 0
+        self.think_time = 0.0
+        self.nodes = 0
+        self.timeouts = 0 # Decisions cut short by the time budget
+
+    @property
+    def decisions_per_second(self):
+        return self.decisions / self.think_time if self.think_time else 0.0
+
+    def evaluate(self, board, h):
+        """Returns the heuristic value of a board, cached by its Zobrist hash `h`."""
+        value = self.table.get(h)
+        if value is None:
+            weights = self.weights
+            value = sum(weights[name] * amount for name, amount in board_features(board).items())
+            if len(self.table) >= self.table_size:
+                self.table.clear() # Cheap wholesale eviction; the table refills quickly
+            self.table[h] = value
+        self.nodes += 1
+        return value
+
+    def choose(self, engine):
+        """
+        Picks where to put the falling piece of `engine`.
+
+        Returns:
+            tetris_placement.Placement or None if the piece cannot be placed;
+            its `path` holds the ACTION_* codes to play.
+        """
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else float('inf')
+        piece = engine.current_piece
+        keys = list(engine.preview(self.lookahead))
+        lines_weight = self.weights['lines']
+
+        beam = [_Node(engine.board, 0.0, 0.0, None)]
+        for depth in range(len(keys) + 1):
+            best = {} # Zobrist hash -> best node reaching that board at this depth
+            for node in beam:
+                if depth and time.perf_counter() > deadline:
+                    best = None # Out of time: drop the unfinished level, keep the previous beam
+                    break
+                if depth == 0:
+                    placements = self.placements.placements(
+                        node.board, piece.key, piece.rotation, engine.current_x, engine.current_y)
+                else:
+                    placements = self.placements.placements(node.board, keys[depth - 1])
+                for placement in placements:
+                    reward = node.reward + lines_weight * placement.lines_cleared
+                    h = zobrist_hash(placement.board)
+                    seen = best.get(h)
+                    if seen is not None and seen.reward >= reward:
+                        continue # Same board already reached at least as cheaply
+                    value = reward + self.evaluate(placement.board, h)
+                    if depth < len(keys): # The next piece must still be able to spawn
+                        next_key = keys[depth]
+                        x, y = spawn_position(next_key, placement.board.width)
+                        if placement.board.collides(ROTATIONS[next_key][0], x, y):
+                            value = float('-inf')
+                    best[h] = _Node(placement.board, value, reward, node.first or placement)
+            if best is None:
+                self.timeouts += 1
+                break
+            if not best: # Nowhere to go (the piece is stuck at spawn)
+                break
+            beam = sorted(best.values(), key=lambda n: n.value, reverse=True)[:self.beam_width]
+
+        self.decisions += 1
+        self.think_time += time.perf_counter() - start
+        return beam[0].first
+
+
+def play_game(bot, seed=None, max_pieces=None, backend='bitboard'):
+    """
+    Lets `bot` play one headless game.
+
+    Args:
+        bot: A TetrisBot.
+        seed: Piece-generator seed (random if None).
+        max_pieces: Stop after this many pieces even if the game is not over.
+        backend: Board backend for the engine.
+
+    Returns:
+        dict with 'seed', 'score', 'lines', 'pieces' and 'seconds'.
+    """
+    engine = TetrisEngine(seed=seed, backend=backend)
+    lines = [0]
+    engine.on('lines_cleared', lambda count: lines.__setitem__(0, lines[0] + count))
+    engine.reset(engine.bag.seed)
+    pieces = 0
+    start = time.perf_counter()
+    while not engine.game_over and (max_pieces is None or pieces < max_pieces):
+        placement = bot.choose(engine)
+        if placement is None:
+            break
+        for action in placement.path:
+            engine.act(action)
+        pieces += 1
+    return {
+        'seed': engine.bag.seed,
+        'score': engine.score,
+        'lines': lines[0],
+        'pieces': pieces,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Let the bot play headless games.")
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--pieces', type=int, default=500, help="piece limit per game")
+    parser.add_argument('--beam', type=int, default=4, help="beam width")
+    parser.add_argument('--lookahead', type=int, default=1, help="preview pieces searched")
+    parser.add_argument('--budget', type=float, default=0.05, help="seconds per decision")
+    args = parser.parse_args()
+
+    bot = TetrisBot(beam_width=args.beam, lookahead=args.lookahead, time_budget=args.budget)
+    for seed in range(args.games):
+        result = play_game(bot, seed=seed, max_pieces=args.pieces)
+        print(f"seed {seed}: score {result['score']}, {result['lines']} lines, {result['pieces']} pieces")
+    print(f"{bot.decisions_per_second:,.1f} decisions/s, {bot.timeouts} decisions hit the time budget")
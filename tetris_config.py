@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Game configuration shared by the Tetris engine and its frontends.
+Nothing in here depends on Tkinter, so headless code can import it freely.
+"""
+
+# --- Game Configuration ---
+# Define constants for the game board dimensions and block size.
+BOARD_WIDTH = 10 # Number of blocks wide the game board is
+BOARD_HEIGHT = 20 # Number of blocks high the game board is
+BLOCK_SIZE = 30 # Size of each square block in pixels (e.g., 30x30 pixels)
+
+# Define a dictionary of colors for each Tetromino type and for the game board.
+COLORS = {
+    'I': '#00FFFF', # Cyan for the 'I' shape
+    'O': '#FFFF00', # Yellow for the 'O' shape
+    'T': '#800080', # Purple for the 'T' shape
+    'S': '#00FF00', # Green for the 'S' shape
+    'Z': '#FF0000', # Red for the 'Z' shape
+    'J': '#0000FF', # Blue for the 'J' shape
+    'L': '#FFA500', # Orange for the 'L' shape
+    'G': '#808080', # Grey for blocks that have settled onto the board
+    'H': '#4F6478', # Muted blue-grey for the ghost piece (where the falling piece will land)
+    'B': '#2C3E50'  # Dark blue-grey for the background color of the game board
+}
+
+# Define Tetromino shapes as 2D lists (matrices).
+# Each '1' represents a filled block, '0' represents an empty space.
+# The dimensions (3x3 or 4x4) are designed to contain the piece and its rotations.
+SHAPES = {
+    'I': [[0, 0, 0, 0], # The 'I' piece (straight line) is 4x4 for rotation
+          [1, 1, 1, 1],
+          [0, 0, 0, 0],
+          [0, 0, 0, 0]],
+    'J': [[1, 0, 0],   # The 'J' piece
+          [1, 1, 1],
+          [0, 0, 0]],
+    'L': [[0, 0, 1],   # The 'L' piece
+          [1, 1, 1],
+          [0, 0, 0]],
+    'O': [[1, 1],      # The 'O' piece (square) is 2x2 and doesn't rotate visually
+          [1, 1]],
+    'S': [[0, 1, 1],   # The 'S' piece
+          [1, 1, 0],
+          [0, 0, 0]],
+    'T': [[0, 1, 0],   # The 'T' piece
+          [1, 1, 1],
+          [0, 0, 0]],
+    'Z': [[1, 1, 0],   # The 'Z' piece
+          [0, 1, 1],
+          [0, 0, 0]]
+}
+
+# A comprehensive dictionary storing information about each Tetromino type.
+# 'shape': The actual 2D list representing the piece.
+# 'color': The corresponding color from the COLORS dictionary.
+# 'dim': The dimension (side length) of the square matrix that contains the shape (e.g., 3 for J,L,S,T,Z; 4 for I; 2 for O).
+TETROMINOES = {
+    'I': {'shape': SHAPES['I'], 'color': COLORS['I'], 'dim': 4},
+    'J': {'shape': SHAPES['J'], 'color': COLORS['J'], 'dim': 3},
+    'L': {'shape': SHAPES['L'], 'color': COLORS['L'], 'dim': 3},
+    'O': {'shape': SHAPES['O'], 'color': COLORS['O'], 'dim': 2},
+    'S': {'shape': SHAPES['S'], 'color': COLORS['S'], 'dim': 3},
+    'T': {'shape': SHAPES['T'], 'color': COLORS['T'], 'dim': 3},
+    'Z': {'shape': SHAPES['Z'], 'color': COLORS['Z'], 'dim': 3}
+}
+
+# Points awarded per cleared line, plus the extra bonus for clearing 4 at once (a "Tetris").
+POINTS_PER_LINE = 100
+TETRIS_BONUS = 400
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+"""
+Headless Tetris engine.
+Owns the board, the falling piece, the piece queue and the score, and applies
+the game rules without touching any GUI toolkit. Frontends (such as the Tkinter
+`TetrisGame` in tetris_python.py) subscribe to change events and redraw.
+"""
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, TETROMINOES, COLORS, POINTS_PER_LINE, TETRIS_BONUS
+from tetris_board import make_board
+from tetris_pieces import ROTATIONS, KICKS
+from tetris_random import SevenBag
+from tetris_snapshot import GameSnapshot, encode_row, decode_row
+
+# Names of the events emitted by TetrisEngine. Listeners registered with `on()`
+# are called with the arguments listed next to each event.
+EVENTS = (
+    'piece_moved',   # () - the falling piece moved or rotated
+    'piece_spawned', # () - a new piece entered the board (the queue changed too)
+    'board_changed', # (rows,) - settled blocks changed; rows lists the affected row indices, None = all
+    'lines_cleared', # (count,) - one or more full lines were removed
+    'score_changed', # (score,) - the score changed
+    'game_over',     # () - a newly spawned piece collided immediately
+)
+
+# Player inputs as small integers, shared by batch simulators, bots and replays.
+# TetrisEngine.act(action) performs one of them.
+ACTION_NONE = 0
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_DOWN = 3
+ACTION_ROTATE = 4
+ACTION_HARD_DROP = 5
+ACTIONS = ('none', 'left', 'right', 'down', 'rotate', 'hard_drop') # Names, indexed by action code
+
+
+class TetrisEngine:
+    """
+    Pure-Python Tetris rules engine.
+    Holds all of the game state and exposes step/move/rotate/drop methods.
+    Every state change is announced through an event so that a renderer can follow along.
+    """
+    def __init__(self, seed=None, backend='list', bag=None, width=BOARD_WIDTH, height=BOARD_HEIGHT):
+        """
+        Initializes an engine with an empty board. Call `reset()` to spawn the first piece.
+
+        Args:
+            seed: Seed for the 7-bag piece generator; equal seeds deal equal pieces.
+                  If omitted a random seed is chosen (and kept in `self.bag.seed`).
+            backend: Board representation, a key of tetris_board.BOARD_BACKENDS.
+                     'list' (the default) is a list of color-string rows; 'bitboard'
+                     gives identical results with somewhat cheaper collision checks.
+            bag: Optional ready-made tetris_random.SevenBag to deal pieces from (overrides `seed`).
+            width: Number of board columns (at least 4).
+            height: Number of board rows (at least 4).
+        """
+        if width < 4 or height < 4:
+            raise ValueError(f"Board must be at least 4x4, got {width}x{height}")
+        self.bag = bag if bag is not None else SevenBag(seed) # Deals the upcoming pieces
+        self.backend = backend # Name of the board backend, reused on every reset
+        self.width = width # Board size, reused on every reset
+        self.height = height
+        self._listeners = {name: [] for name in EVENTS} # Registered callbacks, one list per event
+
+        # --- Game State Variables ---
+        # The game board. board[r][c] is the color of the settled block at that position, or '' if empty.
+        self.board = make_board(backend, width, height)
+        self.current_piece = None # The tetris_pieces.PieceState (shape and rotation) of the falling Tetromino.
+        self.current_color = None # Stores the color of the current piece.
+        self.current_dim = None   # Stores the dimension (e.g., 3 or 4) of the current piece's shape matrix.
+        self.current_x = 0        # X-coordinate (column) of the top-left corner of the current piece on the board.
+        self.current_y = 0        # Y-coordinate (row) of the top-left corner of the current piece on the board.
+        self.score = 0            # The player's current score.
+        self.game_over = False    # Boolean flag: True if the game is over, False otherwise.
+
+        # Encoded rows (tetris_snapshot) of the board as of the last snapshot/restore, shared with
+        # the snapshots; rows named by board_changed since then are re-encoded on the next snapshot.
+        self._row_codes = None
+        self._row_codes_board = None # The board object the cache describes
+        self._stale_rows = None # Rows to re-encode; None = all
+        self.on('board_changed', self._rows_changed)
+
+    # --- Events ---
+
+    def on(self, event, callback):
+        """
+        Registers `callback` to be called whenever `event` is emitted.
+
+        Args:
+            event: One of the names in EVENTS.
+            callback: Callable receiving the event's arguments.
+        """
+        if event not in self._listeners:
+            raise ValueError(f"Unknown engine event: {event!r}")
+        self._listeners[event].append(callback)
+
+    def off(self, event, callback):
+        """Removes a callback previously registered with `on()`."""
+        self._listeners[event].remove(callback)
+
+    def emit(self, event, *args):
+        """Calls every listener registered for `event` with `args`."""
+        for callback in self._listeners[event]:
+            callback(*args)
+
+    # --- Game lifecycle ---
+
+    def reset(self, seed=None):
+        """
+        Resets the game state and spawns the first piece of a new game.
+
+        Args:
+            seed: If given, restart the piece sequence from this seed; otherwise
+                  keep drawing from the current generator, starting a fresh bag.
+        """
+        self.board = make_board(self.backend, self.width, self.height) # Clear the game board
+        self.score = 0 # Reset score
+        self.game_over = False # Reset game over flag
+        if seed is not None:
+            self.bag = SevenBag(seed)
+        else:
+            self.bag.clear() # Drop the rest of the previous game's bag
+        self.emit('board_changed', None)
+        self.emit('score_changed', self.score)
+        self.spawn_piece() # Spawn the first piece
+
+    @property
+    def piece_queue(self):
+        """Upcoming Tetromino keys (a deque, never empty); piece_queue[0] is the next piece."""
+        return self.bag.queue
+
+    def preview(self, k):
+        """Returns an iterator over the next `k` piece keys without consuming them."""
+        return self.bag.peek(k)
+
+    def get_next_piece_from_queue(self):
+        """
+        Retrieves and removes the next piece key from the piece queue.
+
+        Returns:
+            str: The key (name) of the next Tetromino (e.g., 'T', 'O').
+        """
+        return self.bag.next()
+
+    def spawn_piece(self):
+        """
+        Selects a new Tetromino from the queue and places it at the top center of the board.
+        Checks for immediate game over conditions.
+
+        Returns:
+            bool: True if the piece spawned, False if it collided and the game is over.
+        """
+        piece_key = self.get_next_piece_from_queue() # Get the key of the next piece from the queue
+        piece_info = TETROMINOES[piece_key] # Retrieve its full info
+        self.current_piece = ROTATIONS[piece_key][0] # Spawn orientation of the piece
+        self.current_color = piece_info['color'] # Set the current piece's color
+        self.current_dim = piece_info['dim'] # Set the current piece's dimension
+        # Calculate initial X position to center the piece horizontally
+        self.current_x = self.width // 2 - self.current_dim // 2
+        self.current_y = 0 # Start the piece at the very top of the board
+
+        # Check for immediate game over: if the new piece collides upon spawning
+        if self.check_collision(self.current_piece, self.current_x, self.current_y):
+            self.game_over = True # Set game over flag
+            self.emit('game_over')
+            return False
+        self.emit('piece_spawned')
+        return True
+
+    @property
+    def state_key(self):
+        """
+        Hashable description of the falling piece: (key, rotation, x, y).
+        """
+        return (self.current_piece.key, self.current_piece.rotation, self.current_x, self.current_y)
+
+    # --- Snapshots ---
+
+    def _rows_changed(self, rows):
+        if rows is None or self._stale_rows is None:
+            self._stale_rows = None
+        else:
+            self._stale_rows.update(rows)
+
+    def _encoded_rows(self):
+        """Brings the encoded-row cache up to date with the board and returns it."""
+        board = self.board
+        if self._row_codes_board is not board: # Replaced from outside (or never encoded)
+            self._row_codes = [encode_row(row) for row in board]
+            self._row_codes_board = board
+        elif self._stale_rows is None or self._stale_rows:
+            codes = self._row_codes
+            shared = {code: code for code in codes} # Rows that only shifted down keep their objects
+            for r in (range(self.height) if self._stale_rows is None else self._stale_rows):
+                code = encode_row(board[r])
+                codes[r] = shared.get(code, code)
+        self._stale_rows = set()
+        return self._row_codes
+
+    def snapshot(self):
+        """
+        Returns the whole game state as an immutable tetris_snapshot.GameSnapshot.
+        Only the rows changed since the previous snapshot or restore are encoded;
+        all other rows are shared with it.
+        """
+        piece = self.current_piece
+        return GameSnapshot(self.width, self.height, self._encoded_rows(),
+                            None if piece is None else (piece.key, piece.rotation),
+                            self.current_x, self.current_y, self.score, self.game_over, self.bag.snapshot())
+
+    def restore(self, snapshot):
+        """
+        Puts the game back into the state of `snapshot` (taken from any engine with the same board size).
+        Only the rows that differ from the current board are rewritten. Emits board_changed for
+        those rows, score_changed and piece_spawned (the falling piece and the queue may differ),
+        but never game_over.
+        """
+        if (snapshot.width, snapshot.height) != (self.width, self.height):
+            raise ValueError(f"Cannot restore a {snapshot.width}x{snapshot.height} snapshot "
+                             f"into a {self.width}x{self.height} game")
+        current = self._encoded_rows()
+        changed = {r: decode_row(code) for r, (code, old) in enumerate(zip(snapshot.rows, current))
+                   if code is not old and code != old}
+        if changed:
+            self.board.set_rows(changed)
+        self.bag.restore(snapshot.bag)
+        if snapshot.piece is None:
+            self.current_piece = self.current_color = self.current_dim = None
+        else:
+            key, rotation = snapshot.piece
+            self.current_piece = ROTATIONS[key][rotation]
+            self.current_color = TETROMINOES[key]['color']
+            self.current_dim = TETROMINOES[key]['dim']
+        self.current_x, self.current_y = snapshot.x, snapshot.y
+        self.score = snapshot.score
+        self.game_over = snapshot.game_over
+        if changed:
+            self.emit('board_changed', sorted(changed))
+        self.emit('score_changed', self.score)
+        self.emit('piece_spawned')
+        self._row_codes = list(snapshot.rows) # The board now matches the snapshot row for row
+        self._stale_rows = set()
+
+    def clone(self):
+        """
+        Returns an independent engine in the same state, with the same backend and
+        no listeners. Costs one snapshot plus writing the non-empty rows.
+        """
+        engine = TetrisEngine(bag=self.bag.fork(), backend=self.backend, width=self.width, height=self.height)
+        engine.restore(self.snapshot())
+        return engine
+
+    # --- Rules ---
+
+    @property
+    def column_heights(self):
+        """The board's column-height profile (see tetris_board); read-only."""
+        return self.board.heights
+
+    def ghost_y(self):
+        """
+        Returns the row the falling piece would land on if hard-dropped now
+        (where a ghost piece is drawn), or None when there is no falling piece.
+        """
+        if self.current_piece is None or self.game_over:
+            return None
+        return self.board.drop_position(self.current_piece, self.current_x, self.current_y)
+
+    def check_collision(self, piece, x, y):
+        """
+        Checks if the given `piece` (at potential `x`, `y` coordinates) collides
+        with board boundaries or any already settled blocks.
+
+        Args:
+            piece: The rotation state (tetris_pieces.PieceState) or shape matrix (2D list) to check.
+            x: The proposed x-coordinate (column) of the piece's top-left corner.
+            y: The proposed y-coordinate (row) of the piece's top-left corner.
+
+        Returns:
+            True if a collision is detected, False otherwise.
+        """
+        return self.board.collides(piece, x, y)
+
+    def merge_piece_to_board(self):
+        """
+        When a piece lands, this method merges its blocks into the static `self.board` matrix.
+        After merging, it triggers line clearing.
+
+        Returns:
+            int: The number of lines cleared by this piece.
+        """
+        # Place the piece's color onto the board at its absolute position
+        self.board.merge(self.current_piece, self.current_x, self.current_y, self.current_color)
+        top = self.current_y + self.current_piece.top # Highest row the piece touched
+        bottom = self.current_y + self.current_piece.bottom # Lowest row the piece touched
+        lines_cleared = self.clear_lines(range(top, bottom + 1)) # Only these rows can have become full
+        if lines_cleared: # Every row down to the lowest cleared one (at most `bottom`) may have shifted
+            self.emit('board_changed', range(0, bottom + 1))
+        else: # Only the rows the piece was merged into changed
+            self.emit('board_changed', range(top, bottom + 1))
+        return lines_cleared
+
+    def clear_lines(self, rows=None):
+        """
+        Checks for and clears any full lines.
+        Shifts all blocks above cleared lines down. Updates the score.
+
+        Args:
+            rows: The rows to check (the board keeps per-row fill counts, so each check is O(1));
+                  None checks the whole board.
+
+        Returns:
+            int: The number of lines cleared.
+        """
+        lines_cleared = self.board.clear_full_rows(rows) # Remove full rows, shifting the rest down
+        if lines_cleared:
+            self.add_score(lines_cleared)
+            self.emit('lines_cleared', lines_cleared)
+        return lines_cleared
+
+    def add_score(self, lines_cleared):
+        """
+        Adds the points for `lines_cleared` lines to the score.
+
+        Args:
+            lines_cleared: How many lines were cleared by a single piece.
+        """
+        self.score += lines_cleared * POINTS_PER_LINE # Add points for cleared lines (100 points per line)
+        if lines_cleared == 4: # Special bonus for clearing 4 lines at once (a "Tetris")
+            self.score += TETRIS_BONUS # Additional 400 points
+        self.emit('score_changed', self.score)
+
+    def add_garbage(self, lines, hole, color=COLORS['G']):
+        """
+        Pushes the settled blocks up by `lines` rows and fills the rows that open up
+        at the bottom with garbage: every cell filled except column `hole` (versus play).
+        A falling piece that now overlaps the blocks is moved up with them; the game
+        is over if blocks are pushed out of the top or the piece cannot move up.
+
+        Args:
+            lines: Number of garbage rows.
+            hole: Column left empty in every garbage row.
+            color: Color of the garbage blocks.
+        """
+        if self.game_over or lines <= 0:
+            return
+        board, height = self.board, self.height
+        lines = min(lines, height)
+        topped_out = max(board.heights) + lines > height
+        garbage = [color] * self.width
+        garbage[hole] = ''
+        rows = {r: list(board[r + lines]) for r in range(height - lines)} # Copied before anything is overwritten
+        rows.update((r, garbage[:]) for r in range(height - lines, height))
+        board.set_rows(rows)
+        self.emit('board_changed', None)
+        if not topped_out:
+            piece = self.current_piece
+            while self.check_collision(piece, self.current_x, self.current_y) and self.current_y + piece.top > 0:
+                self.current_y -= 1
+            topped_out = self.check_collision(piece, self.current_x, self.current_y)
+        if topped_out:
+            self.game_over = True
+            self.emit('game_over')
+        else:
+            self.emit('piece_moved')
+
+    def lock_piece(self):
+        """
+        Merges the landed piece into the board and spawns the next one.
+
+        Returns:
+            int: The number of lines cleared by the locked piece.
+        """
+        lines_cleared = self.merge_piece_to_board() # Merge the landed piece into the board
+        self.spawn_piece() # Spawn a new piece
+        return lines_cleared
+
+    # --- Piece movement ---
+
+    def step(self):
+        """
+        Advances the game by one gravity tick: moves the piece down one row,
+        or locks it and spawns the next piece if it has landed.
+
+        Returns:
+            bool: True if the piece moved down, False if it locked (or the game is over).
+        """
+        if self.game_over:
+            return False
+        # Attempt to move the piece down
+        if not self.check_collision(self.current_piece, self.current_x, self.current_y + 1):
+            self.current_y += 1 # Move the piece down by one row
+            self.emit('piece_moved')
+            return True
+        self.lock_piece() # The piece has landed
+        return False
+
+    def move(self, dx):
+        """
+        Moves the current piece `dx` columns sideways if the target position is free.
+
+        Args:
+            dx: Horizontal offset, -1 for left and +1 for right.
+
+        Returns:
+            bool: True if the piece moved.
+        """
+        if self.game_over: return False
+        if self.check_collision(self.current_piece, self.current_x + dx, self.current_y):
+            return False
+        self.current_x += dx # Update the piece's x-coordinate
+        self.emit('piece_moved')
+        return True
+
+    def act(self, action):
+        """
+        Performs one player input given as an action code (ACTION_LEFT, ACTION_ROTATE, ...).
+
+        Args:
+            action: One of the ACTION_* constants; ACTION_NONE does nothing.
+        """
+        if action == ACTION_LEFT:
+            self.move_left()
+        elif action == ACTION_RIGHT:
+            self.move_right()
+        elif action == ACTION_DOWN:
+            self.move_down()
+        elif action == ACTION_ROTATE:
+            self.rotate_piece()
+        elif action == ACTION_HARD_DROP:
+            self.hard_drop()
+        elif action != ACTION_NONE:
+            raise ValueError(f"Unknown action: {action!r}")
+
+    def move_left(self):
+        """Moves the current piece one block to the left."""
+        return self.move(-1)
+
+    def move_right(self):
+        """Moves the current piece one block to the right."""
+        return self.move(1)
+
+    def move_down(self):
+        """
+        Moves the current piece one block down (soft drop).
+        Identical to one gravity tick.
+        """
+        return self.step()
+
+    def hard_drop(self):
+        """
+        Instantly drops the current piece to the lowest possible position and locks it.
+
+        Returns:
+            int: The number of lines cleared by the dropped piece.
+        """
+        if self.game_over: return 0
+        # Find the lowest row the piece can reach (read off the column heights when nothing overhangs it)
+        self.current_y = self.board.drop_position(self.current_piece, self.current_x, self.current_y)
+        return self.lock_piece()
+
+    def rotate_piece(self, direction=1):
+        """
+        Rotates the current piece 90 degrees, using the SRS wall-kick table
+        to shift the piece if the rotation would otherwise cause a collision.
+
+        Args:
+            direction: 1 to rotate clockwise, -1 to rotate counter-clockwise.
+
+        Returns:
+            bool: True if the piece rotated.
+        """
+        if self.game_over: return False
+
+        piece = self.current_piece
+        rotation = (piece.rotation + direction) % 4 # Index of the target rotation state
+        rotated_piece = ROTATIONS[piece.key][rotation] # Precomputed, nothing is allocated here
+        # Try each kick offset in order; the first one that fits wins
+        for offset_x, offset_y in KICKS[piece.key][piece.rotation, rotation]:
+            if not self.check_collision(rotated_piece, self.current_x + offset_x, self.current_y + offset_y):
+                self.current_x += offset_x # Apply the kick offset
+                self.current_y += offset_y
+                self.current_piece = rotated_piece # Apply the rotation
+                self.emit('piece_moved')
+                return True
+        return False # If no kick works, the piece cannot rotate in its current position
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Off-screen pixel renderer: the game as NumPy RGB frames, no window or display needed.
+
+FrameRenderer draws what the Tk window shows (the board as `draw_board` draws it,
+with the ghost piece, and the 'Next' preview as `draw_next_piece` does) into one
+preallocated (height, width, 3) uint8 array:
+
+    board   width x height cells of `block_size` pixels on the COLORS['B'] background;
+            every block is its color with a black outline, like the canvas rectangles
+    panel   a 4 x 4 block preview box (the preview canvas' '#4A6572') at the top of a
+            column of the info frame's '#34495E' to the right of the board
+
+Every cell kind (empty, the seven piece colors, grey, ghost) is rasterized once into
+a block_size x block_size tile. A frame looks up the cells whose code changed since
+the previous frame and copies their tiles in one vectorized assignment through a
+(rows, block, columns, block, 3) view of the buffer, so a frame in which only the
+piece moved writes 8 tiles. `render()` returns the same array every time,
+overwritten in place: copy it to keep a frame.
+
+Frames stream to raw rgb24 files, YUV4MPEG2 (.y4m) files or pipes, or to any
+in-process consumer of the arrays (a pixel-based agent, an encoder):
+
+    python tetris_framebuffer.py --seconds 60 --out game.y4m    # a bot game, 60 fps
+    python tetris_framebuffer.py --seconds 60 --out - | ffplay -
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 420x600 -r 60 -i game.rgb game.mp4
+
+For Y4M the renderer works in YUV (colorspace='yuv'): the tiles are converted once
+and the buffer is kept as Y, Cb, Cr planes, so frames are written as they are, with
+no per-frame conversion. Requires NumPy (the rest of the game does not).
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, BLOCK_SIZE, COLORS, TETROMINOES
+from tetris_engine import TetrisEngine
+from tetris_pieces import ROTATIONS
+from tetris_render import piece_overlay
+from tetris_snapshot import CELL_COLORS, CELL_CODES
+from tetris_timing import FixedStepScheduler, TICK_RATE
+
+PREVIEW_BLOCKS = 4 # The preview box is 4 x 4 blocks, like the 'Next' canvas
+PREVIEW_BACKGROUND = '#4A6572' # Background of the 'Next' canvas
+PANEL_BACKGROUND = '#34495E' # Background of the info frame around it
+OUTLINE = '#000000'
+GHOST_CODE = len(CELL_COLORS) # Cell code of the ghost piece, after the snapshot cell codes
+TILE_COLORS = (COLORS['B'],) + CELL_COLORS[1:] + (COLORS['H'],) # Fill of each cell code; 0 = empty
+
+
+def hex_rgb(color):
+    """Returns a '#RRGGBB' color as an (r, g, b) tuple of ints."""
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def rgb_to_yuv(rgb):
+    """Converts an (r, g, b) tuple to studio-range BT.601 (y, cb, cr), the Y4M default."""
+    r, g, b = rgb
+    return (round(16 + (65.481 * r + 128.553 * g + 24.966 * b) / 255),
+            round(128 + (-37.797 * r - 74.203 * g + 112.0 * b) / 255),
+            round(128 + (112.0 * r - 93.786 * g - 18.214 * b) / 255))
+
+
+def _cell_view(region, rows, columns, size):
+    """A writable (rows, size, columns, size, 3) view of `region` that addresses it cell by cell."""
+    row_stride, column_stride, channel_stride = region.strides
+    return as_strided(region, (rows, size, columns, size, 3),
+                      (size * row_stride, row_stride, size * column_stride, column_stride, channel_stride))
+
+
+class FrameRenderer:
+    """
+    Renders a TetrisEngine into a reused uint8 pixel buffer.
+
+    Attributes:
+        frame: The (height, width, 3) buffer `render()` draws into and returns
+               (with colorspace='yuv' a view of planar storage, not C-contiguous).
+        tiles: (cell codes, block_size, block_size, 3) pre-rasterized cells.
+        cells_drawn: Tiles copied so far (handy for profiling).
+    """
+    def __init__(self, engine, block_size=BLOCK_SIZE, ghost=True, preview=True, colorspace='rgb'):
+        """
+        Args:
+            engine: The TetrisEngine to draw.
+            block_size: Size of each cell in pixels.
+            ghost: Also draw the falling piece's landing position.
+            preview: Draw the 'Next' panel to the right of the board.
+            colorspace: 'rgb' for RGB frames, 'yuv' for BT.601 YCbCr frames (what Y4MWriter expects).
+        """
+        if colorspace not in ('rgb', 'yuv'):
+            raise ValueError(f"Unknown colorspace {colorspace!r}: use 'rgb' or 'yuv'")
+        self.engine = engine
+        self.block_size = block_size
+        self.ghost = ghost
+        self.preview = preview
+        self.colorspace = colorspace
+        self.columns, self.rows = engine.width, engine.height
+        size = block_size
+        board_width = self.columns * size
+        self.height = self.rows * size
+        self.width = board_width + (PREVIEW_BLOCKS * size if preview else 0)
+        if colorspace == 'yuv': # Stored as Y, Cb, Cr planes, which Y4MWriter writes without converting
+            self.frame = np.empty((3, self.height, self.width), np.uint8).transpose(1, 2, 0)
+        else:
+            self.frame = np.empty((self.height, self.width, 3), np.uint8)
+
+        self.tiles = np.empty((len(TILE_COLORS), size, size, 3), np.uint8)
+        for code, color in enumerate(TILE_COLORS):
+            self.tiles[code] = self.pixel(color)
+            if code and size >= 3: # Blocks get the canvas rectangles' black outline
+                outline = self.pixel(OUTLINE)
+                self.tiles[code, [0, -1], :] = outline
+                self.tiles[code, :, [0, -1]] = outline
+        if preview: # The panel, preview box empty, drawn once and copied in (broadcasting a pixel is slow)
+            self.panel = np.empty((self.height, PREVIEW_BLOCKS * size, 3), np.uint8)
+            self.panel[:] = self.pixel(PANEL_BACKGROUND)
+            self.panel[:PREVIEW_BLOCKS * size] = self.pixel(PREVIEW_BACKGROUND)
+        self.cells = _cell_view(self.frame[:, :board_width], self.rows, self.columns, size)
+        self.codes = np.zeros((self.rows, self.columns), np.uint8) # Cell codes of the frame being built
+        self.shown = np.zeros_like(self.codes) # Cell codes currently in the buffer
+        self.preview_key = None
+        self.cells_drawn = 0
+        self.invalidate()
+
+    def pixel(self, color):
+        """Returns `color` ('#RRGGBB') in the renderer's colorspace as a uint8 array."""
+        rgb = hex_rgb(color)
+        return np.array(rgb_to_yuv(rgb) if self.colorspace == 'yuv' else rgb, np.uint8)
+
+    def invalidate(self):
+        """Forgets what the buffer shows, so the next `render()` redraws every cell and the panel."""
+        self.shown.fill(255) # Matches no cell code
+        if self.preview:
+            self.frame[:, self.columns * self.block_size:] = self.panel
+            self.preview_key = False # Matches no key, not even None
+
+    def render(self):
+        """
+        Brings the buffer up to date with the engine, copying only the tiles of changed cells.
+
+        Returns:
+            The frame buffer (the same array every call).
+        """
+        engine = self.engine
+        codes = self.codes
+        rows, columns = self.rows, self.columns
+        # Settled cells straight from the engine's encoded rows (shared with its snapshots)
+        codes.reshape(-1)[:] = np.frombuffer(b''.join(engine.snapshot().rows), np.uint8)
+        for (r, c), color in piece_overlay(engine, self.ghost).items():
+            if 0 <= r < rows and 0 <= c < columns:
+                codes[r, c] = GHOST_CODE if color == COLORS['H'] else CELL_CODES[color]
+
+        changed_rows, changed_columns = np.nonzero(codes != self.shown)
+        if len(changed_rows):
+            # Advanced indices on axes 0 and 2 select (n, block, block, 3) cells: one copy for all of them
+            self.cells[changed_rows, :, changed_columns] = self.tiles[codes[changed_rows, changed_columns]]
+            self.cells_drawn += len(changed_rows)
+        self.codes, self.shown = self.shown, codes # The new codes are now the shown ones
+
+        if self.preview:
+            key = engine.piece_queue[0] if engine.piece_queue and not engine.game_over else None
+            if key != self.preview_key:
+                self._draw_preview(key)
+        return self.frame
+
+    def _draw_preview(self, key):
+        """Draws piece `key` centered in the preview box (empty box if None), as PreviewRenderer does."""
+        self.preview_key = key
+        size = self.block_size
+        left = self.columns * size
+        box = self.frame[:PREVIEW_BLOCKS * size, left:]
+        box[:] = self.panel[:PREVIEW_BLOCKS * size]
+        if key is None:
+            return
+        # (4 - dim) * block_size / 2 centers 2x2, 3x3 and 4x4 shapes alike
+        offset = round((PREVIEW_BLOCKS - TETROMINOES[key]['dim']) * size / 2)
+        tile = self.tiles[CELL_CODES[TETROMINOES[key]['color']]]
+        for r, c in ROTATIONS[key][0].cells:
+            y, x = offset + r * size, offset + c * size
+            box[y:y + size, x:x + size] = tile
+
+
+# --- Streaming ---
+
+class RawWriter:
+    """Writes frames as headerless rgb24 (or yuv444 interleaved) video, e.g. for `ffmpeg -f rawvideo`."""
+
+    def __init__(self, file):
+        """
+        Args:
+            file: A binary file object (open file, pipe, sys.stdout.buffer).
+        """
+        self.file = file
+        self.frames = 0
+
+    def write(self, frame):
+        self.file.write(np.ascontiguousarray(frame).data) # The buffer itself if it is interleaved (rgb)
+        self.frames += 1
+
+    def close(self):
+        self.file.flush()
+
+
+class Y4MWriter:
+    """
+    Writes frames of a colorspace='yuv' renderer as a YUV4MPEG2 (4:4:4) stream, which
+    ffmpeg, ffplay, mpv and x264 read directly.
+    """
+    def __init__(self, file, width, height, fps=TICK_RATE):
+        self.file = file
+        self.planes = np.empty((3, height, width), np.uint8) # For interleaved frames, reused every frame
+        self.frames = 0
+        file.write(f"YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 C444\n".encode('ascii'))
+
+    def write(self, frame):
+        planes = frame.transpose(2, 0, 1)
+        if not planes.flags.c_contiguous: # An interleaved frame: convert to planar
+            np.copyto(self.planes, planes)
+            planes = self.planes
+        self.file.write(b"FRAME\n")
+        self.file.write(planes.data)
+        self.frames += 1
+
+    def close(self):
+        self.file.flush()
+
+
+def bot_ticks(engine, ticks, bot=None, input_every=4, seed=0, start_level=1):
+    """
+    Plays `engine` headlessly for `ticks` fixed-step ticks, yielding after each one, e.g.
+    to render a frame. A TetrisBot (default: deterministic, no lookahead) places the pieces,
+    one input every `input_every` ticks, while the scheduler supplies gravity and lock delay.
+    Finished games restart with the next seed.
+
+    Yields:
+        The tick number (0-based).
+    """
+    from tetris_bot import TetrisBot
+    if bot is None:
+        bot = TetrisBot(lookahead=0, time_budget=None)
+    scheduler = FixedStepScheduler(engine, start_level=start_level)
+    spawns = [0] # Pieces spawned so far: tells a plan's piece from the next one of the same kind
+    count_spawn = lambda: spawns.__setitem__(0, spawns[0] + 1)
+    engine.on('piece_spawned', count_spawn)
+    try:
+        engine.reset(seed)
+        path, planned_for = [], None
+        for tick in range(ticks):
+            if engine.game_over:
+                seed += 1
+                engine.reset(seed)
+                scheduler.reset()
+            if tick % input_every == 0:
+                if not path or planned_for != spawns[0]: # Done, or gravity locked the piece first
+                    placement = bot.choose(engine)
+                    path, planned_for = list(placement.path) if placement is not None else [], spawns[0]
+                if path:
+                    engine.act(path.pop(0))
+            scheduler.tick()
+            yield tick
+    finally:
+        engine.off('piece_spawned', count_spawn)
+
+
+def open_writer(path, renderer, fps=TICK_RATE):
+    """
+    Returns a writer for `path`: '.y4m' or '-' (stdout) -> Y4MWriter, anything else -> RawWriter.
+    The renderer's colorspace must be 'yuv' for Y4M and is normally 'rgb' for raw files.
+    """
+    file = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    if path == '-' or path.endswith('.y4m'):
+        return Y4MWriter(file, renderer.width, renderer.height, fps)
+    return RawWriter(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a bot game as video frames, no display needed.")
+    parser.add_argument('--out', default='game.y4m', help="output: .y4m, a raw rgb24 file, or - for Y4M on stdout")
+    parser.add_argument('--seconds', type=float, default=60, help="game time to record (60 frames per second)")
+    parser.add_argument('--block', type=int, default=BLOCK_SIZE, help="cell size in pixels")
+    parser.add_argument('--size', default=f'{BOARD_WIDTH}x{BOARD_HEIGHT}', metavar='WxH', help="board size in cells")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    engine = TetrisEngine(seed=args.seed, width=width, height=height)
+    yuv = args.out == '-' or args.out.endswith('.y4m')
+    renderer = FrameRenderer(engine, args.block, colorspace='yuv' if yuv else 'rgb')
+    writer = open_writer(args.out, renderer)
+    frames = int(args.seconds * TICK_RATE)
+    start = time.perf_counter()
+    for _ in bot_ticks(engine, frames, seed=args.seed):
+        writer.write(renderer.render())
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames of {renderer.width}x{renderer.height} in {elapsed:.2f}s "
+          f"({frames / elapsed:,.0f} fps, {frames / elapsed / TICK_RATE:.0f}x real time)", file=sys.stderr)
+    if args.out != '-':
+        writer.file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed Tetromino rotation states and SRS wall-kick tables.
+
+Every rotation of every entry in TETROMINOES is built once at import time as an
+immutable PieceState, so rotating a piece is just picking another index:
+ROTATIONS['T'][1] is the T piece after one clockwise turn from its spawn orientation.
+Together with a position, `(key, rotation, x, y)` fully describes a falling piece
+and is cheap to hash.
+"""
+from tetris_config import TETROMINOES
+
+
+def rotate_clockwise(piece):
+    """
+    Returns a new shape matrix rotated 90 degrees clockwise.
+
+    Args:
+        piece: A square shape matrix (2D list of 0/1).
+    """
+    dim = len(piece)
+    rotated = [[0 for _ in range(dim)] for _ in range(dim)]
+    for r in range(dim):
+        for c in range(dim):
+            rotated[c][dim - 1 - r] = piece[r][c] # Clockwise 90 degrees
+    return rotated
+
+
+class PieceMask:
+    """
+    A shape matrix compiled to cell offsets and bitmasks.
+
+    Attributes:
+        cells: Tuple of (row_offset, column_offset) for every solid block.
+        rows: Tuple of (row_offset, bits) for every non-empty row of the shape,
+              with bit c set when column c of the shape is solid.
+        top: Smallest row offset holding a block.
+        bottom: Largest row offset holding a block.
+        left: Smallest column offset holding a block.
+        right: Largest column offset holding a block.
+        columns: Tuple of (column_offset, lowest_row_offset) for every non-empty column,
+                 i.e. the piece's underside, used to land it on a column-height profile.
+    """
+    __slots__ = ('cells', 'rows', 'top', 'bottom', 'left', 'right', 'columns', '_packed')
+
+    def __init__(self, piece):
+        self.cells = tuple((r, c) for r, row in enumerate(piece) for c, cell in enumerate(row) if cell == 1)
+        self.rows = tuple(
+            (r, sum(1 << c for c, cell in enumerate(row) if cell == 1))
+            for r, row in enumerate(piece) if 1 in row
+        )
+        self.top = self.rows[0][0]
+        self.bottom = self.rows[-1][0]
+        self.left = min(c for _, c in self.cells)
+        self.right = max(c for _, c in self.cells)
+        self.columns = tuple(
+            (c, max(r for r, cell_c in self.cells if cell_c == c))
+            for c in sorted({c for _, c in self.cells})
+        )
+        self._packed = {} # Whole-piece masks, keyed by board width
+
+    def packed(self, width):
+        """
+        Returns the whole piece as one integer laid out like BitBoard.packed
+        (row r of the shape starts at bit r * width), for a board `width` columns wide.
+        """
+        bits = self._packed.get(width)
+        if bits is None:
+            bits = self._packed[width] = sum(row_bits << (r * width) for r, row_bits in self.rows)
+        return bits
+
+
+_MASK_CACHE = {} # Shape matrices seen so far, keyed by their tuple form
+
+
+def piece_mask(piece):
+    """
+    Returns the (cached) PieceMask for a shape matrix, or `piece` itself if it already is one.
+    """
+    if isinstance(piece, PieceMask):
+        return piece
+    key = tuple(map(tuple, piece))
+    mask = _MASK_CACHE.get(key)
+    if mask is None:
+        mask = _MASK_CACHE[key] = PieceMask(piece)
+    return mask
+
+
+class PieceState(PieceMask):
+    """
+    One rotation of one Tetromino. Instances are shared and must not be modified.
+
+    Attributes (in addition to those of PieceMask):
+        key: Tetromino name, e.g. 'T'.
+        rotation: 0 (spawn), 1 (clockwise), 2 (180 degrees) or 3 (counter-clockwise).
+        color: Fill color of the piece.
+        dim: Side length of the shape's bounding matrix.
+        matrix: The shape matrix as a tuple of tuples, so `state[r][c]` reads like a shape matrix.
+    """
+    __slots__ = ('key', 'rotation', 'color', 'dim', 'matrix')
+
+    def __init__(self, key, rotation, matrix):
+        super().__init__(matrix)
+        self.key = key
+        self.rotation = rotation
+        self.color = TETROMINOES[key]['color']
+        self.dim = TETROMINOES[key]['dim']
+        self.matrix = tuple(map(tuple, matrix))
+
+    def __getitem__(self, r):
+        return self.matrix[r]
+
+    def __len__(self):
+        return self.dim
+
+    def __repr__(self):
+        return f"PieceState({self.key!r}, {self.rotation})"
+
+
+def _build_rotations():
+    """Rotates every Tetromino shape through its four orientations."""
+    rotations = {}
+    for key, info in TETROMINOES.items():
+        shape = info['shape']
+        states = []
+        for rotation in range(4):
+            states.append(PieceState(key, rotation, shape))
+            shape = rotate_clockwise(shape)
+        rotations[key] = tuple(states)
+    return rotations
+
+
+# All four rotation states of every Tetromino, computed once at import time.
+ROTATIONS = _build_rotations()
+
+
+# --- SRS wall kicks ---
+# Offsets tried in order when rotating from one state to another; the first one
+# that does not collide wins. They are written as in the SRS guideline (x to the
+# right, y upwards) and converted below to board coordinates, where y grows downwards.
+_JLSTZ_KICKS_SRS = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+_I_KICKS_SRS = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+_O_KICKS_SRS = {transition: ((0, 0),) for transition in _JLSTZ_KICKS_SRS} # The O piece never kicks
+
+
+def _to_board_coordinates(table):
+    """Flips the y axis of an SRS kick table so positive dy moves the piece down."""
+    return {transition: tuple((dx, -dy) for dx, dy in kicks) for transition, kicks in table.items()}
+
+
+# KICKS[key][(from_rotation, to_rotation)] -> tuple of (dx, dy) board offsets to try in order.
+KICKS = {
+    key: _to_board_coordinates(_I_KICKS_SRS if key == 'I' else _O_KICKS_SRS if key == 'O' else _JLSTZ_KICKS_SRS)
+    for key in TETROMINOES
+}
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Placement enumerator: every final resting position a piece can reach.
+
+Starting from the spawn position (or any given position), a breadth-first search
+explores (rotation, x, y) states using the same inputs and SRS kicks as the game:
+left, right, soft drop and clockwise rotation. Every reachable state that cannot
+fall any further is a placement; this includes tucks under overhangs and spins
+that a straight hard drop could never reach. Each placement comes with the board
+it produces, the lines it clears and the shortest input sequence that gets there
+(ending with a hard drop), so a bot can play it on a live TetrisEngine with `act()`.
+
+Results are memoized in an LRU cache keyed by the board contents and the piece.
+"""
+from collections import OrderedDict, deque
+
+from tetris_engine import ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP
+from tetris_config import TETROMINOES
+from tetris_pieces import ROTATIONS, KICKS
+
+
+class Placement:
+    """
+    One way to lock a piece.
+
+    Attributes:
+        piece: The tetris_pieces.PieceState (key and rotation) the piece locks in.
+        x, y: Position of the piece's top-left corner when it locks.
+        lines_cleared: Number of full lines the lock removes.
+        board: The resulting board (after line clears). Shared by the cache: do not modify it.
+        path: Tuple of ACTION_* codes that moves the piece there from the start position and locks it.
+    """
+    __slots__ = ('piece', 'x', 'y', 'lines_cleared', 'board', 'path')
+
+    def __init__(self, piece, x, y, lines_cleared, board, path):
+        self.piece = piece
+        self.x = x
+        self.y = y
+        self.lines_cleared = lines_cleared
+        self.board = board
+        self.path = path
+
+    @property
+    def rotation(self):
+        return self.piece.rotation
+
+    def __repr__(self):
+        return (f"Placement({self.piece.key!r}, rotation={self.piece.rotation}, x={self.x}, y={self.y}, "
+                f"lines={self.lines_cleared}, path={len(self.path)} inputs)")
+
+
+def spawn_position(key, width):
+    """Returns the (x, y) a new piece of type `key` spawns at, as in TetrisEngine.spawn_piece."""
+    return width // 2 - TETROMINOES[key]['dim'] // 2, 0
+
+
+def search_placements(board, key, rotation=0, x=None, y=None):
+    """
+    Uncached breadth-first search over (rotation, x, y) states.
+
+    Args:
+        board: A ListBoard or BitBoard (left untouched).
+        key: Piece type, e.g. 'T'.
+        rotation, x, y: Start state; x and y default to the spawn position.
+
+    Returns:
+        list of Placement, in the order their shortest paths were found.
+    """
+    if x is None or y is None:
+        x, y = spawn_position(key, board.width)
+    states = ROTATIONS[key]
+    kicks = KICKS[key]
+    collides = board.collides
+    if collides(states[rotation], x, y):
+        return []
+
+    start = (rotation, x, y)
+    parents = {start: None} # state -> (previous state, action); also the visited set
+    frontier = deque([start])
+    placements = []
+    locked = set() # Board cells of the placements found so far
+
+    while frontier:
+        state = frontier.popleft()
+        rotation, x, y = state
+        piece = states[rotation]
+        landing = board.drop_position(piece, x, y)
+        cells = frozenset((landing + r, x + c) for r, c in piece.cells)
+        if cells not in locked:
+            # First time any state drops onto these cells: BFS order makes this the shortest path.
+            # Keying on cells also merges rotations that cover the same squares (O, and I/S/Z pairs).
+            locked.add(cells)
+            path = _path_to(parents, state) + (ACTION_HARD_DROP,)
+            result = board.copy()
+            result.merge(piece, x, landing, piece.color)
+            lines_cleared = result.clear_full_rows(range(landing + piece.top, landing + piece.bottom + 1))
+            placements.append(Placement(piece, x, landing, lines_cleared, result, path))
+
+        # Neighbouring states, one input away
+        candidates = []
+        if not collides(piece, x - 1, y):
+            candidates.append(((rotation, x - 1, y), ACTION_LEFT))
+        if not collides(piece, x + 1, y):
+            candidates.append(((rotation, x + 1, y), ACTION_RIGHT))
+        if landing > y:
+            candidates.append(((rotation, x, y + 1), ACTION_DOWN))
+        turned = (rotation + 1) % 4
+        for dx, dy in kicks[rotation, turned]: # Same SRS kick order as TetrisEngine.rotate_piece
+            if not collides(states[turned], x + dx, y + dy):
+                candidates.append(((turned, x + dx, y + dy), ACTION_ROTATE))
+                break
+        for next_state, action in candidates:
+            if next_state not in parents:
+                parents[next_state] = (state, action)
+                frontier.append(next_state)
+    return placements
+
+
+def _path_to(parents, state):
+    """Rebuilds the tuple of actions leading from the BFS start to `state`."""
+    actions = []
+    step = parents[state]
+    while step is not None:
+        state, action = step
+        actions.append(action)
+        step = parents[state]
+    return tuple(reversed(actions))
+
+
+class PlacementCache:
+    """
+    LRU-memoized placement enumeration.
+    Repeated queries for the same board contents and piece return the cached list.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def placements(self, board, key, rotation=0, x=None, y=None):
+        """
+        Returns all placements of piece `key` on `board` (see search_placements).
+        The returned list and its boards are shared between callers; do not modify them.
+        """
+        cache_key = (board.key(), board.width, key, rotation, x, y)
+        entries = self._entries
+        result = entries.get(cache_key)
+        if result is not None:
+            entries.move_to_end(cache_key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = search_placements(board, key, rotation, x, y)
+        entries[cache_key] = result
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False) # Evict the least recently used entry
+        return result
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+_default_cache = PlacementCache()
+
+
+def enumerate_placements(board, key, rotation=0, x=None, y=None):
+    """Returns all reachable placements of piece `key` on `board`, using a shared LRU cache."""
+    return _default_cache.placements(board, key, rotation, x, y)
+
+
+def placements_for(engine):
+    """Returns the placements reachable by the falling piece of a TetrisEngine from where it is now."""
+    piece = engine.current_piece
+    return enumerate_placements(engine.board, piece.key, piece.rotation, engine.current_x, engine.current_y)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Latency and frame-time instrumentation for the Tk game.
+
+`Instrumentation.install(game)` wraps a running TetrisGame's hot methods in timing
+hooks that feed fixed-size histograms:
+
+    key_press             how long the key handler itself takes
+    input_latency         from a key event entering `key_press` until Tk has
+                          finished the redraw that shows its effect ("input to photon")
+    frame                 time spent in one game_loop frame (logic ticks + drawing)
+    present               from the start of draw_board until Tk's idle redraw has run
+    check_collision, merge_piece_to_board, clear_lines, draw_board, draw_next_piece
+
+Nothing is patched unless `install()` is called, so a game without instrumentation
+pays nothing at all. An optional HUD shows FPS and p50/p99 frame and input
+latency on the board canvas, and `dump()` writes all histograms to JSON:
+
+    python tetris_python.py --hud --profile profile.json
+"""
+import functools
+import json
+import math
+import time
+from collections import deque
+
+_SUB_BUCKETS = 4 # Buckets per power of two: bucket bounds are ~19% apart
+_BUCKETS = 30 * _SUB_BUCKETS + 1 # 1 us .. ~18 minutes; bucket 0 holds everything below 1 us
+
+
+class Histogram:
+    """
+    Fixed-size log-scale histogram of durations in seconds.
+    Recording is O(1) and memory never grows; percentiles are accurate to one bucket.
+    """
+    __slots__ = ('name', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        us = seconds * 1e6
+        index = int(math.log2(us) * _SUB_BUCKETS) + 1 if us >= 1 else 0
+        self.counts[min(index, _BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def bucket_bound(index):
+        """Upper bound of bucket `index` in seconds."""
+        return 2 ** (index / _SUB_BUCKETS) * 1e-6
+
+    def percentile(self, q):
+        """Returns the q-th percentile (0-100) in seconds (the upper bound of its bucket), or None if empty."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bucket_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Returns count, mean, min, max and p50/p90/p99/p999 in milliseconds, plus the non-empty buckets."""
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 4)
+        return {
+            'count': self.count,
+            'mean_ms': ms(self.total / self.count) if self.count else None,
+            'min_ms': ms(self.min) if self.count else None,
+            'max_ms': ms(self.max),
+            'p50_ms': ms(self.percentile(50)),
+            'p90_ms': ms(self.percentile(90)),
+            'p99_ms': ms(self.percentile(99)),
+            'p999_ms': ms(self.percentile(99.9)),
+            'buckets': {f'{self.bucket_bound(i) * 1000:.4g}': c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class Instrumentation:
+    """
+    A set of histograms plus the hooks that fill them.
+
+    Attributes:
+        histograms: dict name -> Histogram.
+    """
+    ENGINE_METHODS = ('check_collision', 'merge_piece_to_board', 'clear_lines')
+    GAME_METHODS = ('draw_board', 'draw_next_piece')
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.histograms = {}
+        self.pending_inputs = [] # Timestamps of key events not yet shown on screen
+        self.frame_times = deque(maxlen=120) # Start times of recent frames, for FPS
+        self.game = None
+        self.hud_item = None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name)
+        return histogram
+
+    def timed(self, name, func):
+        """Returns a wrapper around `func` that records each call's duration in histogram `name`."""
+        record = self.histogram(name).record
+        clock = self.clock
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(clock() - start)
+        return wrapper
+
+    # --- Installing the hooks ---
+
+    def install(self, game, hud=False):
+        """
+        Instruments a TetrisGame by shadowing its methods (and its engine's) with
+        timed wrappers on the instances. Callers that look the methods up on the
+        instance, including the engine itself, the key bindings and the frame
+        loop, go through the hooks from then on.
+
+        Args:
+            game: The TetrisGame to measure.
+            hud: Also show a live statistics overlay on the board canvas.
+        """
+        self.game = game
+        engine = game.engine
+        for name in self.ENGINE_METHODS:
+            setattr(engine, name, self.timed(name, getattr(engine, name)))
+        draw_next_piece = self.timed('draw_next_piece', game.draw_next_piece)
+        game.draw_next_piece = draw_next_piece
+        game.draw_board = self._hook_draw(self.timed('draw_board', game.draw_board))
+        game.key_press = self._hook_key_press(self.timed('key_press', game.key_press))
+        game.game_loop = self._hook_game_loop(game.game_loop)
+        if hud:
+            self.hud_item = game.canvas.create_text(
+                4, 4, anchor='nw', text="", fill='white', font=("Consolas", 9)) # Persistent item, updated in place
+            self._update_hud()
+
+    def _hook_key_press(self, key_press):
+        @functools.wraps(key_press)
+        def wrapper(action):
+            self.pending_inputs.append(self.clock()) # Timestamp as the event enters the handler
+            return key_press(action)
+        return wrapper
+
+    def _hook_draw(self, draw_board):
+        @functools.wraps(draw_board)
+        def wrapper():
+            start = self.clock()
+            inputs = self.pending_inputs
+            self.pending_inputs = []
+            draw_board()
+            # Tk redraws the canvas from an idle handler it queued while items changed;
+            # an idle callback queued now runs after it, i.e. once the frame is on screen.
+            self.game.master.after_idle(self._presented, start, inputs)
+        return wrapper
+
+    def _presented(self, draw_start, inputs):
+        now = self.clock()
+        self.histogram('present').record(now - draw_start)
+        latency = self.histogram('input_latency').record
+        for pressed in inputs:
+            latency(now - pressed)
+
+    def _hook_game_loop(self, game_loop):
+        frame = self.histogram('frame').record
+
+        @functools.wraps(game_loop)
+        def wrapper():
+            start = self.clock()
+            self.frame_times.append(start)
+            game_loop()
+            frame(self.clock() - start)
+        return wrapper
+
+    # --- Reporting ---
+
+    def fps(self):
+        """Frames per second over the recent frames."""
+        times = self.frame_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def hud_text(self):
+        frame = self.histogram('frame')
+        latency = self.histogram('input_latency')
+        ms = lambda seconds: '-' if seconds is None else f'{seconds * 1000:.1f}'
+        return (f"FPS {self.fps():.0f}\n"
+                f"frame p50 {ms(frame.percentile(50))} p99 {ms(frame.percentile(99))} ms\n"
+                f"input p50 {ms(latency.percentile(50))} p99 {ms(latency.percentile(99))} ms")
+
+    def _update_hud(self, interval=250):
+        game = self.game
+        game.canvas.itemconfig(self.hud_item, text=self.hud_text())
+        game.master.after(interval, self._update_hud, interval)
+
+    def report(self):
+        """Returns {'fps': ..., 'histograms': {name: summary}} ready for JSON."""
+        return {
+            'fps': round(self.fps(), 2),
+            'histograms': {name: h.summary() for name, h in sorted(self.histograms.items())},
+        }
+
+    def dump(self, path):
+        """Writes `report()` to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
@@ -4,83 +4,50 @@ Created on Wed Jun 25 13:48:27 2025
 @author: hakan
 to show usage of Tkinter library for GUI 
 """
+import argparse # Import argparse for the command-line options
 import tkinter as tk # Import the Tkinter library for GUI development
 from tkinter import messagebox # Import messagebox for pop-up messages
-import random # Import random for selecting random Tetrominoes
-import time # Import time (though not strictly necessary for this specific implementation of the game loop, sometimes used for delays)
-
-# --- Game Configuration ---
-# Define constants for the game board dimensions and block size.
-BOARD_WIDTH = 10 # Number of blocks wide the game board is
-BOARD_HEIGHT = 20 # Number of blocks high the game board is
-BLOCK_SIZE = 30 # Size of each square block in pixels (e.g., 30x30 pixels)
-
-# Define a dictionary of colors for each Tetromino type and for the game board.
-COLORS = {
-    'I': '#00FFFF', # Cyan for the 'I' shape
-    'O': '#FFFF00', # Yellow for the 'O' shape
-    'T': '#800080', # Purple for the 'T' shape
-    'S': '#00FF00', # Green for the 'S' shape
-    'Z': '#FF0000', # Red for the 'Z' shape
-    'J': '#0000FF', # Blue for the 'J' shape
-    'L': '#FFA500', # Orange for the 'L' shape
-    'G': '#808080', # Grey for blocks that have settled onto the board
-    'B': '#2C3E50'  # Dark blue-grey for the background color of the game board
-}
-
-# Define Tetromino shapes as 2D lists (matrices).
-# Each '1' represents a filled block, '0' represents an empty space.
-# The dimensions (3x3 or 4x4) are designed to contain the piece and its rotations.
-SHAPES = {
-    'I': [[0, 0, 0, 0], # The 'I' piece (straight line) is 4x4 for rotation
-          [1, 1, 1, 1],
-          [0, 0, 0, 0],
-          [0, 0, 0, 0]],
-    'J': [[1, 0, 0],   # The 'J' piece
-          [1, 1, 1],
-          [0, 0, 0]],
-    'L': [[0, 0, 1],   # The 'L' piece
-          [1, 1, 1],
-          [0, 0, 0]],
-    'O': [[1, 1],      # The 'O' piece (square) is 2x2 and doesn't rotate visually
-          [1, 1]],
-    'S': [[0, 1, 1],   # The 'S' piece
-          [1, 1, 0],
-          [0, 0, 0]],
-    'T': [[0, 1, 0],   # The 'T' piece
-          [1, 1, 1],
-          [0, 0, 0]],
-    'Z': [[1, 1, 0],   # The 'Z' piece
-          [0, 1, 1],
-          [0, 0, 0]]
-}
 
-# A comprehensive dictionary storing information about each Tetromino type.
-# 'shape': The actual 2D list representing the piece.
-# 'color': The corresponding color from the COLORS dictionary.
-# 'dim': The dimension (side length) of the square matrix that contains the shape (e.g., 3 for J,L,S,T,Z; 4 for I; 2 for O).
-TETROMINOES = {
-    'I': {'shape': SHAPES['I'], 'color': COLORS['I'], 'dim': 4},
-    'J': {'shape': SHAPES['J'], 'color': COLORS['J'], 'dim': 3},
-    'L': {'shape': SHAPES['L'], 'color': COLORS['L'], 'dim': 3},
-    'O': {'shape': SHAPES['O'], 'color': COLORS['O'], 'dim': 2},
-    'S': {'shape': SHAPES['S'], 'color': COLORS['S'], 'dim': 3},
-    'T': {'shape': SHAPES['T'], 'color': COLORS['T'], 'dim': 3},
-    'Z': {'shape': SHAPES['Z'], 'color': COLORS['Z'], 'dim': 3}
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, BLOCK_SIZE, COLORS
+from tetris_engine import TetrisEngine # Headless rules engine that owns the game state
+from tetris_engine import ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP
+from tetris_render import BOARD_RENDERERS, PreviewRenderer # Incremental canvas drawing
+from tetris_random import new_seed # Every game gets its own seed so it can be replayed
+from tetris_replay import ReplayRecorder, EVENT_TICK, EVENT_PAUSE # Optional game recording
+from tetris_timing import FixedStepScheduler # Fixed-timestep gravity, DAS/ARR and lock delay
+
+# Keys that control the falling piece. Presses and releases both go to the
+# scheduler, which handles auto-repeat itself.
+KEY_ACTIONS = {
+    'Left': ACTION_LEFT, # Left arrow key moves piece left
+    'Right': ACTION_RIGHT, # Right arrow key moves piece right
+    'Down': ACTION_DOWN, # Down arrow key soft drops while held
+    'Up': ACTION_ROTATE, # Up arrow key rotates the piece
+    'space': ACTION_HARD_DROP, # Spacebar performs a hard drop
 }
 
 
 class TetrisGame:
     """
     Main class for the Tetris game application.
-    Manages game state, UI elements, and game logic.
+    A Tkinter frontend on top of TetrisEngine: draws the engine state and
+    forwards keyboard input to it.
     """
-    def __init__(self, master): # CORRECTED: Removed (object) from self parameter
+    def __init__(self, master, replay_dir=None, bot=None, bot_delay=150, width=BOARD_WIDTH, height=BOARD_HEIGHT,
+                 block_size=BLOCK_SIZE, renderer='items'): # CORRECTED: Removed (object) from self parameter
         """
         Initializes the Tetris game. This is the constructor for the TetrisGame class.
 
         Args:
             master: The Tkinter root window instance (e.g., tk.Tk()) where the game will be displayed.
+            replay_dir: Optional directory; if given, every game is saved there as a replay file
+                        (see tetris_replay.py).
+            bot: Optional tetris_bot.TetrisBot that plays instead of the keyboard.
+            bot_delay: Milliseconds between two bot moves, so the Tk event loop stays responsive.
+            width, height: Board size in cells.
+            block_size: Size of one cell in pixels.
+            renderer: 'items' (one canvas rectangle per cell) or 'photo' (one PhotoImage,
+                      for very large boards); see tetris_render.BOARD_RENDERERS.
         """
         self.master = master # Store the main Tkinter window
         self.master.title("Tkinter Tetris") # Set the title of the game window
@@ -89,8 +56,8 @@ class TetrisGame:
         # Create the main game canvas where the Tetris blocks will be drawn.
         self.canvas = tk.Canvas(
             master, # Parent widget is the main window
-            width=BOARD_WIDTH * BLOCK_SIZE, # Calculate canvas width based on board blocks and block size
-            height=BOARD_HEIGHT * BLOCK_SIZE, # Calculate canvas height
+            width=width * block_size, # Calculate canvas width based on board blocks and block size
+            height=height * block_size, # Calculate canvas height
             bg=COLORS['B'], # Set background color of the canvas (game board)
             highlightthickness=0 # Remove the default border highlight around the canvas
         )
@@ -124,340 +91,264 @@ class TetrisGame:
         # Canvas for displaying the next upcoming Tetromino.
         self.next_piece_canvas = tk.Canvas(
             self.info_frame,
-            width=4 * BLOCK_SIZE, # Canvas size (e.g., 4x4 blocks) to fit any Tetromino
-            height=4 * BLOCK_SIZE,
+            width=4 * block_size, # Canvas size (e.g., 4x4 blocks) to fit any Tetromino
+            height=4 * block_size,
             bg='#4A6572', # Slightly different background for visual separation
             highlightthickness=0
         )
         self.next_piece_canvas.pack(side=tk.TOP, padx=5, pady=5, expand=True) # Place it within the info frame
+        self.preview_renderer = PreviewRenderer(self.next_piece_canvas, block_size) # Four persistent block items
 
         # Bind keyboard events to game control functions.
-        # These lines associate specific key presses with methods of the TetrisGame class.
-        self.master.bind('<Left>', self.move_left) # Left arrow key moves piece left
-        self.master.bind('<Right>', self.move_right) # Right arrow key moves piece right
-        self.master.bind('<Down>', self.move_down) # Down arrow key performs a soft drop
-        self.master.bind('<Up>', self.rotate_piece) # Up arrow key rotates the piece
-        self.master.bind('<space>', self.hard_drop) # Spacebar performs a hard drop
+        # Both press and release are bound so that held keys auto-repeat at the
+        # scheduler's DAS/ARR rate rather than at the OS key repeat rate.
+        for key, action in KEY_ACTIONS.items():
+            self.master.bind(f'<KeyPress-{key}>', lambda event, action=action: self.key_press(action))
+            self.master.bind(f'<KeyRelease-{key}>', lambda event, action=action: self.key_release(action))
         self.master.bind('<Escape>', self.pause_game) # Escape key pauses/resumes the game
 
-        # --- Game State Variables ---
-        # A 2D list (matrix) representing the game board.
-        # Each cell stores the color of the settled block at that position, or '' if empty.
-        self.board = [['' for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        self.current_piece = None # Stores the 2D list (shape matrix) of the currently falling Tetromino.
-        self.current_color = None # Stores the color of the current piece.
-        self.current_dim = None   # Stores the dimension (e.g., 3 or 4) of the current piece's shape matrix.
-        self.current_x = 0        # X-coordinate (column) of the top-left corner of the current piece on the board.
-        self.current_y = 0        # Y-coordinate (row) of the top-left corner of the current piece on the board.
-        self.score = 0            # The player's current score.
-        self.game_over = False    # Boolean flag: True if the game is over, False otherwise.
+        # --- Game State ---
+        # All rules and state live in the headless engine; this class only draws it
+        # and forwards keyboard input to it.
+        self.engine = TetrisEngine(width=width, height=height)
+        # Game logic runs in fixed ticks; its inputs and gravity go through this class
+        # (perform / gravity_step) so that they are recorded like key presses.
+        self.scheduler = FixedStepScheduler(self.engine, on_input=self.perform, on_gravity=self.gravity_step)
+        # One persistent item per board cell, or one image for giant boards
+        self.board_renderer = BOARD_RENDERERS[renderer](self.canvas, self.engine, block_size, ghost=True)
+        self.needs_draw = False # Set by engine events; the board is redrawn once per frame
+        self.engine.on('piece_moved', self.request_draw) # Falling piece moved: redraw the board
+        self.engine.on('board_changed', self.on_board_changed) # Settled blocks changed: redraw those rows
+        self.engine.on('piece_spawned', self.on_piece_spawned) # New piece: redraw board and preview
+        self.engine.on('score_changed', self.update_score) # Score changed: refresh the label
+        self.engine.on('lines_cleared', self.update_score) # Lines cleared: the level may have gone up
+        self.engine.on('game_over', self.on_game_over) # Spawn collided: show the game over dialog
         self.paused = False       # Boolean flag: True if the game is paused, False otherwise.
         self.game_loop_id = None  # Stores the ID returned by master.after(), used to cancel the game loop.
-
-        # A list to act as a queue for upcoming Tetrominoes.
-        # This ensures players know what piece is next.
-        self.piece_queue = []
-        self.fill_piece_queue() # Initialize the queue with pieces
+        self.pending_releases = {} # action -> after_idle ID of a key release not yet applied
+        self.replay_dir = replay_dir # Where finished games are saved (None = don't record)
+        self.recorder = None      # ReplayRecorder of the game in progress, if recording
+        self.bot = bot            # Autoplayer used as the input source (None = keyboard only)
+        self.bot_delay = bot_delay
+        self.bot_turn_id = None   # ID of the scheduled bot move, like game_loop_id
+        # Input handlers by ACTION_* code, so the bot goes through the same path as the keys
+        self.input_handlers = {
+            ACTION_LEFT: self.move_left,
+            ACTION_RIGHT: self.move_right,
+            ACTION_DOWN: self.move_down,
+            ACTION_ROTATE: self.rotate_piece,
+            ACTION_HARD_DROP: self.hard_drop,
+        }
 
         self.start_game() # Call the method to start the game immediately upon initialization
 
-    def fill_piece_queue(self):
-        """
-        Ensures the piece queue is filled with random tetrominoes.
-        Shuffles the list of all Tetromino keys and extends the queue.
-        """
-        if not self.piece_queue: # Check if the queue is empty
-            keys = list(TETROMINOES.keys()) # Get all Tetromino names (e.g., 'I', 'J', 'L')
-            random.shuffle(keys) # Randomize the order of these names
-            self.piece_queue.extend(keys) # Add them to the end of the queue
+    # --- Read-only views of the engine state (kept for code that inspects the game directly) ---
 
-    def get_next_piece_from_queue(self):
-        """
-        Retrieves and removes the next piece key from the piece queue.
-        Calls fill_piece_queue to ensure there's always a piece ready.
+    @property
+    def board(self):
+        """The settled blocks, as a 2D list of color strings ('' for empty cells)."""
+        return self.engine.board
 
-        Returns:
-            str: The key (name) of the next Tetromino (e.g., 'T', 'O').
-        """
-        self.fill_piece_queue() # Make sure the queue has pieces
-        return self.piece_queue.pop(0) # Remove and return the first element from the queue
+    @property
+    def current_piece(self):
+        """The rotation state (tetris_pieces.PieceState) of the currently falling Tetromino."""
+        return self.engine.current_piece
+
+    @property
+    def piece_queue(self):
+        """The keys of the upcoming Tetrominoes; piece_queue[0] is shown as 'Next'."""
+        return self.engine.piece_queue
+
+    @property
+    def score(self):
+        """The player's current score."""
+        return self.engine.score
+
+    @property
+    def game_over(self):
+        """True once a newly spawned piece has collided."""
+        return self.engine.game_over
 
     def draw_next_piece(self):
         """
         Draws the next piece from the queue onto its dedicated `next_piece_canvas`.
         This gives the player a preview of the upcoming Tetromino.
         """
-        self.next_piece_canvas.delete("all") # Clear anything currently drawn on the next piece canvas
-        if self.piece_queue: # Only draw if there's a piece in the queue
-            next_piece_key = self.piece_queue[0] # Get the key of the next piece without removing it
-            next_piece_info = TETROMINOES[next_piece_key] # Get its shape, color, and dimension
-            next_shape = next_piece_info['shape']
-            next_color = next_piece_info['color']
-            next_dim = next_piece_info['dim']
-
-            for r in range(next_dim): # Iterate through rows of the next piece's shape matrix
-                for c in range(next_dim): # Iterate through columns
-                    if next_shape[r][c] == 1: # If there's a block at this position in the shape
-                        # Calculate coordinates for drawing the block.
-                        # (4 - next_dim) * BLOCK_SIZE / 2 is used to visually center the piece
-                        # in the 4x4 next_piece_canvas, regardless of its actual dimension (2x2, 3x3, 4x4).
-                        x1 = c * BLOCK_SIZE + (4 - next_dim) * BLOCK_SIZE / 2
-                        y1 = r * BLOCK_SIZE + (4 - next_dim) * BLOCK_SIZE / 2
-                        x2 = x1 + BLOCK_SIZE
-                        y2 = y1 + BLOCK_SIZE
-                        self.next_piece_canvas.create_rectangle( # Draw the rectangle representing the block
-                            x1, y1, x2, y2,
-                            fill=next_color, # Fill color
-                            outline='black', # Border color
-                            width=2 # Border width
-                        )
+        self.preview_renderer.draw(self.piece_queue[0] if self.piece_queue else None)
 
     def start_game(self):
         """
         Resets the game state and begins a new game.
         Called at the start and after a "Game Over" restart.
         """
-        self.board = [['' for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)] # Clear the game board
-        self.score = 0 # Reset score
-        self.game_over = False # Reset game over flag
         self.paused = False # Ensure game is not paused
-        self.update_score() # Update the score display to 0
-        self.piece_queue = [] # Clear and refill piece queue for new game
-        self.fill_piece_queue()
-        self.spawn_piece() # Spawn the first piece
-        self.game_loop() # Start the main game loop
-
-    def spawn_piece(self):
-        """
-        Selects a new random Tetromino from the queue and places it at the top center of the board.
-        Checks for immediate game over conditions.
-        """
-        piece_key = self.get_next_piece_from_queue() # Get the key of the next piece from the queue
-        piece_info = TETROMINOES[piece_key] # Retrieve its full info
-        self.current_piece = piece_info['shape'] # Set the current piece's shape
-        self.current_color = piece_info['color'] # Set the current piece's color
-        self.current_dim = piece_info['dim'] # Set the current piece's dimension
-        # Calculate initial X position to center the piece horizontally
-        self.current_x = BOARD_WIDTH // 2 - self.current_dim // 2
-        self.current_y = 0 # Start the piece at the very top of the board
-
-        # Check for immediate game over: if the new piece collides upon spawning
-        if self.check_collision(self.current_piece, self.current_x, self.current_y):
-            self.game_over = True # Set game over flag
-            self.display_game_over() # Show game over message
-        else:
-            self.draw_board() # Redraw the board to show the newly spawned piece
-            self.draw_next_piece() # Update the 'Next' piece display
+        seed = new_seed()
+        if self.replay_dir is not None:
+            self.recorder = ReplayRecorder(seed, width=self.engine.width, height=self.engine.height)
+        self.scheduler.reset() # Level 1, no keys held, clock restarted
+        self.engine.reset(seed) # Clear the board, reset the score and spawn the first piece
+        if not self.game_over:
+            self.game_loop() # Start the main game loop
+            if self.bot is not None and self.bot_turn_id is None:
+                self.bot_turn_id = self.master.after(self.bot_delay, self.bot_turn)
+
+    def on_piece_spawned(self):
+        """Redraws the board and the 'Next' preview after the engine spawns a piece."""
+        self.request_draw() # Redraw the board to show the newly spawned piece
+        self.draw_next_piece() # Update the 'Next' piece display
+
+    def on_game_over(self):
+        """
+        Called by the engine when a new piece collides on spawn.
+        The dialog is deferred until the current event handler has returned,
+        so the engine is never re-entered from inside one of its own methods.
+        """
+        self.master.after_idle(self.display_game_over)
+
+    def on_board_changed(self, rows):
+        """Marks the board rows the engine changed as dirty and redraws."""
+        self.board_renderer.mark_rows(rows)
+        self.request_draw()
+
+    def request_draw(self):
+        """Schedules a board redraw for the end of the current frame."""
+        self.needs_draw = True
 
     def draw_board(self):
         """
-        Draws the entire game board on the canvas.
-        Includes all settled blocks and the current falling piece.
+        Draws the game board on the canvas: all settled blocks and the current falling piece.
+        Only cells whose color changed since the previous frame are touched.
         """
-        self.canvas.delete("all") # Clear everything currently drawn on the main game canvas
-
-        # Draw settled blocks (those merged into the self.board matrix)
-        for r in range(BOARD_HEIGHT): # Iterate through each row of the board
-            for c in range(BOARD_WIDTH): # Iterate through each column
-                if self.board[r][c] != '': # If a block exists at this cell (not empty string)
-                    color = self.board[r][c] # Get the color of the settled block
-                    # Calculate pixel coordinates for the rectangle
-                    x1, y1 = c * BLOCK_SIZE, r * BLOCK_SIZE
-                    x2, y2 = x1 + BLOCK_SIZE, y1 + BLOCK_SIZE
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline='black', width=2)
-
-        # Draw the current falling piece (if game is not over)
-        if self.current_piece and not self.game_over:
-            for r in range(self.current_dim): # Iterate through rows of the current piece's shape matrix
-                for c in range(self.current_dim): # Iterate through columns
-                    if self.current_piece[r][c] == 1: # If there's a block in the piece's shape at (r, c)
-                        # Calculate pixel coordinates for the falling block on the main board
-                        x1, y1 = (self.current_x + c) * BLOCK_SIZE, (self.current_y + r) * BLOCK_SIZE
-                        x2, y2 = x1 + BLOCK_SIZE, y1 + BLOCK_SIZE
-                        self.canvas.create_rectangle(x1, y1, x2, y2, fill=self.current_color, outline='black', width=2)
-
-    def check_collision(self, piece, x, y):
-        """
-        Checks if the given `piece` (at potential `x`, `y` coordinates) collides
-        with board boundaries or any already settled blocks.
+        self.needs_draw = False
+        self.board_renderer.draw()
 
-        Args:
-            piece: The shape matrix (2D list) of the piece to check.
-            x: The proposed x-coordinate (column) of the piece's top-left corner.
-            y: The proposed y-coordinate (row) of the piece's top-left corner.
+    def update_score(self, score=None):
+        """Updates the score display label on the Tkinter UI."""
+        self.score_label.config(text=f"Score: {self.score}   Level: {self.scheduler.level}") # Set the text of the score_label
 
-        Returns:
-            True if a collision is detected, False otherwise.
-        """
-        for r in range(len(piece)): # Iterate through rows of the piece's shape
-            for c in range(len(piece[0])): # Iterate through columns
-                if piece[r][c] == 1: # If this part of the piece is a solid block
-                    board_x, board_y = x + c, y + r # Calculate its absolute position on the game board
-
-                    # 1. Check horizontal boundaries (left and right walls)
-                    if not (0 <= board_x < BOARD_WIDTH):
-                        return True
-                    # 2. Check vertical boundaries (bottom of the board)
-                    if not (0 <= board_y < BOARD_HEIGHT):
-                        return True
-                    # 3. Check collision with existing blocks on the board
-                    # Only check if the board_y is valid (prevents IndexError for blocks spawning off board)
-                    if self.board[board_y][board_x] != '':
-                        return True
-        return False # No collision detected
-
-    def merge_piece_to_board(self):
+    def game_loop(self):
         """
-        When a piece lands, this method merges its blocks into the static `self.board` matrix.
-        After merging, it triggers line clearing.
+        The core game loop, run once per frame.
+        It lets the scheduler run every logic tick that is due by the clock
+        (gravity, auto-repeat, lock delay), redraws the board once if anything
+        changed and reschedules itself for the next tick. Because the ticks
+        follow the clock, a slow frame never slows the game down.
         """
-        for r in range(self.current_dim): # Iterate through rows of the current piece's shape
-            for c in range(self.current_dim): # Iterate through columns
-                if self.current_piece[r][c] == 1: # If this part of the piece is a solid block
-                    # Place the block's color onto the main board at its absolute position
-                    self.board[self.current_y + r][self.current_x + c] = self.current_color
-        self.clear_lines() # After merging, immediately check and clear any full lines
-
-    def clear_lines(self):
+        self.game_loop_id = None
+        if self.game_over or self.paused: # If game is over or paused, stop the loop
+            return
+
+        self.scheduler.advance()
+        if self.needs_draw:
+            self.draw_board()
+        if self.game_over: # The engine has already scheduled the game over dialog
+            return
+
+        # Schedule the next frame for when the next tick is due (about 16 ms at 60 ticks per second)
+        self.game_loop_id = self.master.after(self.scheduler.ms_until_next_tick(), self.game_loop)
+
+    def gravity_step(self):
+        """Scheduler callback: one row of gravity, or locking a grounded piece."""
+        self.record(EVENT_TICK)
+        self.engine.step() # Move the piece down, or lock it and spawn the next one
+
+    def record(self, event):
+        """Adds an input or gravity tick to the replay, if this game is being recorded."""
+        if self.recorder is not None:
+            self.recorder.record(event)
+
+    def bot_turn(self):
         """
-        Iterates through the board from bottom to top, checks for and clears any full lines.
-        Shifts all blocks above cleared lines down. Updates the score.
+        Lets the bot place the falling piece, then schedules its next move.
+        The bot's inputs go through the normal key handlers, so they are recorded
+        in replays and respect pause. Each turn is one short callback (the bot's
+        search is bounded by its time budget), so the window never freezes.
         """
-        lines_cleared = 0 # Counter for how many lines were cleared in this operation
-        # Create a new, empty board to reconstruct the state after clearing lines
-        new_board = [['' for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        current_row = BOARD_HEIGHT - 1 # Start filling the new board from the bottom-most row
-
-        # Iterate through the board from bottom to top
-        for r in range(BOARD_HEIGHT - 1, -1, -1):
-            is_full = True # Assume the current row is full
-            for c in range(BOARD_WIDTH): # Check all columns in the current row
-                if self.board[r][c] == '': # If any cell is empty, the line is not full
-                    is_full = False
-                    break # No need to check further columns in this row
-            if not is_full: # If the line is NOT full, copy it to the new board
-                for c in range(BOARD_WIDTH):
-                    new_board[current_row][c] = self.board[r][c]
-                current_row -= 1 # Move up one row in the new board for the next non-full line
-            else:
-                lines_cleared += 1 # If the line IS full, increment the counter
-
-        self.board = new_board # Replace the old board with the new, cleared board
-        self.score += lines_cleared * 100 # Add points for cleared lines (100 points per line)
-        if lines_cleared == 4: # Special bonus for clearing 4 lines at once (a "Tetris")
-            self.score += 400 # Additional 400 points
-        self.update_score() # Update the score display on the UI
-
-    def update_score(self):
-        """Updates the score display label on the Tkinter UI."""
-        self.score_label.config(text=f"Score: {self.score}") # Set the text of the score_label
+        self.bot_turn_id = None
+        if self.game_over:
+            return
+        if not self.paused:
+            placement = self.bot.choose(self.engine)
+            if placement is not None:
+                for action in placement.path:
+                    self.perform(action)
+                    if self.game_over: # The dialog is already scheduled
+                        return
+        self.bot_turn_id = self.master.after(self.bot_delay, self.bot_turn)
+
+    def key_press(self, action):
+        """Key pressed: hands it to the scheduler (repeats from OS autorepeat are filtered out)."""
+        pending = self.pending_releases.pop(action, None)
+        if pending is not None: # A release immediately followed by a press is X11 autorepeat
+            self.master.after_cancel(pending)
+            return
+        if self.paused or self.game_over: return
+        self.scheduler.press(action)
 
-    def game_loop(self):
+    def key_release(self, action):
         """
-        The core game loop that drives the falling of Tetrominoes.
-        It attempts to move the current piece down, handles collisions,
-        and then reschedules itself to run again after a delay.
+        Key released. Applied once the pending events are handled, so that the
+        release/press pairs X11 sends for a held key do not restart DAS.
         """
-        if self.game_over or self.paused: # If game is over or paused, stop the loop
+        if action in self.pending_releases:
             return
+        self.pending_releases[action] = self.master.after_idle(self._apply_release, action)
 
-        # Attempt to move the piece down
-        if not self.check_collision(self.current_piece, self.current_x, self.current_y + 1):
-            self.current_y += 1 # Move the piece down by one row
-        else:
-            # If a collision is detected (piece has landed)
-            self.merge_piece_to_board() # Merge the landed piece into the board
-            self.spawn_piece() # Spawn a new piece
+    def _apply_release(self, action):
+        del self.pending_releases[action]
+        self.scheduler.release(action)
 
-        self.draw_board() # Redraw the entire board to reflect changes
+    def perform(self, action):
+        """Performs one input (ACTION_* code) through its handler; used by the scheduler and the bot."""
+        self.input_handlers[action]()
 
-        # Schedule the next iteration of the game loop.
-        # This creates a recurring timer event. The '500' means 500 milliseconds (0.5 seconds).
-        self.game_loop_id = self.master.after(500, self.game_loop) # Store the ID to be able to cancel it later
-
-    # --- Piece Movement Functions (called by keyboard binds) ---
+    # --- Piece Movement Functions (one input each; called by the scheduler and the bot) ---
 
     def move_left(self, event=None):
         """
         Moves the current piece one block to the left.
-        Triggered by the '<Left>' arrow key.
+        Triggered by the '<Left>' arrow key (through the scheduler, which also auto-repeats it).
         """
-        if self.game_over or self.paused: return # Do nothing if game is over or paused
-        # Check if moving left causes a collision
-        if not self.check_collision(self.current_piece, self.current_x - 1, self.current_y):
-            self.current_x -= 1 # Update the piece's x-coordinate
-            self.draw_board() # Redraw the board to show the new position
+        self.record(ACTION_LEFT)
+        if self.paused: return # Do nothing if game is paused
+        self.engine.move_left()
 
     def move_right(self, event=None):
         """
         Moves the current piece one block to the right.
-        Triggered by the '<Right>' arrow key.
+        Triggered by the '<Right>' arrow key (through the scheduler, which also auto-repeats it).
         """
-        if self.game_over or self.paused: return # Do nothing if game is over or paused
-        # Check if moving right causes a collision
-        if not self.check_collision(self.current_piece, self.current_x + 1, self.current_y):
-            self.current_x += 1 # Update the piece's x-coordinate
-            self.draw_board() # Redraw the board
+        self.record(ACTION_RIGHT)
+        if self.paused: return # Do nothing if game is paused
+        self.engine.move_right()
 
     def move_down(self, event=None):
         """
         Moves the current piece one block down (soft drop).
-        Triggered by the '<Down>' arrow key.
-        This is essentially a manual trigger of one step of the game_loop's downward movement.
+        Used by the bot; the '<Down>' key soft drops through the scheduler's gravity instead.
+        This is essentially a manual trigger of one gravity step.
         """
-        if self.game_over or self.paused: return # Do nothing if game is over or paused
-        # Check if moving down causes a collision
-        if not self.check_collision(self.current_piece, self.current_x, self.current_y + 1):
-            self.current_y += 1 # Update the piece's y-coordinate
-            self.draw_board() # Redraw the board
-        else:
-            # If it collides, it has landed, so merge and spawn a new one
-            self.merge_piece_to_board()
-            self.spawn_piece()
+        self.record(ACTION_DOWN)
+        if self.paused: return # Do nothing if game is paused
+        self.engine.move_down()
 
     def hard_drop(self, event=None):
         """
         Instantly drops the current piece to the lowest possible position.
-        Triggered by the '<space>' bar.
+        Triggered by the '<space>' bar (through the scheduler, which also auto-repeats it).
         """
-        if self.game_over or self.paused: return # Do nothing if game is over or paused
-        # Repeatedly move the piece down until it collides
-        while not self.check_collision(self.current_piece, self.current_x, self.current_y + 1):
-            self.current_y += 1
-        self.merge_piece_to_board() # Merge the piece immediately after it lands
-        self.spawn_piece() # Spawn a new piece
-        self.draw_board() # Redraw the board to show the new state
+        self.record(ACTION_HARD_DROP)
+        if self.paused: return # Do nothing if game is paused
+        self.engine.hard_drop()
 
     def rotate_piece(self, event=None):
         """
-        Rotates the current piece 90 degrees clockwise.
-        Includes a simple "wall kick" mechanism to try and shift the piece
-        if a rotation would otherwise cause a collision.
-        Triggered by the '<Up>' arrow key.
+        Rotates the current piece 90 degrees clockwise (with SRS wall kicks).
+        Triggered by the '<Up>' arrow key (through the scheduler, which also auto-repeats it).
         """
-        if self.game_over or self.paused: return # Do nothing if game is over or paused
-
-        # Create a new matrix for the rotated piece
-        rotated_piece = [[0 for _ in range(self.current_dim)] for _ in range(self.current_dim)]
-        for r in range(self.current_dim):
-            for c in range(self.current_dim):
-                # Apply the rotation transformation (clockwise 90 degrees)
-                rotated_piece[c][self.current_dim - 1 - r] = self.current_piece[r][c]
-
-        # First, check collision with the rotated piece at its current position
-        if not self.check_collision(rotated_piece, self.current_x, self.current_y):
-            self.current_piece = rotated_piece # If no collision, apply the rotation
-            self.draw_board() # Redraw the board
-        else:
-            # If initial rotation causes a collision, try "wall kicks" (simple version)
-            # This attempts to shift the piece slightly left or right to allow rotation.
-            for offset_x in [-1, 1]: # Try moving 1 unit left, then 1 unit right
-                if not self.check_collision(rotated_piece, self.current_x + offset_x, self.current_y):
-                    self.current_x += offset_x # Apply the horizontal offset
-                    self.current_piece = rotated_piece # Apply the rotation
-                    self.draw_board() # Redraw
-                    return # Rotation successful with kick, exit function
-            # If no kick works, the piece cannot rotate in its current position, so do nothing.
+        self.record(ACTION_ROTATE)
+        if self.paused: return # Do nothing if game is paused
+        self.engine.rotate_piece()
 
     def pause_game(self, event=None):
         """
@@ -465,6 +356,7 @@ class TetrisGame:
         When paused, the game loop stops; when unpaused, it resumes.
         Triggered by the '<Escape>' key.
         """
+        self.record(EVENT_PAUSE)
         self.paused = not self.paused # Toggle the paused flag
 
         if self.paused:
@@ -473,6 +365,7 @@ class TetrisGame:
                 self.game_loop_id = None # Clear the ID
             messagebox.showinfo("Game Paused", "Press 'Esc' to resume.") # Inform the user
         else:
+            self.scheduler.resume() # Do not catch up on the time spent paused
             self.game_loop() # If unpaused, restart the game loop immediately
 
     def display_game_over(self):
@@ -483,11 +376,23 @@ class TetrisGame:
         if self.game_loop_id: # If there's an active game loop
             self.master.after_cancel(self.game_loop_id) # Cancel it to fully stop the game
             self.game_loop_id = None
+        if self.bot_turn_id: # Stop the bot as well
+            self.master.after_cancel(self.bot_turn_id)
+            self.bot_turn_id = None
+        self.draw_board() # Show the piece that could not spawn
+        if self.recorder is not None: # Archive the finished game
+            self.recorder.save(self.replay_dir, self.score)
+            self.recorder = None
 
         # Display a message box asking to restart
+        stats = ""
+        if self.bot is not None: # Report how fast the bot was thinking
+            stats = f"\nBot: {self.bot.decisions_per_second:,.0f} decisions/s"
+        jitter = self.scheduler.jitter_stats()
+        stats += f"\nTick jitter: {jitter['mean_ms']:.1f} ms mean, {jitter['max_ms']:.1f} ms max"
         response = messagebox.askyesno(
             "Game Over", # Title of the message box
-            f"Game Over!\nYour final score: {self.score}\nDo you want to play again?" # Message content
+            f"Game Over!\nYour final score: {self.score}{stats}\nDo you want to play again?" # Message content
         )
         if response: # If the user clicks 'Yes'
             self.start_game() # Restart the game
@@ -497,14 +402,42 @@ class TetrisGame:
 # --- Main execution block ---
 # This block ensures the code runs only when the script is executed directly.
 if __name__ == "__main__":
+    # Optional command-line flags, e.g. `python tetris_python.py --record replays/`
+    parser = argparse.ArgumentParser(description="Tkinter Tetris")
+    parser.add_argument('--record', metavar='DIR', help="save every game as a replay file in DIR")
+    parser.add_argument('--bot', action='store_true', help="let the built-in AI play (see tetris_bot.py)")
+    parser.add_argument('--bot-delay', type=int, default=150, metavar='MS', help="milliseconds between bot moves")
+    parser.add_argument('--size', default=f'{BOARD_WIDTH}x{BOARD_HEIGHT}', metavar='WxH',
+                        help="board size in cells, e.g. 200x400 for a wall display")
+    parser.add_argument('--block', type=int, metavar='PX', help="cell size in pixels (default: fit about 900 px high)")
+    parser.add_argument('--renderer', choices=('items', 'photo'), help="board renderer (default: 'photo' above 2,000 cells)")
+    parser.add_argument('--hud', action='store_true', help="show FPS and latency statistics on the board")
+    parser.add_argument('--profile', metavar='PATH', help="measure latencies and write them to PATH (JSON) on exit")
+    args = parser.parse_args()
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    block_size = args.block or max(1, min(BLOCK_SIZE, 900 // height))
+    renderer = args.renderer or ('photo' if width * height > 2000 else 'items')
+    bot = None
+    if args.bot:
+        from tetris_bot import TetrisBot # Only needed when the AI plays
+        bot = TetrisBot()
+
     # Create the main Tkinter window instance. This is the root of the GUI application.
     root = tk.Tk()
 
     # Create an instance of the TetrisGame class, passing the root window.
     # This initializes the game, sets up the UI, and starts the game loop.
-    game = TetrisGame(root)
+    game = TetrisGame(root, replay_dir=args.record, bot=bot, bot_delay=args.bot_delay,
+                      width=width, height=height, block_size=block_size, renderer=renderer)
+    instrumentation = None
+    if args.hud or args.profile: # Without these flags nothing is instrumented
+        from tetris_profile import Instrumentation
+        instrumentation = Instrumentation()
+        instrumentation.install(game, hud=args.hud)
 
     # Start the Tkinter event loop.
     # This line is crucial; it listens for user interactions (key presses, window events)
     # and keeps the GUI window open and responsive. It must be called at the end of the script.
     root.mainloop()
+    if args.profile:
+        instrumentation.dump(args.profile)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic, seeded 7-bag piece generator.
+
+Pieces are dealt in "bags": each bag is a shuffled copy of all seven Tetrominoes,
+so every piece appears exactly once per seven. The shuffle is driven by a small
+SplitMix64 generator implemented here rather than by the `random` module, which
+keeps sequences identical across Python versions (replays depend on that) and
+makes the whole generator state just one integer plus the queued pieces, so it is
+cheap to snapshot and fork.
+"""
+import os
+from collections import deque
+from itertools import islice
+
+from tetris_config import TETROMINOES
+
+PIECE_KEYS = tuple(TETROMINOES) # The seven pieces in canonical order ('I', 'J', 'L', 'O', 'S', 'T', 'Z')
+
+_MASK64 = (1 << 64) - 1
+
+
+def _splitmix64(state):
+    """
+    Advances a SplitMix64 state.
+
+    Returns:
+        (new_state, output): The next state and a 64-bit pseudo-random output.
+    """
+    state = (state + 0x9E3779B97F4A7C15) & _MASK64
+    z = state
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return state, z ^ (z >> 31)
+
+
+def mix64(value):
+    """
+    Hashes an integer to a well-mixed 64-bit value (one SplitMix64 step), e.g. to
+    derive reproducible per-item randomness from a seed and a counter.
+    """
+    return _splitmix64(value & _MASK64)[1]
+
+
+def new_seed():
+    """Returns a fresh random 64-bit seed."""
+    return int.from_bytes(os.urandom(8), 'little')
+
+
+class SevenBag:
+    """
+    A 7-bag randomizer with a queue of upcoming pieces.
+
+    Iterating over a SevenBag yields piece keys forever; `peek(k)` looks ahead
+    without consuming anything. Two bags with the same seed deal the same pieces.
+    """
+    __slots__ = ('seed', '_state', '_queue')
+
+    def __init__(self, seed=None):
+        """
+        Args:
+            seed: Any integer. If omitted a random 64-bit seed is chosen; it is
+                  still stored in `self.seed`, so the game can be reproduced.
+        """
+        if seed is None:
+            seed = new_seed()
+        self.seed = seed # Seed this sequence started from
+        self._state = seed & _MASK64 # Current SplitMix64 state
+        self._queue = deque() # Pieces already shuffled but not yet dealt
+
+    def _refill(self):
+        """Shuffles a fresh bag of all seven pieces onto the end of the queue (Fisher-Yates)."""
+        keys = list(PIECE_KEYS)
+        state = self._state
+        for i in range(len(keys) - 1, 0, -1):
+            state, value = _splitmix64(state)
+            j = (value * (i + 1)) >> 64 # Scale the 64-bit output to 0..i
+            keys[i], keys[j] = keys[j], keys[i]
+        self._state = state
+        self._queue.extend(keys)
+
+    def next(self):
+        """Removes and returns the next piece key."""
+        if not self._queue:
+            self._refill()
+        return self._queue.popleft()
+
+    __next__ = next
+
+    def __iter__(self):
+        return self
+
+    def peek(self, k=1):
+        """
+        Returns an iterator over the next `k` pieces without consuming them.
+        No pieces are copied; the iterator reads the queue directly, so use it
+        before the bag is advanced again.
+        """
+        while len(self._queue) < k:
+            self._refill()
+        return islice(self._queue, k)
+
+    @property
+    def queue(self):
+        """The queued pieces (a deque; queue[0] is the next piece). Do not modify."""
+        if not self._queue:
+            self._refill()
+        return self._queue
+
+    def clear(self):
+        """Drops the queued pieces, so dealing starts from a freshly shuffled bag."""
+        self._queue.clear()
+
+    # --- Snapshots ---
+
+    def snapshot(self):
+        """
+        Returns the complete generator state as an immutable, hashable tuple
+        (seed, rng_state, queued_pieces).
+        """
+        return (self.seed, self._state, ''.join(self._queue))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Creates a bag that continues exactly where `snapshot` was taken."""
+        bag = cls.__new__(cls)
+        bag.restore(snapshot)
+        return bag
+
+    def restore(self, snapshot):
+        """Rewinds (or fast-forwards) this bag to a state returned by `snapshot()`."""
+        self.seed, self._state, queued = snapshot
+        self._queue = deque(queued)
+
+    def fork(self):
+        """Returns an independent copy that will deal the same pieces as this bag from now on."""
+        bag = SevenBag.__new__(type(self))
+        bag.seed = self.seed
+        bag._state = self._state
+        bag._queue = self._queue.copy()
+        return bag
+
+    __copy__ = fork
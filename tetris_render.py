@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental Tk canvas renderers.
+
+Instead of deleting and recreating every rectangle on each frame, these renderers
+create their canvas items once and afterwards only `itemconfig` the cells whose
+color actually changed. A frame therefore costs time proportional to the number
+of changed cells, not to the size of the board.
+
+For very large boards, where even creating one item per cell is too slow,
+PhotoImageRenderer draws into a single PhotoImage and re-blits changed rows.
+"""
+from tetris_config import BLOCK_SIZE, COLORS, TETROMINOES
+from tetris_pieces import ROTATIONS
+
+
+class CellGrid:
+    """
+    A grid of persistent rectangle items on a canvas, one per cell.
+    Empty cells are hidden so the canvas background shows through, exactly as
+    when no rectangle was drawn there at all.
+    """
+    def __init__(self, canvas, columns, rows, block_size=BLOCK_SIZE):
+        """
+        Creates one hidden rectangle for every cell of a `columns` x `rows` grid.
+
+        Args:
+            canvas: The Tk canvas to draw on.
+            columns: Number of cells across.
+            rows: Number of cells down.
+            block_size: Size of each cell in pixels.
+        """
+        self.canvas = canvas
+        self.columns = columns
+        self.rows = rows
+        self.colors = [''] * (columns * rows) # Color currently shown in each cell ('' = hidden)
+        self.items = [] # Canvas item ID of each cell, row by row
+        for r in range(rows):
+            for c in range(columns):
+                x1, y1 = c * block_size, r * block_size
+                self.items.append(canvas.create_rectangle(
+                    x1, y1, x1 + block_size, y1 + block_size,
+                    fill='', outline='black', width=2, state='hidden'
+                ))
+        self.updates = 0 # Number of itemconfig calls made so far (handy for profiling)
+
+    def paint(self, r, c, color):
+        """
+        Shows `color` in cell (`r`, `c`), or hides the cell if `color` is ''.
+        Does nothing if the cell already shows that color.
+        """
+        i = r * self.columns + c
+        if self.colors[i] == color:
+            return
+        self.colors[i] = color
+        self.updates += 1
+        if color:
+            self.canvas.itemconfig(self.items[i], fill=color, state='normal')
+        else:
+            self.canvas.itemconfig(self.items[i], state='hidden')
+
+
+def piece_overlay(engine, ghost=False):
+    """
+    Returns {(row, column): color} for the cells the falling piece (and, with
+    `ghost`, its landing position) covers; empty once the game is over.
+    """
+    cells = {}
+    if engine.current_piece and not engine.game_over:
+        x, y, color = engine.current_x, engine.current_y, engine.current_color
+        if ghost: # Filled first, so the piece itself wins where they overlap
+            ghost_y = engine.ghost_y()
+            for r, c in engine.current_piece.cells:
+                cells[ghost_y + r, x + c] = COLORS['H']
+        for r, c in engine.current_piece.cells:
+            cells[y + r, x + c] = color
+    return cells
+
+
+class BoardRenderer:
+    """
+    Draws a TetrisEngine's board and falling piece onto a canvas incrementally.
+
+    Settled rows are only re-read when they have been marked dirty with
+    `mark_rows()` (the engine's 'board_changed' event says which rows changed),
+    and the falling piece is drawn by diffing its previous and current cells.
+    With `ghost=True` the piece's landing position is shown as well.
+    """
+    def __init__(self, canvas, engine, block_size=BLOCK_SIZE, ghost=False):
+        self.engine = engine
+        self.ghost = ghost # Draw the ghost piece (from the engine's column-height profile)
+        self.grid = CellGrid(canvas, len(engine.board[0]), len(engine.board), block_size)
+        self.dirty_rows = set(range(self.grid.rows)) # Board rows that must be re-read on the next draw
+        self.piece_cells = {} # (row, column) -> color of the falling (and ghost) piece as drawn last frame
+
+    def mark_rows(self, rows=None):
+        """
+        Marks board rows as changed.
+
+        Args:
+            rows: Iterable of row indices, or None to mark the whole board.
+        """
+        if rows is None:
+            rows = range(self.grid.rows)
+        self.dirty_rows.update(rows)
+
+    def draw(self):
+        """Brings the canvas up to date with the engine, touching only changed cells."""
+        engine = self.engine
+        grid = self.grid
+        board = engine.board
+
+        piece_cells = piece_overlay(engine, self.ghost) # Which cells the falling piece covers now
+
+        # Re-read dirty board rows, leaving cells under the piece to the piece
+        for r in self.dirty_rows:
+            row = board[r]
+            for c in range(grid.columns):
+                if (r, c) not in piece_cells:
+                    grid.paint(r, c, row[c])
+        self.dirty_rows.clear()
+
+        # Cells the piece has left show the board again; cells it entered show the piece
+        for (r, c) in self.piece_cells:
+            if (r, c) not in piece_cells:
+                grid.paint(r, c, board[r][c])
+        for (r, c), color in piece_cells.items():
+            grid.paint(r, c, color)
+        self.piece_cells = piece_cells
+
+
+class PhotoImageRenderer:
+    """
+    Draws the board into a single tk.PhotoImage instead of one canvas item per cell.
+
+    Meant for very large boards: the canvas holds one image item whatever the board
+    size, and a frame re-blits only the rows whose colors changed, each with one
+    `PhotoImage.put()` of a whole row of pixel data. Same interface as BoardRenderer.
+    """
+    def __init__(self, canvas, engine, block_size=BLOCK_SIZE, ghost=False, background=COLORS['B']):
+        """
+        Args:
+            canvas: The Tk canvas to draw on.
+            engine: The TetrisEngine to follow.
+            block_size: Size of each cell in pixels (1 or more).
+            ghost: Also draw the falling piece's landing position.
+            background: Color of empty cells.
+        """
+        import tkinter as tk # Only needed here; the other renderers work on any canvas-like object
+        self.engine = engine
+        self.ghost = ghost
+        self.block_size = block_size
+        self.background = background
+        self.columns, self.rows = engine.board.width, engine.board.height
+        self.image = tk.PhotoImage(width=self.columns * block_size, height=self.rows * block_size)
+        self.item = canvas.create_image(0, 0, anchor='nw', image=self.image)
+        self.shown = [None] * self.rows # Colors of every row as currently blitted (None = not yet drawn)
+        self.dirty_rows = set(range(self.rows))
+        self.piece_cells = {}
+        self.pixels = {} # Cache: cell color -> its `block_size` pixels of one pixel row
+        self.updates = 0 # Rows blitted so far
+
+    def mark_rows(self, rows=None):
+        """Marks board rows as changed (None = the whole board)."""
+        if rows is None:
+            rows = range(self.rows)
+        self.dirty_rows.update(rows)
+
+    def _cell_pixels(self, color):
+        """One pixel row of a cell: a black left edge for blocks (like the item outlines), plain background if empty."""
+        pixels = self.pixels.get(color)
+        if pixels is None:
+            size = self.block_size
+            if color == '':
+                pixels = ' '.join([self.background] * size)
+            elif size >= 4:
+                pixels = ' '.join(['#000000'] + [color] * (size - 1))
+            else:
+                pixels = ' '.join([color] * size)
+            self.pixels[color] = pixels
+        return pixels
+
+    def draw(self):
+        """Re-blits the rows whose colors changed since the last frame."""
+        engine = self.engine
+        board = engine.board
+        piece_cells = piece_overlay(engine, self.ghost)
+        rows = self.dirty_rows
+        rows.update(r for r, _ in self.piece_cells) # Rows the piece has left
+        rows.update(r for r, _ in piece_cells) # Rows it entered
+        size = self.block_size
+        for r in rows:
+            if not 0 <= r < self.rows:
+                continue
+            colors = list(board[r])
+            for (pr, c), color in piece_cells.items():
+                if pr == r:
+                    colors[c] = color
+            colors = tuple(colors)
+            if colors == self.shown[r]:
+                continue
+            self.shown[r] = colors
+            line = '{' + ' '.join(map(self._cell_pixels, colors)) + '}'
+            if size >= 4: # Black top edge for the blocks, background elsewhere
+                top = '{' + ' '.join(
+                    ' '.join([self.background if color == '' else '#000000'] * size) for color in colors) + '}'
+                data = ' '.join([top] + [line] * (size - 1))
+            else:
+                data = ' '.join([line] * size)
+            self.image.put(data, to=(0, r * size))
+            self.updates += 1
+        rows.clear()
+        self.piece_cells = piece_cells
+
+
+# Board renderers selectable by name, e.g. `python tetris_python.py --renderer photo`.
+BOARD_RENDERERS = {
+    'items': BoardRenderer, # One canvas rectangle per cell
+    'photo': PhotoImageRenderer, # One PhotoImage, re-blitted row by row
+}
+
+
+class PreviewRenderer:
+    """
+    Draws the upcoming piece with four persistent rectangles (one per block)
+    that are moved and recolored only when the previewed piece changes.
+    """
+    def __init__(self, canvas, block_size=BLOCK_SIZE, size=4):
+        """
+        Args:
+            canvas: The preview canvas, `size` blocks square.
+            block_size: Size of each block in pixels.
+            size: Side length of the preview area in blocks.
+        """
+        self.canvas = canvas
+        self.block_size = block_size
+        self.size = size
+        self.items = [
+            canvas.create_rectangle(0, 0, 0, 0, fill='', outline='black', width=2, state='hidden')
+            for _ in range(4) # Every Tetromino has exactly four blocks
+        ]
+        self.key = None # Piece currently shown
+
+    def draw(self, key):
+        """
+        Shows piece `key` centered in the preview, or hides it if `key` is None.
+        """
+        if key == self.key:
+            return
+        self.key = key
+        if key is None:
+            for item in self.items:
+                self.canvas.itemconfig(item, state='hidden')
+            return
+        dim = TETROMINOES[key]['dim']
+        color = TETROMINOES[key]['color']
+        # (size - dim) * block_size / 2 visually centers 2x2, 3x3 and 4x4 shapes alike
+        offset = (self.size - dim) * self.block_size / 2
+        for item, (r, c) in zip(self.items, ROTATIONS[key][0].cells):
+            x1 = c * self.block_size + offset
+            y1 = r * self.block_size + offset
+            self.canvas.coords(item, x1, y1, x1 + self.block_size, y1 + self.block_size)
+            self.canvas.itemconfig(item, fill=color, state='normal')
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary game replays and a headless replay verifier.
+
+A replay file holds the piece-generator seed followed by one record per input,
+so a game can be re-simulated exactly with TetrisEngine. Layout:
+
+    b'TTRP'  version(1 byte)  varint(seed)  varint(width)  varint(height)
+    varint((delta_ms << 3) | event)     one per input / gravity tick
+    varint((delta_ms << 3) | EVENT_END)  varint(final_score)
+
+Integers are unsigned LEB128 varints, so a typical record takes one or two bytes.
+`delta_ms` is the time since the previous record. Event codes 1-5 are the engine's
+ACTION_* codes; gravity ticks and pause toggles are recorded as well because they
+change what the inputs do. Version 1 files (without the board size) are still
+read and replayed on the standard board.
+
+Command line:
+    python tetris_replay.py verify FILE_OR_DIR... [--jobs N]
+    python tetris_replay.py dump FILE
+"""
+import argparse
+import os
+import sys
+import time
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT
+from tetris_engine import TetrisEngine, ACTION_LEFT, ACTION_HARD_DROP, ACTIONS
+
+MAGIC = b'TTRP'
+VERSION = 2 # Version 2 added the board size to the header
+REPLAY_SUFFIX = '.ttr'
+
+EVENT_TICK = 0 # Gravity tick from the game loop
+# 1..5 are ACTION_LEFT .. ACTION_HARD_DROP
+EVENT_PAUSE = 6 # Escape: pause / resume
+EVENT_END = 7 # End of the game; followed by the final score
+EVENT_NAMES = ('tick',) + ACTIONS[ACTION_LEFT:ACTION_HARD_DROP + 1] + ('pause', 'end')
+
+
+class ReplayError(ValueError):
+    """Raised for files that are not valid replays."""
+
+
+def write_varint(out, value):
+    """Appends `value` (a non-negative int) to the bytearray `out` as a LEB128 varint."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """
+    Decodes the varint starting at `data[pos]`.
+
+    Returns:
+        (value, new_pos)
+    """
+    value = shift = 0
+    try:
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+    except IndexError:
+        raise ReplayError("replay is truncated") from None
+
+
+class ReplayRecorder:
+    """
+    Records one game as a replay. Call `record()` for every input as it happens
+    and `finish()` when the game ends.
+    """
+    def __init__(self, seed, clock=time.monotonic, width=BOARD_WIDTH, height=BOARD_HEIGHT):
+        """
+        Args:
+            seed: The seed the game's TetrisEngine was reset with.
+            clock: Monotonic clock in seconds (injectable for tests).
+            width, height: Board size of the game.
+        """
+        self.seed = seed
+        self.clock = clock
+        self.data = bytearray(MAGIC)
+        self.data.append(VERSION)
+        write_varint(self.data, seed)
+        write_varint(self.data, width)
+        write_varint(self.data, height)
+        self.last_ms = int(clock() * 1000) # Timestamp of the previous record
+        self.finished = False
+
+    def record(self, event):
+        """Appends one event (EVENT_TICK, an ACTION_* code or EVENT_PAUSE)."""
+        now_ms = int(self.clock() * 1000)
+        write_varint(self.data, ((now_ms - self.last_ms) << 3) | event)
+        self.last_ms = now_ms
+
+    def finish(self, score):
+        """
+        Ends the recording with the final score.
+
+        Returns:
+            bytes: The complete replay.
+        """
+        if not self.finished:
+            self.record(EVENT_END)
+            write_varint(self.data, score)
+            self.finished = True
+        return bytes(self.data)
+
+    def save(self, directory, score):
+        """
+        Finishes the replay and writes it to `directory` under a timestamped name.
+
+        Returns:
+            str: The path written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.seed:016x}{REPLAY_SUFFIX}"
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(self.finish(score))
+        return path
+
+
+def parse_header(data):
+    """
+    Checks the magic and version.
+
+    Returns:
+        (seed, width, height, pos): The recorded seed and board size, and the offset of the first record.
+    """
+    if data[:4] != MAGIC:
+        raise ReplayError("not a replay file (bad magic)")
+    if len(data) < 5 or data[4] not in (1, VERSION):
+        raise ReplayError(f"unsupported replay version {data[4] if len(data) > 4 else None}")
+    seed, pos = read_varint(data, 5)
+    width, height = BOARD_WIDTH, BOARD_HEIGHT
+    if data[4] >= 2:
+        width, pos = read_varint(data, pos)
+        height, pos = read_varint(data, pos)
+        if width < 4 or height < 4:
+            raise ReplayError(f"invalid board size {width}x{height}")
+    return seed, width, height, pos
+
+
+def iter_events(data):
+    """
+    Yields (time_ms, event, argument) for every record in a replay, where time_ms
+    is measured from the start of the game and argument is the final score for
+    EVENT_END (None otherwise).
+    """
+    *_, pos = parse_header(data)
+    time_ms = 0
+    end = len(data)
+    while pos < end:
+        value, pos = read_varint(data, pos)
+        time_ms += value >> 3
+        event = value & 7
+        if event == EVENT_END:
+            score, pos = read_varint(data, pos)
+            yield time_ms, event, score
+            return
+        yield time_ms, event, None
+    raise ReplayError("replay has no end record")
+
+
+class ReplayResult:
+    """Outcome of re-simulating one replay."""
+    __slots__ = ('path', 'seed', 'claimed_score', 'score', 'game_over', 'events', 'duration_ms', 'error')
+
+    def __init__(self, path=None, seed=None, claimed_score=None, score=None, game_over=False,
+                 events=0, duration_ms=0, error=None):
+        self.path = path
+        self.seed = seed
+        self.claimed_score = claimed_score # Score written by the recorder
+        self.score = score # Score reached by the re-simulation
+        self.game_over = game_over
+        self.events = events
+        self.duration_ms = duration_ms
+        self.error = error # Message if the file could not be parsed
+
+    @property
+    def ok(self):
+        """True if the file parsed and the re-simulated score matches the recorded one."""
+        return self.error is None and self.score == self.claimed_score
+
+
+def simulate(data, backend='bitboard'):
+    """
+    Re-plays a replay on a fresh headless engine.
+    Inputs are ignored while paused and after game over, as in the Tk frontend.
+
+    Returns:
+        ReplayResult
+    """
+    seed, width, height, _ = parse_header(data)
+    engine = TetrisEngine(backend=backend, width=width, height=height)
+    engine.reset(seed)
+    act, step = engine.act, engine.step
+    paused = False
+    result = ReplayResult(seed=seed)
+    for time_ms, event, argument in iter_events(data):
+        result.events += 1
+        if event == EVENT_END:
+            result.claimed_score = argument
+            result.duration_ms = time_ms
+        elif event == EVENT_PAUSE:
+            paused = not paused
+        elif paused or engine.game_over:
+            continue
+        elif event == EVENT_TICK:
+            step()
+        else:
+            act(event)
+    result.score = engine.score
+    result.game_over = engine.game_over
+    return result
+
+
+def verify_file(path, backend='bitboard'):
+    """Reads and re-simulates one replay file; parse errors are reported in the result."""
+    try:
+        with open(path, 'rb') as f:
+            result = simulate(f.read(), backend)
+    except (OSError, ReplayError) as exc:
+        result = ReplayResult(error=str(exc))
+    result.path = path
+    return result
+
+
+def iter_replay_paths(paths):
+    """Yields replay files, expanding directories lazily (nothing is listed up front)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.endswith(REPLAY_SUFFIX):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def verify_paths(paths, jobs=1, backend='bitboard', chunksize=16):
+    """
+    Yields a ReplayResult for every replay under `paths`, in completion order.
+    With jobs > 1 the files are spread over worker processes.
+    """
+    paths = iter_replay_paths(paths)
+    if jobs <= 1:
+        for path in paths:
+            yield verify_file(path, backend)
+        return
+    import functools
+    import multiprocessing
+    with multiprocessing.Pool(jobs) as pool:
+        yield from pool.imap_unordered(functools.partial(verify_file, backend=backend), paths, chunksize)
+
+
+def _cmd_verify(args):
+    start = time.perf_counter()
+    games = failures = 0
+    for result in verify_paths(args.paths, jobs=args.jobs, backend=args.backend):
+        games += 1
+        if not result.ok:
+            failures += 1
+            reason = result.error or f"recorded score {result.claimed_score}, re-simulated {result.score}"
+            print(f"FAIL {result.path}: {reason}")
+        elif args.verbose:
+            print(f"ok   {result.path}: score {result.score}, {result.events} events")
+    elapsed = time.perf_counter() - start
+    rate = games / elapsed if elapsed else 0.0
+    print(f"{games} replays, {failures} failed, {elapsed:.2f}s ({rate:,.0f} games/s)")
+    return 1 if failures else 0
+
+
+def _cmd_dump(args):
+    with open(args.path, 'rb') as f:
+        data = f.read()
+    seed, width, height, _ = parse_header(data)
+    print(f"seed {seed}, board {width}x{height}")
+    for time_ms, event, argument in iter_events(data):
+        print(f"{time_ms:>9} ms  {EVENT_NAMES[event]}" + (f" {argument}" if argument is not None else ""))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and verify Tetris replay files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    verify = commands.add_parser('verify', help="re-simulate replays and check their final scores")
+    verify.add_argument('paths', nargs='+', help="replay files or directories (searched recursively)")
+    verify.add_argument('--jobs', '-j', type=int, default=1, help="worker processes (default 1)")
+    verify.add_argument('--backend', default='bitboard', help="board backend used for re-simulation")
+    verify.add_argument('--verbose', '-v', action='store_true', help="also list replays that verify")
+    verify.set_defaults(func=_cmd_verify)
+    dump = commands.add_parser('dump', help="print the events of one replay")
+    dump.add_argument('path')
+    dump.set_defaults(func=_cmd_dump)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
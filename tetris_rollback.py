@@ -0,0 +1,577 @@
+# -*- coding: utf-8 -*-
+"""
+Peer-to-peer versus play with input prediction and rollback.
+
+Both peers simulate the same two-player match frame by frame (one frame = one
+scheduler tick) from the same seed, so the only thing they exchange is input: one
+byte per player per frame (held left/right/down plus rotate/hard-drop presses).
+A peer never waits for the other one. When the remote input for a frame has not
+arrived yet, it is *predicted* (the keys held last are assumed still held) and the
+frame runs at once. Each side keeps a ring buffer of per-frame state snapshots
+(TetrisEngine.snapshot() plus the schedulers' and garbage state) and of inputs;
+when a late remote input turns out to differ from the prediction, the session
+restores the snapshot of that frame and re-simulates every frame since then with
+the corrected input. The rules are the engines' own (check_collision, clear_lines,
+the seeded 7-bag), so the result is the state the peer computes too.
+
+Peers that get more than `max_prediction` frames ahead of the last confirmed
+remote input wait for it instead (a stall), which bounds every rollback.
+
+    python tetris_rollback.py simulate --latency 0.08 --jitter 0.03 --loss 0.1
+    python tetris_rollback.py play --port 7000 --peer 192.168.1.20:7000 --player 0
+
+`simulate` runs two sessions against each other over a simulated lossy, delayed
+link and reports rollback depth, re-simulation cost and whether both sides
+ended in the same state; `play` opens a Tk window for one side of a real match
+over UDP (the other side runs `play --player 1`).
+"""
+import argparse
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+from collections import Counter
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT
+from tetris_engine import TetrisEngine, ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP
+from tetris_profile import Histogram
+from tetris_random import mix64
+from tetris_server import GARBAGE
+from tetris_timing import FixedStepScheduler, TICK_RATE
+
+# Per-frame input bits
+INPUT_LEFT = 1 # held
+INPUT_RIGHT = 2 # held
+INPUT_DOWN = 4 # held (soft drop)
+INPUT_ROTATE = 8 # pressed during the frame
+INPUT_HARD_DROP = 16 # pressed during the frame
+HELD_INPUTS = INPUT_LEFT | INPUT_RIGHT | INPUT_DOWN
+INPUT_BITS = ((INPUT_LEFT, ACTION_LEFT), (INPUT_RIGHT, ACTION_RIGHT), (INPUT_DOWN, ACTION_DOWN),
+              (INPUT_ROTATE, ACTION_ROTATE), (INPUT_HARD_DROP, ACTION_HARD_DROP))
+ACTION_BITS = {action: bit for bit, action in INPUT_BITS}
+
+PACKET = struct.Struct('<iiB') # first frame of the inputs, newest remote frame received (ack), input count
+
+
+class InputState:
+    """Collects key presses and releases between frames into one input byte per frame."""
+
+    def __init__(self):
+        self.held = 0
+        self.pressed = 0
+
+    def press(self, action):
+        bit = ACTION_BITS[action]
+        if bit & HELD_INPUTS:
+            self.held |= bit
+        self.pressed |= bit # A tap shorter than a frame still counts
+
+    def release(self, action):
+        self.held &= ~ACTION_BITS[action]
+
+    def frame_input(self):
+        """Returns this frame's input byte and starts the next frame."""
+        bits = self.held | self.pressed
+        self.pressed = 0
+        return bits
+
+
+class VersusState:
+    """
+    The deterministic simulation both peers run: two games, their schedulers and the
+    garbage between them.
+
+    Attributes:
+        engines, schedulers: One per player.
+        frame: Frames simulated.
+    """
+    def __init__(self, seed, width=BOARD_WIDTH, height=BOARD_HEIGHT, backend='bitboard', start_level=1):
+        self.seed = seed
+        self.width = width
+        self.engines = [TetrisEngine(seed=seed, backend=backend, width=width, height=height) for _ in range(2)]
+        # The schedulers are only ticked, never advanced, so their clocks are unused
+        self.schedulers = [FixedStepScheduler(engine, start_level=start_level) for engine in self.engines]
+        self.frame = 0
+        self.inputs = [0, 0] # Previous frame's input per player, to turn held bits into press/release
+        self.pending_garbage = [0, 0]
+        self.garbage_sent = [0, 0] # Garbage batches received so far, numbering the hole columns
+        self.locked = [False, False]
+        for player, engine in enumerate(self.engines):
+            engine.on('lines_cleared', lambda count, player=player: self._lines_cleared(player, count))
+            engine.on('piece_spawned', lambda player=player: self.locked.__setitem__(player, True))
+            engine.reset(seed) # Same seed: both players get the same pieces
+
+    def _lines_cleared(self, player, count):
+        attack = GARBAGE[min(count, 4)]
+        cancelled = min(attack, self.pending_garbage[player]) # Clearing lines first cancels incoming garbage
+        self.pending_garbage[player] -= cancelled
+        self.pending_garbage[1 - player] += attack - cancelled
+
+    def step(self, inputs):
+        """Simulates one frame with one input byte per player."""
+        self.locked[:] = (False, False)
+        for player, (bits, scheduler) in enumerate(zip(inputs, self.schedulers)):
+            if self.engines[player].game_over:
+                continue
+            previous = self.inputs[player]
+            for bit, action in INPUT_BITS: # Fixed order, so both peers apply the same sequence
+                if bits & bit and (not previous & bit or not bit & HELD_INPUTS):
+                    scheduler.press(action)
+                elif previous & bit and not bits & bit and bit & HELD_INPUTS:
+                    scheduler.release(action)
+            scheduler.tick()
+        self.inputs[:] = inputs
+        for player, engine in enumerate(self.engines):
+            if self.locked[player] and self.pending_garbage[player]: # Garbage rises once the piece locks
+                lines, self.pending_garbage[player] = self.pending_garbage[player], 0
+                value = mix64(self.seed ^ (player << 32) ^ self.garbage_sent[player])
+                self.garbage_sent[player] += 1
+                engine.add_garbage(lines, value % self.width)
+        self.frame += 1
+
+    @property
+    def over(self):
+        return any(engine.game_over for engine in self.engines)
+
+    def snapshot(self):
+        return (self.frame, tuple(self.inputs), tuple(self.pending_garbage), tuple(self.garbage_sent),
+                tuple(engine.snapshot() for engine in self.engines),
+                tuple(scheduler.snapshot() for scheduler in self.schedulers))
+
+    def restore(self, snapshot):
+        frame, inputs, pending, sent, engines, schedulers = snapshot
+        self.frame = frame
+        self.inputs[:] = inputs
+        self.pending_garbage[:] = pending
+        self.garbage_sent[:] = sent
+        for engine, state in zip(self.engines, engines):
+            engine.restore(state)
+        for scheduler, state in zip(self.schedulers, schedulers): # After the engines (see FixedStepScheduler.restore)
+            scheduler.restore(state)
+
+    def checksum(self):
+        """CRC32 of the complete state, for comparing peers."""
+        crc = zlib.crc32(repr((self.frame, self.inputs, self.pending_garbage, self.garbage_sent,
+                               [s.snapshot() for s in self.schedulers])).encode())
+        for engine in self.engines:
+            crc = zlib.crc32(engine.snapshot().to_bytes(), crc)
+        return crc
+
+
+class RollbackSession:
+    """
+    One peer of a rollback match.
+
+    Call `advance(input_byte)` once per frame (e.g. from InputState.frame_input()).
+
+    Attributes:
+        state: The VersusState, always at frame `state.frame` (the present).
+        local: This peer's player index (0 or 1).
+        remote_confirmed: Newest frame up to which every remote input has arrived (-1 = none).
+        rollbacks, frames_resimulated, stalls: Counters.
+        depths: Counter of rollback depth in frames.
+        resim_time: Histogram of the wall time of each rollback (restore + re-simulation).
+        over_budget: Rollbacks that took longer than one frame (1 / tick rate).
+    """
+    def __init__(self, local, seed, link, input_delay=2, max_prediction=8, history=32,
+                 tick_rate=TICK_RATE, **state_options):
+        """
+        Args:
+            local: This peer's player index (0 or 1).
+            seed: Match seed; both peers must use the same one.
+            link: Transport with send(bytes) and receive() -> list of bytes (SimulatedLink, UdpLink).
+            input_delay: Frames between reading a local input and applying it; hides that much latency
+                         without any rollback (both peers must use the same value).
+            max_prediction: The furthest the session runs ahead of confirmed remote input.
+            history: Frames of snapshots and inputs kept (must exceed max_prediction + input_delay).
+            state_options: Passed on to VersusState (width, height, backend, start_level).
+        """
+        if history <= max_prediction + input_delay:
+            raise ValueError("history must be longer than max_prediction + input_delay")
+        self.local = local
+        self.link = link
+        self.input_delay = input_delay
+        self.max_prediction = max_prediction
+        self.history = history
+        self.frame_budget = 1 / tick_rate
+        self.state = VersusState(seed, **state_options)
+        self.local_inputs = [0] * history # Ring buffers indexed by frame % history
+        self.remote_inputs = [0] * history
+        self.used_inputs = [0] * history # Remote input each frame was last simulated with
+        self.snapshots = [None] * history # State at the start of each frame
+        self.local_sent = input_delay - 1 # Newest local input frame so far (inputs before input_delay are 0)
+        self.remote_confirmed = input_delay - 1
+        self.remote_acked = input_delay - 1 # Newest local input frame the peer confirmed receiving
+        self.rollbacks = 0
+        self.frames_resimulated = 0
+        self.stalls = 0
+        self.depths = Counter()
+        self.resim_time = Histogram('resim_time')
+        self.over_budget = 0
+
+    @property
+    def frame(self):
+        return self.state.frame
+
+    def _remote_input(self, frame):
+        """The confirmed remote input for `frame`, or the prediction: last confirmed held keys."""
+        if frame <= self.remote_confirmed:
+            return self.remote_inputs[frame % self.history]
+        return self.remote_inputs[self.remote_confirmed % self.history] & HELD_INPUTS
+
+    def _simulate(self, frame):
+        """Saves the state of `frame`, then simulates it."""
+        slot = frame % self.history
+        self.snapshots[slot] = self.state.snapshot()
+        remote = self._remote_input(frame)
+        self.used_inputs[slot] = remote
+        inputs = [0, 0]
+        inputs[self.local] = self.local_inputs[slot]
+        inputs[1 - self.local] = remote
+        self.state.step(inputs)
+
+    def _send(self):
+        """Sends every local input the peer has not acknowledged yet (redundancy covers lost packets)."""
+        first = max(self.remote_acked + 1, self.local_sent - self.history + 1)
+        inputs = bytes(self.local_inputs[f % self.history] for f in range(first, self.local_sent + 1))
+        self.link.send(PACKET.pack(first, self.remote_confirmed, len(inputs)) + inputs)
+
+    def _receive(self):
+        """Applies arriving packets. Returns the earliest simulated frame whose remote input was mispredicted."""
+        mispredicted = None
+        for packet in self.link.receive():
+            first, ack, count = PACKET.unpack_from(packet)
+            self.remote_acked = max(self.remote_acked, ack)
+            for i in range(count):
+                frame = first + i
+                if frame != self.remote_confirmed + 1: # Already known, or a gap (an earlier packet was lost)
+                    continue
+                bits = packet[PACKET.size + i]
+                slot = frame % self.history
+                self.remote_inputs[slot] = bits
+                self.remote_confirmed = frame
+                if frame < self.frame and bits != self.used_inputs[slot] and mispredicted is None:
+                    mispredicted = frame
+        return mispredicted
+
+    def advance(self, local_input):
+        """
+        Runs one frame: queues `local_input` (applied `input_delay` frames from now), exchanges
+        inputs, rolls back and re-simulates if a prediction was wrong, and simulates the frame.
+
+        Returns:
+            bool: False if the frame stalled (too far ahead of the remote peer); call again with the next input.
+        """
+        if self.local_sent < self.frame + self.input_delay:
+            self.local_sent += 1
+            self.local_inputs[self.local_sent % self.history] = local_input
+        self.poll()
+        if self.frame - self.remote_confirmed > self.max_prediction:
+            self.stalls += 1
+            return False
+        self._simulate(self.frame)
+        return True
+
+    def poll(self):
+        """
+        Exchanges inputs without simulating a frame: sends the unacknowledged local inputs,
+        applies arriving remote ones and rolls back if a prediction turned out wrong.
+
+        Returns:
+            int: Frames re-simulated (0 if every prediction held).
+        """
+        self._send()
+        mispredicted = self._receive()
+        if mispredicted is None:
+            return 0
+        depth = self.frame - mispredicted
+        self._rollback(mispredicted)
+        return depth
+
+    def _rollback(self, frame):
+        """Restores the state of `frame` and re-simulates up to the present with the corrected inputs."""
+        start = time.perf_counter()
+        present = self.frame
+        self.state.restore(self.snapshots[frame % self.history])
+        for f in range(frame, present):
+            self._simulate(f)
+        elapsed = time.perf_counter() - start
+        depth = present - frame
+        self.rollbacks += 1
+        self.frames_resimulated += depth
+        self.depths[depth] += 1
+        self.resim_time.record(elapsed)
+        if elapsed > self.frame_budget:
+            self.over_budget += 1
+
+    def stats(self):
+        depths = sorted(self.depths.elements())
+        return {
+            'frames': self.frame,
+            'rollbacks': self.rollbacks,
+            'frames_resimulated': self.frames_resimulated,
+            'mean_depth': sum(depths) / len(depths) if depths else 0,
+            'max_depth': depths[-1] if depths else 0,
+            'stalls': self.stalls,
+            'resim_ms': self.resim_time.summary(),
+            'over_budget': self.over_budget,
+        }
+
+
+# --- Transports ---
+
+class SimulatedLink:
+    """
+    One end of a simulated network link: packets arrive after `latency` plus up to
+    `jitter` seconds (so they may be reordered), and each is lost with probability `loss`.
+    Create connected pairs with `simulated_pair()`.
+    """
+    def __init__(self, clock, latency, jitter, loss, rng):
+        self.clock = clock
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng
+        self.peer = None
+        self.inbox = [] # (arrival time, sequence, packet)
+        self.sequence = 0
+        self.sent = self.lost = 0
+
+    def send(self, packet):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.lost += 1
+            return
+        self.sequence += 1
+        arrival = self.clock() + self.latency + self.rng.uniform(0, self.jitter)
+        self.peer.inbox.append((arrival, self.sequence, packet))
+
+    def receive(self):
+        now = self.clock()
+        arrived = sorted(item for item in self.inbox if item[0] <= now)
+        if arrived:
+            self.inbox = [item for item in self.inbox if item[0] > now]
+        return [packet for _, _, packet in arrived]
+
+
+def simulated_pair(clock, latency=0.05, jitter=0.02, loss=0.05, seed=0):
+    """Returns two connected SimulatedLink ends sharing `clock`."""
+    rng = random.Random(seed)
+    a = SimulatedLink(clock, latency, jitter, loss, rng)
+    b = SimulatedLink(clock, latency, jitter, loss, rng)
+    a.peer, b.peer = b, a
+    return a, b
+
+
+class UdpLink:
+    """A non-blocking UDP socket talking to one peer address."""
+
+    def __init__(self, port, peer):
+        """
+        Args:
+            port: Local UDP port to bind.
+            peer: (host, port) of the other side.
+        """
+        self.peer = (socket.gethostbyname(peer[0]), peer[1])
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('', port))
+        self.socket.setblocking(False)
+
+    def send(self, packet):
+        try:
+            self.socket.sendto(packet, self.peer)
+        except OSError: # e.g. the peer is not up yet (ICMP unreachable): the next send retries everything
+            pass
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                packet, address = self.socket.recvfrom(2048)
+            except (BlockingIOError, OSError):
+                return packets
+            if address[0] == self.peer[0]: # Ignore strays from anyone else
+                packets.append(packet)
+
+    def close(self):
+        self.socket.close()
+
+
+# --- Simulation ---
+
+class RandomPlayer:
+    """Holds and taps keys at random, changing roughly `rate` times per second, like a busy human."""
+
+    def __init__(self, rng, rate=6, tick_rate=TICK_RATE):
+        self.rng = rng
+        self.chance = rate / tick_rate
+        self.keys = InputState()
+
+    def frame_input(self):
+        if self.rng.random() < self.chance:
+            action = self.rng.choice((ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP))
+            if ACTION_BITS[action] & self.keys.held:
+                self.keys.release(action)
+            else:
+                self.keys.press(action)
+                if action == ACTION_DOWN and self.rng.random() < 0.5:
+                    self.keys.release(action) # Mostly short soft drops
+        return self.keys.frame_input()
+
+
+def simulate(frames=3600, latency=0.05, jitter=0.02, loss=0.05, input_delay=2, max_prediction=8,
+             seed=0, tick_rate=TICK_RATE):
+    """
+    Plays two rollback sessions against each other for `frames` frames of virtual time
+    over a simulated link, with random players, then lets the link drain and checks
+    that both peers computed the same state.
+
+    Returns:
+        dict with per-peer stats(), link loss counts and 'in_sync'.
+    """
+    now = [0.0]
+    clock = lambda: now[0]
+    links = simulated_pair(clock, latency, jitter, loss, seed)
+    sessions = [RollbackSession(player, seed, links[player], input_delay, max_prediction, tick_rate=tick_rate)
+                for player in (0, 1)]
+    rng = random.Random(seed + 1)
+    players = [RandomPlayer(random.Random(rng.random()), tick_rate=tick_rate) for _ in sessions]
+    pending = [None, None] # An input that stalled is offered again next frame
+    for tick in range(frames):
+        now[0] = tick / tick_rate
+        for i, session in enumerate(sessions):
+            if session.state.over:
+                continue
+            if pending[i] is None:
+                pending[i] = players[i].frame_input()
+            if session.advance(pending[i]):
+                pending[i] = None
+        if all(session.state.over for session in sessions):
+            break
+
+    # Drain: keep exchanging (without new frames) until both sides confirmed each other's inputs,
+    # then bring both to the same frame and compare.
+    for session in sessions:
+        session.link.loss = 0
+    target = max(session.frame for session in sessions)
+    for _ in range(10 * tick_rate):
+        now[0] += 1 / tick_rate
+        for session in sessions:
+            if session.frame < target:
+                session.advance(0)
+            else:
+                session.poll()
+        if all(s.frame == target and s.remote_confirmed >= target - 1 for s in sessions):
+            break
+    in_sync = len({session.state.checksum() for session in sessions}) == 1
+    return {
+        'peers': [session.stats() for session in sessions],
+        'packets_sent': [link.sent for link in links],
+        'packets_lost': [link.lost for link in links],
+        'in_sync': in_sync,
+        'frame': target,
+    }
+
+
+# --- Tk frontend ---
+
+def play(root, session, block_size=24):
+    """
+    Shows both boards of `session` in a Tk window and drives it from the keyboard (arrows, space).
+    """
+    import tkinter as tk
+    from tetris_config import COLORS
+    from tetris_python import KEY_ACTIONS
+    from tetris_render import BoardRenderer
+
+    root.title(f"Tetris versus - player {session.local}")
+    keys = InputState()
+    renderers = []
+    for player, engine in enumerate(session.state.engines):
+        canvas = tk.Canvas(root, width=engine.width * block_size, height=engine.height * block_size,
+                           bg=COLORS['B'], highlightthickness=0)
+        canvas.pack(side=tk.LEFT if player == session.local else tk.RIGHT, padx=10, pady=10)
+        renderer = BoardRenderer(canvas, engine, block_size, ghost=player == session.local)
+        engine.on('board_changed', renderer.mark_rows)
+        renderers.append(renderer)
+    status = tk.Label(root, font=("Inter", 12), fg='white', bg='#34495E')
+    status.pack(side=tk.BOTTOM, fill=tk.X)
+    for key, action in KEY_ACTIONS.items():
+        root.bind(f'<KeyPress-{key}>', lambda event, action=action: keys.press(action))
+        root.bind(f'<KeyRelease-{key}>', lambda event, action=action: keys.release(action))
+
+    dt = 1 / TICK_RATE
+    due = [time.monotonic()]
+    pending = [None]
+
+    def frame():
+        now = time.monotonic()
+        while due[0] <= now and not session.state.over:
+            if pending[0] is None:
+                pending[0] = keys.frame_input()
+            if not session.advance(pending[0]):
+                break # Waiting for the peer: try again next frame
+            pending[0] = None
+            due[0] += dt
+        due[0] = max(due[0], now - 0.25) # Do not fast-forward through a long stall
+        for renderer in renderers:
+            renderer.draw()
+        scores = [engine.score for engine in session.state.engines]
+        text = (f"you {scores[session.local]} - {scores[1 - session.local]} them   "
+                f"rollbacks {session.rollbacks} (max {max(session.depths, default=0)} frames)")
+        if session.state.over:
+            lost = session.state.engines[session.local].game_over
+            status.config(text=f"{'You lose' if lost else 'You win'} - {text}")
+            return
+        status.config(text=text)
+        root.after(max(1, int((due[0] - time.monotonic()) * 1000)), frame)
+
+    frame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rollback versus play.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sim = commands.add_parser('simulate', help="two peers over a simulated lossy, delayed link")
+    sim.add_argument('--frames', type=int, default=3600, help="frames to play (60 per second)")
+    sim.add_argument('--latency', type=float, default=0.05, help="one-way latency in seconds")
+    sim.add_argument('--jitter', type=float, default=0.02, help="extra random delay in seconds (reorders packets)")
+    sim.add_argument('--loss', type=float, default=0.05, help="fraction of packets lost")
+    sim.add_argument('--delay', type=int, default=2, help="input delay in frames")
+    sim.add_argument('--max-prediction', type=int, default=8, help="frames a peer may run ahead")
+    sim.add_argument('--seed', type=int, default=0)
+    live = commands.add_parser('play', help="one side of a match over UDP")
+    live.add_argument('--port', type=int, default=7000, help="local UDP port")
+    live.add_argument('--peer', required=True, metavar='HOST:PORT', help="the other player's address")
+    live.add_argument('--player', type=int, choices=(0, 1), required=True, help="0 on one side, 1 on the other")
+    live.add_argument('--seed', type=int, default=0, help="match seed (both sides must agree)")
+    live.add_argument('--delay', type=int, default=2, help="input delay in frames (both sides must agree)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'play':
+        import tkinter as tk
+        host, port = args.peer.rsplit(':', 1)
+        link = UdpLink(args.port, (host, int(port)))
+        root = tk.Tk()
+        play(root, RollbackSession(args.player, args.seed, link, input_delay=args.delay))
+        root.mainloop()
+        link.close()
+        return 0
+
+    result = simulate(args.frames, args.latency, args.jitter, args.loss, args.delay, args.max_prediction, args.seed)
+    print(f"{result['frame']} frames, {args.latency * 1000:.0f} ms latency + {args.jitter * 1000:.0f} ms jitter, "
+          f"{args.loss:.0%} loss (lost {result['packets_lost']} of {result['packets_sent']} packets)")
+    for player, stats in enumerate(result['peers']):
+        resim = stats['resim_ms']
+        print(f"peer {player}: {stats['rollbacks']} rollbacks, depth mean {stats['mean_depth']:.1f} "
+              f"max {stats['max_depth']} frames, {stats['frames_resimulated']} frames re-simulated, "
+              f"{stats['stalls']} stalls; rollback cost p50 {resim['p50_ms']} ms p99 {resim['p99_ms']} ms "
+              f"max {resim['max_ms']} ms, {stats['over_budget']} over one frame")
+    print("peers in sync" if result['in_sync'] else "DESYNC: peers computed different states")
+    return 0 if result['in_sync'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
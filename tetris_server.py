@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio multiplayer server: hosts many headless versus matches in one event loop.
+
+Players connect over TCP and are paired into two-player matches as they join. Every
+player's game is a TetrisEngine driven by its own FixedStepScheduler (DAS/ARR,
+gravity, lock delay), but no game owns a timer: a single tick loop runs at
+TICK_RATE and, once per tick, applies the inputs that arrived since the last
+tick and advances every game of every match in one batch. Clearing lines sends
+garbage to the opponent (after cancelling the sender's own pending garbage);
+pending garbage rises when the receiver's next piece locks.
+
+After each tick the server sends one frame per match, written once and shared by
+both players, holding only what changed: the board rows that were touched
+(row index + one byte per cell, the cell codes of tetris_snapshot), the falling
+piece, the preview queue, score/lines/level/pending garbage, and the result when
+the match ends. Ticks with no changes send nothing.
+
+Wire format, both directions: messages of [type u8][payload length u16][payload].
+Messages of unknown type or with a malformed payload are ignored. The board size
+is limited so that a full-board ROWS update fits one message (checked on startup).
+
+    client -> server   JOIN name | PRESS action | RELEASE action   (ACTION_* codes)
+    server -> client   WELCOME slot, match, width, height, seed
+                       TICK tick, then per player: ROWS, PIECE, QUEUE, STATS; RESULT winner
+
+    python tetris_server.py --port 7777
+    python -m benchmarks.bench_server --games 200 --seconds 20   # load test over loopback
+"""
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT
+from tetris_engine import TetrisEngine, ACTIONS
+from tetris_profile import Histogram
+from tetris_random import PIECE_KEYS
+from tetris_snapshot import encode_row
+from tetris_timing import FixedStepScheduler, TICK_RATE
+
+# Message types
+MSG_JOIN = 1
+MSG_PRESS = 2
+MSG_RELEASE = 3
+MSG_WELCOME = 16
+MSG_TICK = 17
+MSG_ROWS = 18
+MSG_PIECE = 19
+MSG_QUEUE = 20
+MSG_STATS = 21
+MSG_RESULT = 22
+
+HEADER = struct.Struct('<BH') # Message type, payload length
+WELCOME = struct.Struct('<BIHHQ') # slot, match id, width, height, seed
+TICK = struct.Struct('<I') # server tick number
+PIECE = struct.Struct('<Bbbhh') # slot, piece index (-1 = none), rotation, x, y
+STATS = struct.Struct('<BIHBB') # slot, score, lines, level, pending garbage lines
+ROW = struct.Struct('<H') # row index, followed by `width` cell codes
+FIXED_SIZES = {MSG_WELCOME: WELCOME.size, MSG_TICK: TICK.size, MSG_PIECE: PIECE.size, MSG_STATS: STATS.size}
+
+GARBAGE = (0, 0, 1, 2, 4) # Garbage lines sent for clearing 0, 1, 2, 3 and 4 lines
+NO_WINNER = 255 # RESULT winner slot of a draw
+PREVIEW = 5 # Queued pieces sent to clients
+MAX_BACKLOG = 256 * 1024 # Disconnect clients whose unsent data grows beyond this (bytes)
+
+
+MAX_PAYLOAD = 0xFFFF # The length field is a u16
+
+
+def pack_message(kind, payload=b''):
+    """Returns one framed message."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"message payload of {len(payload)} bytes exceeds the {MAX_PAYLOAD}-byte limit")
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def rows_payload_size(width, height):
+    """The largest ROWS payload of a width x height game: slot byte plus every row with its index."""
+    return 1 + height * (ROW.size + width)
+
+
+async def read_message(reader):
+    """Reads one framed message; returns (type, payload), or None at end of stream."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+        kind, length = HEADER.unpack(header)
+        return kind, await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class Player:
+    """One connection and, while it is in a match, its game."""
+
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+        self.match = None
+        self.slot = 0
+        self.engine = None
+        self.scheduler = None
+        self.inputs = [] # (message type, action) received since the last tick
+        self.connected = True
+
+    def start(self, match, slot, seed, options):
+        """Creates the player's game for `match`, subscribing to the events that drive the deltas."""
+        self.match = match
+        self.slot = slot
+        self.inputs.clear()
+        self.engine = engine = TetrisEngine(seed=seed, backend=options['backend'],
+                                            width=options['width'], height=options['height'])
+        self.scheduler = FixedStepScheduler(engine, start_level=options['start_level'])
+        self.pending_garbage = 0 # Garbage lines waiting to rise
+        self.locked = False # A piece locked during this tick (pending garbage rises then)
+        self.dirty_rows = None # Rows changed since the last frame; None = all
+        self.sent_piece = None # Falling piece state in the last frame
+        self.sent_stats = None
+        self.queue_changed = True
+        engine.on('board_changed', self._board_changed)
+        engine.on('piece_spawned', self._piece_spawned)
+        engine.on('lines_cleared', self._lines_cleared)
+        engine.reset()
+
+    def _board_changed(self, rows):
+        if rows is None or self.dirty_rows is None:
+            self.dirty_rows = None
+        else:
+            self.dirty_rows.update(rows)
+
+    def _piece_spawned(self):
+        self.locked = True
+        self.queue_changed = True
+
+    def _lines_cleared(self, count):
+        attack = GARBAGE[min(count, 4)]
+        cancelled = min(attack, self.pending_garbage) # Clearing lines first cancels incoming garbage
+        self.pending_garbage -= cancelled
+        opponent = self.match.opponent(self)
+        if opponent is not None and attack > cancelled:
+            opponent.pending_garbage += attack - cancelled
+
+    def updates(self):
+        """Returns the messages describing what changed in this player's game since the last call."""
+        engine, slot = self.engine, self.slot
+        parts = []
+        rows = range(engine.height) if self.dirty_rows is None else sorted(self.dirty_rows)
+        if rows:
+            payload = [bytes((slot,))]
+            for r in rows:
+                payload.append(ROW.pack(r))
+                payload.append(encode_row(engine.board[r]))
+            parts.append(pack_message(MSG_ROWS, b''.join(payload)))
+        self.dirty_rows = set()
+
+        piece = None if engine.game_over else engine.state_key
+        if piece != self.sent_piece:
+            self.sent_piece = piece
+            if piece is None:
+                parts.append(pack_message(MSG_PIECE, PIECE.pack(slot, -1, 0, 0, 0)))
+            else:
+                key, rotation, x, y = piece
+                parts.append(pack_message(MSG_PIECE, PIECE.pack(slot, PIECE_KEYS.index(key), rotation, x, y)))
+        if self.queue_changed:
+            self.queue_changed = False
+            queue = bytes(PIECE_KEYS.index(key) for key in engine.preview(PREVIEW))
+            parts.append(pack_message(MSG_QUEUE, bytes((slot,)) + queue))
+        stats = (engine.score, self.scheduler.lines, self.scheduler.level, self.pending_garbage)
+        if stats != self.sent_stats:
+            self.sent_stats = stats
+            score, lines, level, pending = stats
+            parts.append(pack_message(MSG_STATS, STATS.pack(slot, score, min(lines, 0xFFFF),
+                                                            min(level, 255), min(pending, 255))))
+        return parts
+
+
+class Match:
+    """Two players' games, ticked together."""
+
+    def __init__(self, match_id, players, seed, options):
+        self.id = match_id
+        self.players = players
+        self.seed = seed
+        self.holes = random.Random(seed) # Garbage hole columns
+        self.width = options['width']
+        self.over = False
+        for slot, player in enumerate(players):
+            player.start(self, slot, seed, options) # Same seed: both players get the same pieces
+
+    def opponent(self, player):
+        for other in self.players:
+            if other is not player:
+                return other
+        return None
+
+    def tick(self, tick):
+        """
+        Runs one tick of both games and returns the frame to send, or None if nothing changed.
+        """
+        for player in self.players:
+            scheduler = player.scheduler
+            player.locked = False
+            for kind, action in player.inputs:
+                if kind == MSG_PRESS:
+                    scheduler.press(action)
+                else:
+                    scheduler.release(action)
+            player.inputs.clear()
+            if not player.engine.game_over:
+                scheduler.tick()
+        for player in self.players:
+            if player.locked and player.pending_garbage: # Garbage rises once the receiver's piece has locked
+                lines, player.pending_garbage = player.pending_garbage, 0
+                player.engine.add_garbage(lines, self.holes.randrange(self.width))
+
+        parts = []
+        for player in self.players:
+            parts.extend(player.updates())
+        winner = self._winner()
+        if winner is not None:
+            self.over = True
+            parts.append(pack_message(MSG_RESULT, bytes((winner,))))
+        if not parts:
+            return None
+        return pack_message(MSG_TICK, TICK.pack(tick)) + b''.join(parts)
+
+    def _winner(self):
+        """The winning slot once the match is decided (NO_WINNER for a draw), else None."""
+        alive = [p for p in self.players if p.connected and not p.engine.game_over]
+        if len(alive) == len(self.players):
+            return None
+        return alive[0].slot if len(alive) == 1 else NO_WINNER
+
+
+class TetrisServer:
+    """
+    Accepts connections, pairs players into matches and ticks every match from one loop.
+
+    Attributes:
+        matches: dict match id -> running Match.
+        tick_time: Histogram of the time one batched tick takes (all matches).
+        tick_lateness: Histogram of how late each tick started compared to its schedule.
+        ticks, dropped_ticks: Ticks run, and ticks skipped after falling too far behind.
+        matches_finished: Matches that ended.
+    """
+    def __init__(self, tick_rate=TICK_RATE, backend='bitboard', width=BOARD_WIDTH, height=BOARD_HEIGHT,
+                 start_level=1, seed=None, max_catchup=0.25):
+        """
+        Args:
+            tick_rate: Ticks per second for every game.
+            backend, width, height: Board backend and size of every game.
+            start_level: Level every game starts at.
+            seed: Seed for the match seeds (random if None).
+            max_catchup: The most time (seconds) the tick loop catches up on after a stall.
+        """
+        if rows_payload_size(width, height) > MAX_PAYLOAD: # A full-board update must fit one message
+            raise ValueError(f"a {width}x{height} board does not fit one ROWS message "
+                             f"({rows_payload_size(width, height)} > {MAX_PAYLOAD} bytes)")
+        self.tick_rate = tick_rate
+        self.dt = 1 / tick_rate
+        self.options = {'backend': backend, 'width': width, 'height': height, 'start_level': start_level}
+        self.rng = random.Random(seed)
+        self.max_catchup = max_catchup
+        self.lobby = [] # Players waiting for an opponent
+        self.matches = {}
+        self.next_match_id = 1
+        self.tick_time = Histogram('tick_time')
+        self.tick_lateness = Histogram('tick_lateness')
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.busy = 0.0 # Seconds spent running ticks
+        self.matches_finished = 0
+        self._server = None
+        self._tick_task = None
+        self._connections = {} # Handler task -> its writer
+
+    async def start(self, host='127.0.0.1', port=7777):
+        """Starts listening and ticking; returns the asyncio Server (port 0 picks a free port)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._tick_task = asyncio.get_running_loop().create_task(self._tick_loop())
+        return self._server
+
+    async def stop(self):
+        """Stops ticking, closes every connection and waits for their handlers to finish."""
+        self._tick_task.cancel()
+        self._server.close()
+        for writer in self._connections.values():
+            writer.close() # The handler then reads end-of-stream and returns
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    # --- Connections ---
+
+    async def _handle(self, reader, writer):
+        player = None
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                kind, payload = message
+                if kind == MSG_JOIN:
+                    if player is None:
+                        player = Player(writer, payload.decode('utf-8', 'replace'))
+                    if player.match is None and player not in self.lobby:
+                        self._join(player)
+                elif kind in (MSG_PRESS, MSG_RELEASE) and player is not None and player.match is not None:
+                    if len(payload) == 1 and payload[0] < len(ACTIONS): # Malformed inputs are ignored like unknown kinds
+                        player.inputs.append((kind, payload[0])) # Applied in the next batched tick
+        finally:
+            if player is not None:
+                player.connected = False # Its match ends on the next tick, the opponent wins
+                if player in self.lobby:
+                    self.lobby.remove(player)
+            writer.close()
+            del self._connections[task]
+
+    def _join(self, player):
+        self.lobby.append(player)
+        if len(self.lobby) < 2:
+            return
+        players, self.lobby = self.lobby[:2], self.lobby[2:]
+        match = Match(self.next_match_id, players, self.rng.getrandbits(64), self.options)
+        self.next_match_id += 1
+        self.matches[match.id] = match
+        for player in players:
+            player.writer.write(pack_message(MSG_WELCOME, WELCOME.pack(
+                player.slot, match.id, self.options['width'], self.options['height'], match.seed)))
+
+    # --- The tick loop ---
+
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        clock = loop.time
+        due = clock() + self.dt
+        while True:
+            delay = due - clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = clock()
+            if now - due > self.max_catchup: # Stalled: skip the backlog rather than fast-forward through it
+                skipped = int((now - due - self.max_catchup) / self.dt) + 1
+                self.dropped_ticks += skipped
+                due += skipped * self.dt
+            while due <= now:
+                self.tick_lateness.record(now - due)
+                self.tick()
+                due += self.dt
+                now = clock()
+
+    def tick(self):
+        """Runs one tick of every match and sends the frames."""
+        start = time.perf_counter()
+        self.ticks += 1
+        finished = []
+        for match in self.matches.values():
+            frame = match.tick(self.ticks)
+            if frame is not None:
+                for player in match.players:
+                    if player.connected:
+                        self._send(player, frame)
+            if match.over:
+                finished.append(match)
+        for match in finished:
+            del self.matches[match.id]
+            self.matches_finished += 1
+            for player in match.players:
+                player.match = None # Free to JOIN again
+        elapsed = time.perf_counter() - start
+        self.busy += elapsed
+        self.tick_time.record(elapsed)
+
+    def _send(self, player, frame):
+        writer = player.writer
+        if writer.transport.get_write_buffer_size() > MAX_BACKLOG: # Not reading: drop rather than buffer forever
+            player.connected = False
+            writer.close()
+            return
+        writer.write(frame)
+
+    def stats(self):
+        """Tick statistics as a dict (times in milliseconds)."""
+        return {
+            'ticks': self.ticks,
+            'dropped_ticks': self.dropped_ticks,
+            'matches': len(self.matches),
+            'matches_finished': self.matches_finished,
+            'busy_seconds': self.busy,
+            'tick_time': self.tick_time.summary(),
+            'tick_lateness': self.tick_lateness.summary(),
+        }
+
+
+class TetrisClient:
+    """
+    Minimal client: joins a match, sends inputs and mirrors both boards from the server's deltas.
+
+    Attributes:
+        slot: This player's slot in the current match (None before WELCOME).
+        boards: Per slot, a list of `height` bytearrays of cell codes.
+        pieces, queues, stats: Per slot, the latest PIECE/QUEUE/STATS values.
+        result: Winner slot of the last match (NO_WINNER for a draw), or None while playing.
+        tick: Server tick of the latest frame.
+        bytes_received: Total payload received.
+    """
+    def __init__(self, name='player'):
+        self.name = name
+        self.reader = self.writer = None
+        self.slot = None
+        self.match_id = None
+        self.boards = {}
+        self.pieces = {}
+        self.queues = {}
+        self.stats = {}
+        self.result = None
+        self.tick = 0
+        self.bytes_received = 0
+        self.width = self.height = 0
+
+    async def connect(self, host='127.0.0.1', port=7777):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    def join(self):
+        self.result = None
+        self.writer.write(pack_message(MSG_JOIN, self.name.encode('utf-8')))
+
+    def press(self, action):
+        self.writer.write(pack_message(MSG_PRESS, bytes((action,))))
+
+    def release(self, action):
+        self.writer.write(pack_message(MSG_RELEASE, bytes((action,))))
+
+    def close(self):
+        self.writer.close()
+
+    async def receive(self):
+        """Reads and applies one message; returns its type, or None when the server closed the connection."""
+        message = await read_message(self.reader)
+        if message is None:
+            return None
+        kind, payload = message
+        self.bytes_received += HEADER.size + len(payload)
+        # Malformed messages are ignored like unknown kinds
+        size = FIXED_SIZES.get(kind)
+        if size is not None and len(payload) != size:
+            return kind
+        if kind in (MSG_ROWS, MSG_QUEUE, MSG_RESULT) and not payload:
+            return kind
+        if kind in (MSG_ROWS, MSG_QUEUE) and payload[0] not in self.boards: # Unknown slot (or no WELCOME yet)
+            return kind
+        if kind == MSG_WELCOME:
+            self.slot, self.match_id, self.width, self.height, _ = WELCOME.unpack(payload)
+            self.boards = {slot: [bytearray(self.width) for _ in range(self.height)] for slot in (0, 1)}
+            self.result = None
+        elif kind == MSG_TICK:
+            self.tick, = TICK.unpack(payload)
+        elif kind == MSG_ROWS:
+            board = self.boards[payload[0]]
+            step = ROW.size + self.width
+            for offset in range(1, len(payload) - step + 1, step): # A truncated last row is dropped
+                r, = ROW.unpack_from(payload, offset)
+                if r < self.height:
+                    board[r][:] = payload[offset + ROW.size:offset + step]
+        elif kind == MSG_PIECE:
+            slot, piece, rotation, x, y = PIECE.unpack(payload)
+            self.pieces[slot] = None if piece < 0 else (PIECE_KEYS[piece], rotation, x, y)
+        elif kind == MSG_QUEUE:
+            self.queues[payload[0]] = [PIECE_KEYS[i] for i in payload[1:] if i < len(PIECE_KEYS)]
+        elif kind == MSG_STATS:
+            slot, score, lines, level, pending = STATS.unpack(payload)
+            self.stats[slot] = {'score': score, 'lines': lines, 'level': level, 'pending_garbage': pending}
+        elif kind == MSG_RESULT:
+            self.result = payload[0]
+        return kind
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host versus matches for networked clients.")
+    parser.add_argument('--host', default='0.0.0.0', help="interface to listen on")
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--backend', default='bitboard', help="board backend")
+    parser.add_argument('--level', type=int, default=1, help="start level")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = TetrisServer(backend=args.backend, start_level=args.level)
+        listener = await server.start(args.host, args.port)
+        print(f"listening on {', '.join(str(s.getsockname()) for s in listener.sockets)}")
+        while True:
+            await asyncio.sleep(10)
+            stats = server.stats()
+            print(f"{stats['matches']} matches, {stats['matches_finished']} finished, tick p99 "
+                  f"{stats['tick_time']['p99_ms']} ms, lateness p99 {stats['tick_lateness']['p99_ms']} ms")
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
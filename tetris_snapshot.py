@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Immutable game-state snapshots for search, undo and rollback.
+
+A GameSnapshot holds everything TetrisEngine needs to continue a game: the board
+as a tuple of rows, the falling piece and its position, the score, the game-over
+flag and the 7-bag generator state. Every row is a `bytes` object with one cell
+code per column (see CELL_COLORS), and rows are shared, not copied: consecutive
+snapshots of an engine reference the same objects for every row that did not
+change in between, so a snapshot costs a tuple of row pointers plus the rows
+that actually changed.
+
+    snapshot = engine.snapshot()
+    ...                          # play on
+    engine.restore(snapshot)     # rewrites only the rows that differ
+
+Snapshots of the same board size serialize to blobs of one fixed size
+(`snapshot_size(width, height)`), which makes them hashable and comparable as
+plain bytes, easy to deduplicate, and storable by index in a memory-mapped file
+(`SnapshotStore`).
+"""
+import mmap
+import os
+import struct
+
+from tetris_config import BOARD_WIDTH, BOARD_HEIGHT, TETROMINOES, COLORS
+from tetris_random import PIECE_KEYS
+
+# Cell codes: 0 = empty, 1 + piece index for a block of that piece's color,
+# then the grey of settled/garbage blocks. Boards holding other colors cannot be snapshotted.
+CELL_COLORS = ('',) + tuple(TETROMINOES[key]['color'] for key in PIECE_KEYS) + (COLORS['G'],)
+CELL_CODES = {color: code for code, color in enumerate(CELL_COLORS)}
+PIECE_INDEX = {key: i for i, key in enumerate(PIECE_KEYS)}
+
+MAX_QUEUE = 21 # Queued pieces a blob has room for (three bags)
+NO_PIECE = 255 # Piece index stored when there is no falling piece
+_MASK64 = (1 << 64) - 1
+
+# width, height, piece index, rotation, x, y, game over, score, bag seed, bag state, queue length
+_HEADER = struct.Struct('<HHBBhhBqQQB')
+
+
+def encode_row(colors):
+    """Returns a board row (a sequence of color strings) as bytes of cell codes."""
+    try:
+        return bytes(map(CELL_CODES.__getitem__, colors))
+    except KeyError as exc:
+        raise ValueError(f"Cannot snapshot a cell of color {exc.args[0]!r}") from None
+
+
+def decode_row(codes):
+    """Returns the color strings of an encoded row."""
+    return [CELL_COLORS[code] for code in codes]
+
+
+def snapshot_size(width=BOARD_WIDTH, height=BOARD_HEIGHT):
+    """Size in bytes of a serialized snapshot of a width x height game."""
+    return _HEADER.size + MAX_QUEUE + width * height
+
+
+class GameSnapshot:
+    """
+    The complete state of one game at one moment; immutable and hashable.
+
+    Attributes:
+        width, height: Board size.
+        rows: Tuple of `height` encoded rows (bytes of cell codes), top row first.
+        piece: (key, rotation) of the falling piece, or None.
+        x, y: Position of the falling piece.
+        score: The score.
+        game_over: The game-over flag.
+        bag: tetris_random.SevenBag.snapshot() of the piece generator.
+    """
+    __slots__ = ('width', 'height', 'rows', 'piece', 'x', 'y', 'score', 'game_over', 'bag', '_blob')
+
+    def __init__(self, width, height, rows, piece, x, y, score, game_over, bag):
+        set_slot = object.__setattr__
+        for name, value in (('width', width), ('height', height), ('rows', tuple(rows)), ('piece', piece),
+                            ('x', x), ('y', y), ('score', score), ('game_over', game_over), ('bag', bag),
+                            ('_blob', None)):
+            set_slot(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameSnapshot is immutable")
+
+    __delattr__ = __setattr__
+
+    def __repr__(self):
+        return (f"GameSnapshot({self.width}x{self.height}, piece={self.piece}, x={self.x}, y={self.y}, "
+                f"score={self.score}, game_over={self.game_over})")
+
+    # --- Serialization ---
+
+    def to_bytes(self):
+        """
+        Returns the snapshot as a blob of exactly `snapshot_size(width, height)` bytes.
+        The bag seed is stored modulo 2**64, which is all of it that affects the pieces.
+        """
+        if self._blob is None:
+            seed, state, queued = self.bag
+            if len(queued) > MAX_QUEUE:
+                raise ValueError(f"Cannot serialize more than {MAX_QUEUE} queued pieces, got {len(queued)}")
+            key, rotation = self.piece if self.piece is not None else (None, 0)
+            header = _HEADER.pack(self.width, self.height, NO_PIECE if key is None else PIECE_INDEX[key], rotation,
+                                  self.x, self.y, self.game_over, self.score, seed & _MASK64, state, len(queued))
+            queue = bytes(PIECE_INDEX[k] for k in queued).ljust(MAX_QUEUE, b'\0')
+            object.__setattr__(self, '_blob', b''.join((header, queue) + self.rows))
+        return self._blob
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuilds a snapshot from `to_bytes()` output (any bytes-like object)."""
+        data = bytes(data)
+        (width, height, piece, rotation, x, y, game_over, score,
+         seed, state, queued) = _HEADER.unpack_from(data)
+        if len(data) != snapshot_size(width, height):
+            raise ValueError(f"Snapshot blob of {len(data)} bytes does not match a {width}x{height} board")
+        start = _HEADER.size + MAX_QUEUE
+        queue = ''.join(PIECE_KEYS[i] for i in data[_HEADER.size:_HEADER.size + queued])
+        shared = {} # Equal rows (e.g. all the empty ones) become one object
+        rows = [data[start + r * width:start + (r + 1) * width] for r in range(height)]
+        rows = [shared.setdefault(row, row) for row in rows]
+        return cls(width, height, rows, None if piece == NO_PIECE else (PIECE_KEYS[piece], rotation),
+                   x, y, score, bool(game_over), (seed, state, queue))
+
+    def __eq__(self, other):
+        if not isinstance(other, GameSnapshot):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+
+class SnapshotStore:
+    """
+    A file of fixed-size snapshot slots, memory-mapped so that large search trees
+    can live on disk and be read back by index.
+
+        store = SnapshotStore('tree.bin', capacity=1_000_000)
+        store[i] = engine.snapshot()
+        snapshot = store[i]
+    """
+    def __init__(self, path, capacity, width=BOARD_WIDTH, height=BOARD_HEIGHT):
+        """
+        Opens (creating or growing it if needed) a store of `capacity` slots.
+        Slots that were never written read back as None.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.width = width
+        self.height = height
+        self.slot_size = snapshot_size(width, height)
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        if os.fstat(self._file.fileno()).st_size < capacity * self.slot_size:
+            self._file.truncate(capacity * self.slot_size)
+        self._map = mmap.mmap(self._file.fileno(), capacity * self.slot_size)
+
+    def __len__(self):
+        return self.capacity
+
+    def _offset(self, index):
+        if not 0 <= index < self.capacity:
+            raise IndexError(f"snapshot slot {index} out of range (capacity {self.capacity})")
+        return index * self.slot_size
+
+    def __setitem__(self, index, snapshot):
+        if (snapshot.width, snapshot.height) != (self.width, self.height):
+            raise ValueError(f"Store holds {self.width}x{self.height} snapshots, "
+                             f"got {snapshot.width}x{snapshot.height}")
+        offset = self._offset(index)
+        self._map[offset:offset + self.slot_size] = snapshot.to_bytes()
+
+    def __getitem__(self, index):
+        offset = self._offset(index)
+        if self._map[offset:offset + 4] == b'\0\0\0\0': # Width and height of 0: never written
+            return None
+        return GameSnapshot.from_bytes(self._map[offset:offset + self.slot_size])
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Fixed-timestep game clock: gravity levels, DAS/ARR auto-repeat and lock delay.
+
+The scheduler reads a monotonic clock, accumulates the elapsed time and runs the
+game logic in fixed ticks (60 per second by default), however often and however
+late the frontend calls `advance()`. A slow frame therefore delays the *display*
+of a tick, never the game itself, and the tick rate cannot drift.
+
+Each tick:
+  - repeats a held left/right input after the DAS delay, then every ARR
+    (press/release come from key events, not from OS key autorepeat);
+  - adds the level's gravity (rows per second, soft drop multiplies it) to a
+    fractional row counter and moves the piece down that many whole rows, so
+    speeds above one row per tick, up to 20G, fall several rows at once;
+  - once the piece rests on something, counts the lock delay; moving or rotating
+    a grounded piece restarts it (at most `max_lock_resets` times per piece).
+
+The scheduler only drives the engine through two callbacks, `on_input(action)`
+and `on_gravity()` (TetrisEngine.act and TetrisEngine.step by default), so the
+frontend can route them through its own handlers, e.g. to record replays.
+"""
+import time
+from collections import deque
+
+from tetris_engine import ACTION_LEFT, ACTION_RIGHT, ACTION_DOWN, ACTION_ROTATE, ACTION_HARD_DROP
+
+TICK_RATE = 60 # Logic ticks per second
+LEVEL_20G = 20 # From this level on pieces fall to the bottom instantly
+LINES_PER_LEVEL = 10
+
+
+def gravity(level):
+    """
+    Returns the fall speed at `level` in rows per second, following the guideline
+    curve: a piece needs (0.8 - (level - 1) * 0.007) ** (level - 1) seconds per row.
+    From LEVEL_20G on the result is infinite (20G: the piece lands within a tick).
+    """
+    if level >= LEVEL_20G:
+        return float('inf')
+    return 1 / (0.8 - (level - 1) * 0.007) ** (level - 1)
+
+
+class FixedStepScheduler:
+    """
+    Runs TetrisEngine logic at a fixed tick rate from a monotonic clock.
+
+    Call `press()` / `release()` from key events, and `advance()` as often as
+    convenient (every frame); it runs however many ticks are due.
+
+    Attributes:
+        level: Current level (starts at `start_level`, +1 every LINES_PER_LEVEL lines).
+        lines: Lines cleared since `reset()`.
+        ticks: Ticks run since `reset()`.
+        dropped_ticks: Ticks skipped because the frontend fell more than `max_catchup` behind.
+    """
+    def __init__(self, engine, on_input=None, on_gravity=None, clock=time.monotonic, tick_rate=TICK_RATE,
+                 das=0.167, arr=0.033, lock_delay=0.5, max_lock_resets=15, soft_drop_factor=20,
+                 start_level=1, max_catchup=0.25, jitter_samples=1024):
+        """
+        Args:
+            engine: The TetrisEngine to drive.
+            on_input: Called with an ACTION_* code to perform an input (default: engine.act).
+            on_gravity: Called to move the piece down one row or, when it is grounded,
+                        to lock it (default: engine.step).
+            clock: Monotonic clock in seconds (injectable for tests).
+            tick_rate: Logic ticks per second.
+            das: Delayed auto shift: seconds a direction must be held before it repeats.
+            arr: Auto repeat rate: seconds between repeats once DAS has charged (0 = straight to the wall).
+            lock_delay: Seconds a grounded piece may still be moved before it locks.
+            max_lock_resets: How often moving a grounded piece may restart the lock delay.
+            soft_drop_factor: Gravity multiplier while the soft drop key is held.
+            start_level: Level after `reset()`.
+            max_catchup: The most time (seconds) one `advance()` catches up on; older backlog is dropped.
+            jitter_samples: How many recent tick latencies are kept for `jitter_stats()`.
+        """
+        self.engine = engine
+        self.on_input = on_input or engine.act
+        self.on_gravity = on_gravity or engine.step
+        self.clock = clock
+        self.tick_rate = tick_rate
+        self.dt = 1 / tick_rate # Length of one tick in seconds
+        self.das = das
+        self.arr = arr
+        self.lock_delay = lock_delay
+        self.max_lock_resets = max_lock_resets
+        self.soft_drop_factor = soft_drop_factor
+        self.start_level = start_level
+        self.max_catchup = max_catchup
+        self.jitter = deque(maxlen=jitter_samples) # Recent tick latencies (seconds late)
+        engine.on('piece_spawned', self._on_piece_spawned)
+        engine.on('lines_cleared', self._on_lines_cleared)
+        self.reset()
+
+    def reset(self):
+        """Starts a new game: level, lines, held keys, timers and the clock."""
+        self.level = self.start_level
+        self.lines = 0
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.jitter.clear()
+        self.jitter_max = 0.0
+        self.held = [] # Held left/right actions, most recent last
+        self.soft_drop = False
+        self._start_shift()
+        self._new_piece()
+        self.resume()
+
+    def resume(self):
+        """Restarts the clock without catching up, e.g. after a pause."""
+        self.last_time = self.clock()
+        self.next_tick_time = self.last_time + self.dt # When the next tick is due
+
+    def _new_piece(self):
+        self.fall = 0.0 # Fractional rows of gravity not yet applied
+        self.lock_timer = 0.0 # Seconds the piece has been grounded
+        self.lock_resets = 0
+
+    def _on_piece_spawned(self):
+        self._new_piece()
+        if self.held: # A direction held through the lock stays charged: the new piece repeats at once
+            self.das_timer = self.das
+            self.shift_repeats = 0
+
+    def _on_lines_cleared(self, count):
+        self.lines += count
+        self.level = self.start_level + self.lines // LINES_PER_LEVEL
+
+    # --- Input ---
+
+    def press(self, action):
+        """
+        Key pressed. Left/right move at once and start auto-repeating after DAS;
+        down starts soft drop; rotate and hard drop act once. Repeated presses
+        of a key that is already held (OS autorepeat) are ignored.
+        """
+        if action in (ACTION_LEFT, ACTION_RIGHT):
+            if action in self.held:
+                return
+            self.held.append(action)
+            self._start_shift()
+            self._input(action)
+        elif action == ACTION_DOWN:
+            if not self.soft_drop:
+                self.soft_drop = True
+                self.fall = max(self.fall, 1.0) # Respond on the very next tick
+        elif action in (ACTION_ROTATE, ACTION_HARD_DROP):
+            self._input(action)
+
+    def release(self, action):
+        """Key released. Releasing the newest direction hands over to the other one if it is still held."""
+        if action in self.held:
+            newest = self.held[-1] == action
+            self.held.remove(action)
+            if newest and self.held:
+                self._start_shift()
+        elif action == ACTION_DOWN:
+            self.soft_drop = False
+
+    def _start_shift(self):
+        self.das_timer = 0.0 # Seconds the current direction has been held
+        self.shift_repeats = 0 # Auto-repeat moves done since DAS charged
+
+    def _grounded(self):
+        engine = self.engine
+        return engine.check_collision(engine.current_piece, engine.current_x, engine.current_y + 1)
+
+    def _input(self, action):
+        """Performs an input and restarts the lock delay if it moved a grounded piece."""
+        engine = self.engine
+        before = engine.state_key
+        self.on_input(action)
+        if engine.state_key != before and self.lock_timer and self.lock_resets < self.max_lock_resets:
+            self.lock_timer = 0.0
+            self.lock_resets += 1
+
+    # --- Clock ---
+
+    def advance(self, now=None):
+        """
+        Runs every tick that is due at time `now` (default: the clock).
+
+        Returns:
+            int: The number of ticks run.
+        """
+        if now is None:
+            now = self.clock()
+        if now - self.next_tick_time > self.max_catchup: # Too far behind (e.g. the window was dragged)
+            skipped = int((now - self.next_tick_time - self.max_catchup) / self.dt) + 1
+            self.dropped_ticks += skipped
+            self.next_tick_time += skipped * self.dt
+        ran = 0
+        while self.next_tick_time <= now and not self.engine.game_over:
+            late = now - self.next_tick_time # How long after its due time this tick runs
+            self.jitter.append(late)
+            if late > self.jitter_max:
+                self.jitter_max = late
+            self.tick()
+            self.next_tick_time += self.dt # Due times never depend on when advance() was called
+            ran += 1
+        self.last_time = now
+        return ran
+
+    def ms_until_next_tick(self):
+        """Milliseconds until the next tick is due (at least 1), for scheduling the next frame."""
+        return max(1, int((self.next_tick_time - self.clock()) * 1000 + 0.999))
+
+    def tick(self):
+        """Advances the game logic by one fixed timestep."""
+        self.ticks += 1
+        dt = self.dt
+        engine = self.engine
+
+        # Auto-repeat of the held direction
+        if self.held:
+            self.das_timer += dt
+            charged = self.das_timer - self.das
+            if charged >= 0:
+                direction = self.held[-1]
+                if self.arr <= 0: # Instant repeat: slide to the wall
+                    due = engine.board.width
+                else:
+                    due = int(charged / self.arr) + 1 - self.shift_repeats
+                for _ in range(due):
+                    before = engine.state_key
+                    self._input(direction)
+                    self.shift_repeats += 1
+                    if engine.state_key == before: # Against a wall or a block
+                        break
+                if engine.game_over:
+                    return
+
+        # Gravity: whole rows of the accumulated fall, several per tick at high speed
+        speed = gravity(self.level)
+        if self.soft_drop:
+            speed *= self.soft_drop_factor
+        self.fall += speed * dt
+        grounded = self._grounded()
+        while self.fall >= 1 and not grounded:
+            self.fall -= 1
+            self.on_gravity()
+            grounded = self._grounded()
+        if engine.game_over:
+            return
+        if self.fall > engine.height: # Infinite (20G) or huge: nothing left to fall through
+            self.fall = 0.0
+
+        # Lock delay
+        if grounded:
+            self.fall = 0.0
+            self.lock_timer += dt
+            if self.lock_timer >= self.lock_delay:
+                self.on_gravity() # Stepping a grounded piece locks it and spawns the next
+        else:
+            self.lock_timer = 0.0
+
+    # --- Snapshots ---
+
+    def snapshot(self):
+        """
+        Returns the game-logic state (level, held keys, timers; not the clock or
+        the statistics) as an immutable tuple, e.g. for rollback next to engine.snapshot().
+        """
+        return (self.level, self.lines, self.ticks, tuple(self.held), self.soft_drop, self.das_timer,
+                self.shift_repeats, self.fall, self.lock_timer, self.lock_resets)
+
+    def restore(self, snapshot):
+        """
+        Returns to a state from `snapshot()`. Restore the engine first: its
+        restore emits piece_spawned, which resets the per-piece timers.
+        """
+        (self.level, self.lines, self.ticks, held, self.soft_drop, self.das_timer,
+         self.shift_repeats, self.fall, self.lock_timer, self.lock_resets) = snapshot
+        self.held = list(held)
+
+    # --- Statistics ---
+
+    def jitter_stats(self):
+        """
+        Reports how late ticks ran compared to their fixed schedule.
+
+        Returns:
+            dict with 'ticks', 'dropped', 'mean_ms', 'p99_ms' (over the recent samples) and 'max_ms'.
+        """
+        samples = sorted(self.jitter)
+        count = len(samples)
+        return {
+            'ticks': self.ticks,
+            'dropped': self.dropped_ticks,
+            'mean_ms': 1000 * sum(samples) / count if count else 0.0,
+            'p99_ms': 1000 * samples[min(count - 1, int(count * 0.99))] if count else 0.0,
+            'max_ms': 1000 * self.jitter_max,
+        }
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Self-play runner: plays many seeded headless bot games across worker processes.
+
+Seeds are split into chunks that are handed to a ProcessPoolExecutor a few at a
+time, and finished games are streamed back to the parent as each chunk completes,
+so neither side holds more than a handful of chunks at once. Per-game results are
+written to CSV in seed order, and score, lines, pieces survived and wall time are
+summarized as percentiles (optionally written as JSON).
+
+With the default unlimited time budget every game depends only on its seed and
+the bot settings, so a seed range always reproduces the same results (apart from
+the wall times):
+
+    python tetris_tournament.py --seeds 0 10000 --jobs 8 --csv games.csv --json summary.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from tetris_bot import TetrisBot, DEFAULT_WEIGHTS, play_game
+
+FIELDS = ('seed', 'score', 'lines', 'pieces', 'seconds') # CSV columns, one row per game
+METRICS = ('score', 'lines', 'pieces', 'seconds') # Summarized columns
+PERCENTILES = (0, 10, 25, 50, 75, 90, 99, 100)
+
+_worker_bot = None # Each worker process builds its bot once, in _init_worker
+_worker_options = None
+
+
+def _init_worker(bot_options, game_options):
+    global _worker_bot, _worker_options
+    _worker_bot = TetrisBot(**bot_options)
+    _worker_options = game_options
+
+
+def _play_chunk(seeds):
+    """Plays one game per seed with the worker's bot and returns their result dicts."""
+    return [play_game(_worker_bot, seed=seed, **_worker_options) for seed in seeds]
+
+
+def _chunks(seeds, size):
+    """Splits a range of seeds into consecutive sub-ranges of at most `size` seeds."""
+    for start in range(0, len(seeds), size):
+        yield seeds[start:start + size]
+
+
+def run_games(seeds, bot_options=None, game_options=None, jobs=1, chunksize=8):
+    """
+    Plays one game per seed and yields the result dicts as chunks complete
+    (so not in seed order when jobs > 1).
+
+    Args:
+        seeds: A range (or other sliceable sequence) of seeds.
+        bot_options: Keyword arguments for TetrisBot.
+        game_options: Extra keyword arguments for tetris_bot.play_game (e.g. max_pieces).
+        jobs: Worker processes; 1 plays in this process.
+        chunksize: Seeds per task sent to a worker.
+    """
+    bot_options = bot_options or {}
+    game_options = game_options or {}
+    if jobs <= 1:
+        _init_worker(bot_options, game_options)
+        for chunk in _chunks(seeds, chunksize):
+            yield from _play_chunk(chunk)
+        return
+
+    chunks = _chunks(seeds, chunksize)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(bot_options, game_options)) as pool:
+        pending = set()
+        while True:
+            # Keep every worker busy with a small backlog, without queueing the whole seed range
+            while len(pending) < 2 * jobs:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(pool.submit(_play_chunk, chunk))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def in_seed_order(results, seeds):
+    """
+    Re-orders streamed results to follow `seeds`, buffering only the results
+    that arrive before their predecessors.
+    """
+    waiting = {}
+    order = iter(seeds)
+    expected = next(order, None)
+    for result in results:
+        waiting[result['seed']] = result
+        while expected in waiting:
+            yield waiting.pop(expected)
+            expected = next(order, None)
+
+
+def percentile(sorted_values, q):
+    """Returns the q-th percentile (0-100) of a sorted list, interpolating linearly."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize(columns):
+    """
+    Args:
+        columns: dict metric -> list of per-game values.
+
+    Returns:
+        dict metric -> {'mean': ..., 'p0': ..., ..., 'p100': ...}; NaN for a metric without values.
+    """
+    summary = {}
+    for metric, values in columns.items():
+        values = sorted(values)
+        if not values: # Still formattable in the table, unlike None
+            summary[metric] = dict.fromkeys(['mean'] + [f'p{q}' for q in PERCENTILES], float('nan'))
+            continue
+        stats = {'mean': sum(values) / len(values)}
+        for q in PERCENTILES:
+            stats[f'p{q}'] = percentile(values, q)
+        summary[metric] = stats
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded headless bot games in parallel.")
+    parser.add_argument('--seeds', type=int, nargs=2, default=(0, 100), metavar=('FIRST', 'STOP'),
+                        help="play seeds FIRST .. STOP-1 (default 0 100)")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--chunksize', type=int, default=8, help="seeds per worker task")
+    parser.add_argument('--pieces', type=int, default=1000, help="piece limit per game (0 = play until game over)")
+    parser.add_argument('--backend', default='bitboard', help="board backend")
+    parser.add_argument('--beam', type=int, default=4, help="bot beam width")
+    parser.add_argument('--lookahead', type=int, default=1, help="preview pieces the bot searches")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="seconds per decision (default: unlimited, which keeps results reproducible)")
+    parser.add_argument('--weights', help="JSON object overriding evaluator weights, e.g. '{\"holes\": -0.5}'")
+    parser.add_argument('--csv', metavar='PATH', help="write one row per game ('-' for stdout)")
+    parser.add_argument('--json', metavar='PATH', help="write the settings and percentile summary")
+    args = parser.parse_args(argv)
+    if args.seeds[0] >= args.seeds[1]:
+        parser.error(f"--seeds {args.seeds[0]} {args.seeds[1]}: no seeds to play (FIRST must be below STOP)")
+
+    weights = dict(DEFAULT_WEIGHTS)
+    if args.weights:
+        weights.update(json.loads(args.weights))
+    bot_options = {'weights': weights, 'beam_width': args.beam, 'lookahead': args.lookahead,
+                   'time_budget': args.budget}
+    game_options = {'max_pieces': args.pieces or None, 'backend': args.backend}
+    seeds = range(*args.seeds)
+
+    csv_file = writer = None
+    if args.csv:
+        csv_file = sys.stdout if args.csv == '-' else open(args.csv, 'w', newline='')
+        writer = csv.DictWriter(csv_file, FIELDS)
+        writer.writeheader()
+
+    columns = {metric: [] for metric in METRICS}
+    start = time.perf_counter()
+    results = run_games(seeds, bot_options, game_options, jobs=args.jobs, chunksize=args.chunksize)
+    try:
+        for result in in_seed_order(results, seeds):
+            for metric in METRICS:
+                columns[metric].append(result[metric])
+            if writer is not None:
+                writer.writerow(result)
+    finally:
+        if csv_file is not None and csv_file is not sys.stdout:
+            csv_file.close()
+    elapsed = time.perf_counter() - start
+
+    games = len(columns['score'])
+    summary = summarize(columns)
+    report = sys.stderr if args.csv == '-' else sys.stdout
+    print(f"{games} games in {elapsed:.1f}s with {args.jobs} jobs "
+          f"({games / elapsed:,.1f} games/s, {sum(columns['pieces']) / elapsed:,.0f} pieces/s)", file=report)
+    print(f"{'':>8}" + ''.join(f"{'mean' if q is None else f'p{q}':>10}" for q in (None,) + PERCENTILES), file=report)
+    for metric, stats in summary.items():
+        print(f"{metric:>8}" + ''.join(f"{value:>10.4g}" for value in stats.values()), file=report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'seeds': list(args.seeds),
+                'bot': bot_options,
+                'game': game_options,
+                'games': games,
+                'elapsed': elapsed,
+                'summary': summary,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())